@@ -0,0 +1,11 @@
+from .poller import Poller, Snapshot
+from .singleflight import SingleFlight
+from .exposition import FORMATS, generate_text, negotiate
+from .render_cache import RenderCache
+from .fleet import Fleet
+from .targets import TargetRegistry
+from .profiling import Profiler
+from .session_pool import SessionPool
+from .cassette import Cassette
+from .instrumentation import Instrumentation
+from .compact_metric_family import CompactGaugeMetricFamily
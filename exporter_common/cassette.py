@@ -0,0 +1,218 @@
+import abc
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+
+FORMAT_VERSION = 1
+
+
+def _pseudonym(value, salt):
+    """
+    Return a pseudonym of a string of the same length and shape: digits are
+    replaced by digits, hexadecimal letters by hexadecimal letters and other
+    letters by letters of the same case, keeping the other characters, e.g.
+    the dashes of the UUIDs. The same value and salt always give the same
+    pseudonym, so that the references between responses hold.
+    """
+    digest = hashlib.shake_256(salt + value.encode('utf-8')).digest(len(value))
+    chars = []
+    for c, b in zip(value, digest):
+        if c.isdigit():
+            c = '0123456789'[b % 10]
+        elif c in 'abcdef':
+            c = 'abcdef'[b % 6]
+        elif c in 'ABCDEF':
+            c = 'ABCDEF'[b % 6]
+        elif 'a' <= c <= 'z':
+            c = chr(ord('a') + b % 26)
+        elif 'A' <= c <= 'Z':
+            c = chr(ord('A') + b % 26)
+        chars.append(c)
+    return ''.join(chars)
+
+
+def _scrub(data, salt, keys):
+    """
+    Return data with the string values of the given keys, or the strings
+    they list, replaced by pseudonyms.
+    """
+    if isinstance(data, list):
+        return [_scrub(d, salt, keys) for d in data]
+    if not isinstance(data, dict):
+        return data
+    scrubbed = {}
+    for k, v in data.items():
+        if k in keys and isinstance(v, str):
+            v = _pseudonym(v, salt)
+        elif k in keys and isinstance(v, list):
+            v = [_pseudonym(s, salt) if isinstance(s, str) else s for s in v]
+        else:
+            v = _scrub(v, salt, keys)
+        scrubbed[k] = v
+    return scrubbed
+
+
+class ReplayClient():
+    """
+    Stand-in for a REST client, or for one of its API objects, whose
+    methods answer from a cassette
+    """
+    def __init__(self, cassette):
+        self._cassette = cassette
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(**kwargs):
+            return self._cassette.replay(name, kwargs)
+        call.__name__ = name
+        return call
+
+
+class Cassette(abc.ABC):
+    """
+    Recording of the REST calls of array scrapes: the client method and
+    parameters of each call, with its response, or error, and duration.
+    A new cassette records the calls given to record(), and is written by
+    save() to a gzip compressed file of JSON lines. A cassette read by
+    load() answers the calls given to replay() from the recording, after
+    the recorded duration multiplied by scale, so that scrapes of a real
+    array can be replayed offline. Calls recorded several times are
+    answered in the recorded order, the last response being repeated.
+    Subclasses set ARRAY_TYPE and SCRUBBED_KEYS, and convert the responses
+    and errors of the REST client of their array type to and from JSON.
+    :param scrub: whether to replace the values of SCRUBBED_KEYS in the
+                  responses with pseudonyms.
+    :type scrub: bool
+    :param info: description of the recording, stored in the file header.
+    :type info: dict
+    """
+    ARRAY_TYPE = None
+    # Response fields replaced by pseudonyms when the recording is scrubbed
+    SCRUBBED_KEYS = frozenset()
+
+    def __init__(self, scrub=False, info=None):
+        self.info = dict(info or {})
+        self.scale = 1.0
+        self.replaying = False
+        self.replayed = 0
+        self.missed = Counter()
+        self._salt = os.urandom(16) if scrub else None
+        self._lines = []
+        self._calls = {}
+        self._served = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(method, params):
+        return json.dumps([method, params], sort_keys=True)
+
+    def __len__(self):
+        """Return the number of calls recorded so far."""
+        return len(self._lines)
+
+    @abc.abstractmethod
+    def _encode(self, response):
+        """Return the type name and the JSON data of a response."""
+
+    @abc.abstractmethod
+    def _decode(self, type_name, data):
+        """Return the response of the given type name from its JSON text."""
+
+    @abc.abstractmethod
+    def _encode_error(self, error):
+        """Return the JSON data of an error raised by a call."""
+
+    @abc.abstractmethod
+    def _error(self, data):
+        """Return the exception recorded as data by _encode_error()."""
+
+    @abc.abstractmethod
+    def _missing(self, method, params):
+        """Return the exception raised by the calls missing from the recording."""
+
+    def _header(self):
+        """Return the fields of the file header specific to the array type."""
+        return {}
+
+    def record(self, method, params, duration, response=None, error=None):
+        """
+        Record a call of method with params, encoding the response at once
+        as the collector may modify it in place.
+        """
+        entry = {'method': method, 'params': params, 'duration': round(duration, 6)}
+        if error is not None:
+            entry['error'] = self._encode_error(error)
+        else:
+            entry['type'], data = self._encode(response)
+            if self._salt is not None:
+                data = _scrub(data, self._salt, self.SCRUBBED_KEYS)
+            entry['response'] = data
+        line = json.dumps(entry)
+        with self._lock:
+            self._lines.append(line)
+
+    def replay(self, method, params):
+        """
+        Return the recorded response of a call of method with params, or
+        raise its recorded error, after the recorded duration times scale.
+        """
+        key = self._key(method, params)
+        with self._lock:
+            calls = self._calls.get(key)
+            if not calls:
+                self.missed[key] += 1
+                raise self._missing(method, params)
+            entry = calls[min(self._served[key], len(calls) - 1)]
+            self._served[key] += 1
+            self.replayed += 1
+        if self.scale > 0:
+            time.sleep(entry['duration'] * self.scale)
+        if 'error' in entry:
+            raise self._error(entry['error'])
+        return self._decode(entry['type'], entry['response'])
+
+    def rewind(self):
+        """Replay the calls from the start of the recording again."""
+        with self._lock:
+            self._served.clear()
+            self.missed.clear()
+            self.replayed = 0
+
+    def save(self, path):
+        header = dict(self.info, format=FORMAT_VERSION, array_type=self.ARRAY_TYPE,
+                      scrubbed=self._salt is not None, calls=len(self._lines),
+                      **self._header())
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+            with self._lock:
+                for line in self._lines:
+                    f.write(line + '\n')
+
+    @classmethod
+    def load(cls, path, scale=1.0):
+        """
+        Read a cassette saved by save() for replay, answering each call
+        after its recorded duration multiplied by scale, 0 not to wait.
+        """
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('array_type') != cls.ARRAY_TYPE:
+                raise ValueError('{} is not a {} cassette'.format(path, cls.ARRAY_TYPE))
+            cassette = cls(info=header)
+            cassette.replaying = True
+            cassette.scale = scale
+            for line in f:
+                entry = json.loads(line)
+                if 'response' in entry:
+                    # Decoded again at each replay, to hand out fresh objects
+                    entry['response'] = json.dumps(entry['response'])
+                key = cls._key(entry['method'], entry['params'])
+                cassette._calls.setdefault(key, []).append(entry)
+        return cassette
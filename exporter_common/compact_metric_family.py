@@ -0,0 +1,28 @@
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.samples import Sample
+
+
+class CompactGaugeMetricFamily(GaugeMetricFamily):
+    """
+    Gauge metric family storing each sample as a (labels, value, timestamp)
+    tuple, where labels is the tuple of label values, instead of a Sample
+    with its own label dictionary. Families with tens of thousands of
+    samples, like the FlashArray volume or the FlashBlade user usage ones,
+    take a fraction of the memory.
+    The Sample objects are only built when the samples attribute is read,
+    e.g. by prometheus_client generate_latest, while the exporter text
+    writer renders the tuples directly.
+    """
+
+    def add_metric(self, labels, value, timestamp=None):
+        self.compact_samples.append((tuple(labels), value, timestamp))
+
+    @property
+    def samples(self):
+        return [Sample(self.name, dict(zip(self._labelnames, labels)), value, timestamp)
+                for labels, value, timestamp in self.compact_samples]
+
+    @samples.setter
+    def samples(self, samples):
+        self.compact_samples = [(tuple(s.labels.values()), s.value, s.timestamp)
+                                for s in samples]
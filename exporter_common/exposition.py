@@ -0,0 +1,309 @@
+import copy
+import struct
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.openmetrics import exposition as openmetrics
+from prometheus_client.utils import floatToGoString
+
+
+# Maximum number of samples rendered in a single output chunk
+CHUNK_SAMPLES = 1024
+
+CONTENT_TYPE_PROTOBUF = ('application/vnd.google.protobuf; '
+                         'proto=io.prometheus.client.MetricFamily; encoding=delimited')
+
+# MetricType values of the Prometheus client data model
+_PROTOBUF_TYPES = {'counter': 0, 'gauge': 1, 'unknown': 3,
+                   'info': 1, 'stateset': 1}
+
+
+class _SingleFamily():
+    """
+    Collector yielding a single metric family, to render it on its own
+    with prometheus_client generate_latest.
+    """
+    def __init__(self, metric):
+        self.metric = metric
+
+    def collect(self):
+        yield self.metric
+
+
+def _escape_help(doc):
+    return doc.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape_label(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _relabel(metric, labels):
+    """
+    Return a copy of a metric family with the (name, value) label pairs
+    added to the labels of all its samples.
+    """
+    family = copy.copy(metric)
+    if hasattr(metric, 'compact_samples'):
+        family._labelnames = tuple(n for n, _ in labels) + tuple(metric._labelnames)
+        values = tuple(v for _, v in labels)
+        family.compact_samples = [(values + l, v, t) for l, v, t in metric.compact_samples]
+    else:
+        family.samples = [s._replace(labels=dict(s.labels, **dict(labels)))
+                          for s in metric.samples]
+    return family
+
+
+def _strip_header(body):
+    """Remove the HELP and TYPE lines heading a rendered family."""
+    while body.startswith(b'#'):
+        body = body[body.index(b'\n') + 1:]
+    return body
+
+
+def _render_compact(metric, escaped, om=False, header=True):
+    """
+    Render a gauge family holding compact samples, i.e. (labels, value,
+    timestamp) tuples, in the Prometheus text format or in the OpenMetrics
+    one if om is True, yielding the output in chunks of at most
+    CHUNK_SAMPLES samples. The HELP and TYPE lines are left out if header
+    is False.
+    """
+    names = metric._labelnames
+    # Labels are sorted by name in the output, as generate_latest does
+    order = sorted(range(len(names)), key=names.__getitem__)
+    if names:
+        prefix = metric.name + '{' + ','.join(names[i] + '="%s"' for i in order) + '} '
+    else:
+        prefix = metric.name + ' '
+    if om:
+        head = '# HELP {0} {1}\n# TYPE {0} gauge\n'.format(metric.name,
+                                                        _escape_label(metric.documentation))
+        if metric.unit:
+            head += '# UNIT {0} {1}\n'.format(metric.name, metric.unit)
+    else:
+        head = '# HELP {0} {1}\n# TYPE {0} gauge\n'.format(metric.name,
+                                                        _escape_help(metric.documentation))
+    lines = [head] if header else []
+    for labels, value, timestamp in metric.compact_samples:
+        values = []
+        for i in order:
+            v = labels[i]
+            e = escaped.get(v)
+            if e is None:
+                e = escaped[v] = _escape_label(v)
+            values.append(e)
+        line = prefix % tuple(values) + floatToGoString(value)
+        if timestamp is not None:
+            # Seconds in OpenMetrics, milliseconds in the Prometheus format
+            if om:
+                line += ' {0}'.format(timestamp)
+            else:
+                line += ' {0:d}'.format(int(float(timestamp) * 1000))
+        lines.append(line + '\n')
+        if len(lines) >= CHUNK_SAMPLES:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+def generate_text(registry):
+    """
+    Render the metrics of the registry in the Prometheus text format,
+    yielding the output in chunks as the families are rendered, so that it
+    can be streamed to the client. Each family is rendered as soon as the
+    registry yields it, thus while a Snapshot is still being collected.
+    Consecutive families of the same name, e.g. the chunks of a family
+    yielded as its samples are collected, are rendered as a single one.
+    The output is otherwise the same as the one of
+    prometheus_client generate_latest. Gauge families keeping compact
+    samples are rendered directly from their tuples, with each distinct
+    label value escaped only once, while all the other families are
+    rendered by generate_latest.
+    """
+    escaped = {}
+    previous = None
+    for metric in registry.collect():
+        header = metric.name != previous
+        previous = metric.name
+        if metric.type == 'gauge' and hasattr(metric, 'compact_samples'):
+            yield from _render_compact(metric, escaped, header=header)
+        elif header:
+            yield generate_latest(_SingleFamily(metric))
+        else:
+            yield _strip_header(generate_latest(_SingleFamily(metric)))
+
+
+def generate_openmetrics(registry):
+    """
+    Render the metrics of the registry in the OpenMetrics text format,
+    yielding the output in chunks like generate_text does, and rendering
+    consecutive families of the same name as a single one. The families
+    without compact samples are rendered by the OpenMetrics generate_latest
+    of prometheus_client.
+    """
+    escaped = {}
+    previous = None
+    for metric in registry.collect():
+        header = metric.name != previous
+        previous = metric.name
+        if metric.type == 'gauge' and hasattr(metric, 'compact_samples'):
+            yield from _render_compact(metric, escaped, om=True, header=header)
+        else:
+            # Strip the end marker, written once at the end of the output
+            body = openmetrics.generate_latest(_SingleFamily(metric))[:-len(b'# EOF\n')]
+            yield body if header else _strip_header(body)
+    yield b'# EOF\n'
+
+
+def _encode_varint(n):
+    out = bytearray()
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+# Most varints are message lengths, encoded once and looked up
+_VARINTS = [_encode_varint(n) for n in range(1 << 14)]
+_pack_double = struct.Struct('<d').pack
+
+
+def _varint(n):
+    return _VARINTS[n] if n < 16384 else _encode_varint(n)
+
+
+def _field(number, data):
+    """Encode a length-delimited protobuf field."""
+    return _VARINTS[number << 3 | 2] + _varint(len(data)) + data
+
+
+def _protobuf_metric(label_pairs, value_tag, value, timestamp):
+    """
+    Encode a Metric message holding a single value and its already encoded
+    label pairs. value_tag is the encoded header of the gauge, counter or
+    untyped message holding the value.
+    """
+    out = label_pairs + value_tag + _pack_double(value)
+    if timestamp is not None:
+        out += b'\x30' + _encode_varint(int(float(timestamp) * 1000) & 0xffffffffffffffff)
+    return b'\x22' + _varint(len(out)) + out
+
+
+def _protobuf_name(metric):
+    """Return the name of the samples of a metric family."""
+    if metric.type == 'counter':
+        return metric.name + '_total'
+    if metric.type == 'info':
+        return metric.name + '_info'
+    return metric.name
+
+
+def _protobuf_header(metric):
+    """
+    Encode the name, help and type fields of the MetricFamily message of a
+    metric family, returning them with its protobuf type.
+    """
+    ptype = _PROTOBUF_TYPES[metric.type]
+    return (_field(1, _protobuf_name(metric).encode('utf-8')) +
+            _field(2, metric.documentation.encode('utf-8')) +
+            b'\x18' + _varint(ptype)), ptype
+
+
+def _protobuf_metrics(metric, ptype, pairs):
+    """
+    Encode the Metric fields of a metric family, one per sample.
+    Only single value families are supported, as summaries and histograms
+    are not produced by the collectors.
+    """
+    # Header of the Metric field holding the value for each type, a 9 bytes
+    # message made of the tag of its double value field and the value
+    value_tag = _VARINTS[{0: 3, 1: 2, 3: 5}[ptype] << 3 | 2] + b'\x09\x09'
+
+    def label_pair(k, v):
+        pair = pairs.get((k, v))
+        if pair is None:
+            pair = pairs[(k, v)] = _field(1, _field(1, k.encode('utf-8')) +
+                                             _field(2, v.encode('utf-8')))
+        return pair
+
+    body = []
+    if hasattr(metric, 'compact_samples'):
+        names = metric._labelnames
+        order = sorted(range(len(names)), key=names.__getitem__)
+        for labels, value, timestamp in metric.compact_samples:
+            body.append(_protobuf_metric(
+                b''.join(label_pair(names[i], labels[i]) for i in order),
+                value_tag, value, timestamp))
+    else:
+        name = _protobuf_name(metric)
+        for sample in metric.samples:
+            if sample.name != name:
+                # OpenMetrics specific samples, e.g. _created
+                continue
+            body.append(_protobuf_metric(
+                b''.join(label_pair(k, v) for k, v in sorted(sample.labels.items())),
+                value_tag, sample.value, sample.timestamp))
+    return body
+
+
+def generate_protobuf(registry):
+    """
+    Render the metrics of the registry in the delimited protocol buffer
+    format of Prometheus, yielding the output family by family. Label
+    pairs repeated across families are encoded only once. Consecutive
+    families of the same name are encoded as a single MetricFamily
+    message, whose encoded samples are held until it is complete, as the
+    message is preceded by its length.
+    """
+    pairs = {}
+    previous, ptype, body = None, None, []
+    for metric in registry.collect():
+        if metric.name != previous:
+            if body:
+                body = b''.join(body)
+                yield _varint(len(body)) + body
+            previous = metric.name
+            header, ptype = _protobuf_header(metric)
+            body = [header]
+        body.extend(_protobuf_metrics(metric, ptype, pairs))
+    if body:
+        body = b''.join(body)
+        yield _varint(len(body)) + body
+
+
+# Exposition formats, with their content type and renderer
+FORMATS = {'text': (CONTENT_TYPE_LATEST, generate_text),
+           'openmetrics': (openmetrics.CONTENT_TYPE_LATEST, generate_openmetrics),
+           'protobuf': (CONTENT_TYPE_PROTOBUF, generate_protobuf)}
+
+
+def negotiate(accept):
+    """
+    Return the name of the exposition format preferred by a client, given
+    the value of its Accept header. The Prometheus text format is returned
+    when no other format is accepted.
+    """
+    best, best_q = 'text', 0.0
+    for item in (accept or '').split(','):
+        params = [p.strip() for p in item.split(';')]
+        media = params[0].lower()
+        params = dict(p.split('=', 1) for p in params[1:] if '=' in p)
+        try:
+            q = float(params.get('q', 1))
+        except ValueError:
+            continue
+        if media == 'application/vnd.google.protobuf':
+            if (params.get('proto') != 'io.prometheus.client.MetricFamily' or
+                    params.get('encoding') != 'delimited'):
+                continue
+            fmt = 'protobuf'
+        elif media == 'application/openmetrics-text':
+            fmt = 'openmetrics'
+        elif media in ('text/plain', 'text/*', '*/*'):
+            fmt = 'text'
+        else:
+            continue
+        if q > best_q:
+            best, best_q = fmt, q
+    return best
@@ -0,0 +1,117 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from prometheus_client.core import GaugeMetricFamily
+from .exposition import _relabel, generate_text
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_TIMEOUT = 60
+
+
+class _Status():
+    """
+    Outcome of the collection of each array of a fleet scrape
+    """
+    def __init__(self, up, durations):
+        self.up = up
+        self.durations = durations
+
+    def collect(self):
+        up = GaugeMetricFamily('pure_exporter_array_up',
+                               'Whether the array was collected successfully',
+                               labels=['array'])
+        for array, value in self.up.items():
+            up.add_metric([array], value)
+        yield up
+        duration = GaugeMetricFamily('pure_exporter_array_collection_seconds',
+                                     'Time taken to collect the array',
+                                     labels=['array'])
+        for array, value in self.durations.items():
+            duration.add_metric([array], value)
+        yield duration
+
+
+class _Merged():
+    """
+    Metric families of the snapshots of many arrays, each sample labelled
+    with its array, yielded one family name at a time, so that the samples
+    of a family are rendered together under a single header.
+    """
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def collect(self):
+        families = {}
+        for array, snapshot in self.snapshots:
+            for metric in snapshot.collect():
+                families.setdefault(metric.name, []).append((array, metric))
+        for metrics in families.values():
+            for array, metric in metrics:
+                yield _relabel(metric, (('array', array),))
+
+
+def _timed(collect, *args):
+    start = time.monotonic()
+    result = collect(*args)
+    return result, time.monotonic() - start
+
+
+class Fleet():
+    """
+    Concurrent collection of many arrays within a single scrape. The arrays
+    are collected in a thread pool shared by all the fleet scrapes, which
+    bounds the number of arrays collected at once across the exporter. The
+    metrics are rendered once all the arrays are collected or timed out,
+    as the samples of a family must not be split across the output.
+    :param max_workers: maximum number of arrays collected concurrently.
+    :type max_workers: int
+    :param timeout: seconds after which the arrays of a scrape that have not
+                    been collected yet are reported as down.
+    :type timeout: int
+    """
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='fleet')
+
+    def generate_text(self, targets, collect):
+        """
+        Collect the arrays and render their metrics in the Prometheus text
+        format, yielding the output in chunks. targets is a sequence of
+        (array, args) pairs: collect(*args) must return the snapshot of the
+        array, and every sample of the array is labelled with array="<array>".
+        Each family is rendered once, with the samples of all the arrays, in
+        the order the arrays were collected. The output ends with the
+        pure_exporter_array_up and pure_exporter_array_collection_seconds
+        families.
+        """
+        futures = {}
+        for array, args in targets:
+            futures[self._pool.submit(_timed, collect, *args)] = array
+        up = dict.fromkeys(futures.values(), 0)
+        durations = {}
+        snapshots = []
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                array = futures[future]
+                try:
+                    snapshot, durations[array] = future.result()
+                except Exception as e:
+                    logger.warning('%s: %s', array, e)
+                    continue
+                up[array] = 1
+                snapshots.append((array, snapshot))
+        except FuturesTimeoutError:
+            for future, array in futures.items():
+                if not future.done():
+                    logger.warning('%s: not collected within %s seconds', array, self.timeout)
+        finally:
+            # Drop the collections not started yet when the scrape timed out
+            for future in futures:
+                future.cancel()
+        yield from generate_text(_Merged(snapshots))
+        yield from generate_text(_Status(up, durations))
@@ -0,0 +1,216 @@
+import contextvars
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PAYLOAD_BUCKETS = tuple(2**n for n in range(10, 28, 2))
+
+# Bytes received by the REST call in progress in the current thread, or
+# in the current task of the FlashBlade async transport
+_payload = contextvars.ContextVar('payload', default=None)
+
+
+class _Histogram():
+    """
+    Bucket counts and sum of the observations of a single series
+    """
+    def __init__(self, bounds):
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, bounds, value):
+        self.counts[bisect_left(bounds, value)] += 1
+        self.sum += value
+
+    def buckets(self, bounds):
+        """Return the cumulative counts, as (upper bound, count) pairs."""
+        out = []
+        total = 0
+        for bound, count in zip(bounds + (float('inf'),), self.counts):
+            total += count
+            out.append(('+Inf' if bound == float('inf') else str(bound), total))
+        return out
+
+
+# Arguments of the REST calls selecting the kind of data returned, which
+# take a few distinct values. The other ones, e.g. entity names, filters,
+# page sizes and continuation tokens, are left out of the method labels.
+METHOD_ARGS = frozenset(['action', 'connect', 'error', 'latency', 'mirrored', 'open',
+                         'pending', 'protocol', 'protocol_endpoint', 'size', 'space'])
+
+
+def method_name(func, kwargs):
+    """
+    Return the label identifying a REST call, made of the client or API
+    method name and of its METHOD_ARGS arguments, e.g.
+    list_volumes(action=monitor,latency=True), so that the number of
+    distinct labels stays bounded.
+    """
+    args = ','.join('{}={}'.format(k, v) for k, v in sorted(kwargs.items())
+                    if k in METHOD_ARGS)
+    return '{}({})'.format(getattr(func, '__name__', func), args)
+
+
+class Instrumentation():
+    """
+    Process-wide record of the work done by the collector: duration,
+    response size and failures of the REST calls, by array and client
+    method, duration and failures of the collection of each metric class,
+    and number of samples of each metric family of the last collection.
+    Provides a 'collect' method exposing the records as metric families
+    whose names start with prefix.
+    The arrays are identified by the endpoint their pooled client was
+    registered with, and their records are dropped with the client.
+    Subclasses hook into the REST client of their array type to account
+    the size of the responses with add_payload().
+    :param prefix: prefix of the metric family names.
+    :type prefix: str
+    """
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._arrays = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._payloads = {}
+        self._errors = {}
+        self._collections = {}
+        self._collection_errors = {}
+        self._samples = {}
+
+    def register(self, client, array):
+        """Associate a pooled client with the endpoint of its array."""
+        self._arrays[client] = array
+
+    def forget(self, client):
+        """
+        Drop the records of the array of a client leaving the pool, unless
+        the array is still reached by another pooled client.
+        """
+        array = self._arrays.pop(client, None)
+        if array is None or array in self._arrays.values():
+            return
+        with self._lock:
+            for records in (self._durations, self._payloads, self._errors,
+                            self._collections, self._collection_errors, self._samples):
+                for key in [k for k in records if k[0] == array]:
+                    del records[key]
+
+    def add_payload(self, size):
+        """Account size bytes to the REST call in progress, if any."""
+        payload = _payload.get()
+        if payload is not None:
+            payload[0] += size
+
+    @contextmanager
+    def rest_call(self, client, func, kwargs):
+        """Record the REST call issued within the context."""
+        key = (self._arrays.get(client, ''), method_name(func, kwargs))
+        payload = [0]
+        token = _payload.set(payload)
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            _payload.reset(token)
+            with self._lock:
+                self._durations.setdefault(key, _Histogram(DURATION_BUCKETS)).observe(
+                    DURATION_BUCKETS, elapsed)
+                if payload[0]:
+                    self._payloads.setdefault(key, _Histogram(PAYLOAD_BUCKETS)).observe(
+                        PAYLOAD_BUCKETS, payload[0])
+
+    def collection(self, array, name, metrics):
+        """
+        Yield the metric families returned by calling metrics, recording
+        the time spent producing them, which includes the REST calls the
+        metric classes issue when built but leaves out the time the
+        consumer of the families takes between them, and the number of
+        their samples.
+        """
+        key = (array, name)
+        elapsed = 0.0
+        samples = {}
+        families = None
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    if families is None:
+                        families = iter(metrics())
+                    family = next(families)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.monotonic() - start
+                compact = getattr(family, 'compact_samples', None)
+                # Families yielded in chunks are counted together
+                samples[family.name] = (samples.get(family.name, 0) +
+                                        len(compact if compact is not None else family.samples))
+                yield family
+        except Exception:
+            with self._lock:
+                self._collection_errors[key] = self._collection_errors.get(key, 0) + 1
+            raise
+        finally:
+            with self._lock:
+                self._collections.setdefault(key, _Histogram(DURATION_BUCKETS)).observe(
+                    DURATION_BUCKETS, elapsed)
+                for family, count in samples.items():
+                    self._samples[(array, family)] = count
+
+    def collect(self):
+        with self._lock:
+            durations = [(k, h.buckets(DURATION_BUCKETS), h.sum) for k, h in self._durations.items()]
+            payloads = [(k, h.buckets(PAYLOAD_BUCKETS), h.sum) for k, h in self._payloads.items()]
+            errors = list(self._errors.items())
+            collections = [(k, h.buckets(DURATION_BUCKETS), h.sum) for k, h in self._collections.items()]
+            collection_errors = list(self._collection_errors.items())
+            samples = list(self._samples.items())
+
+        family = HistogramMetricFamily(self.prefix + '_exporter_rest_call_duration_seconds',
+                                       'Duration of the REST calls to the arrays',
+                                       labels=['array', 'method'])
+        for labels, buckets, total in durations:
+            family.add_metric(labels, buckets, total)
+        yield family
+        family = HistogramMetricFamily(self.prefix + '_exporter_rest_call_response_bytes',
+                                       'Size of the responses of the REST calls to the arrays',
+                                       labels=['array', 'method'])
+        for labels, buckets, total in payloads:
+            family.add_metric(labels, buckets, total)
+        yield family
+        family = CounterMetricFamily(self.prefix + '_exporter_rest_call_errors',
+                                     'Number of failed REST calls to the arrays',
+                                     labels=['array', 'method'])
+        for labels, value in errors:
+            family.add_metric(labels, value)
+        yield family
+        family = HistogramMetricFamily(self.prefix + '_exporter_collection_duration_seconds',
+                                       'Time taken to collect the metrics of each metric class',
+                                       labels=['array', 'collector'])
+        for labels, buckets, total in collections:
+            family.add_metric(labels, buckets, total)
+        yield family
+        family = CounterMetricFamily(self.prefix + '_exporter_collection_errors',
+                                     'Number of failed collections of each metric class',
+                                     labels=['array', 'collector'])
+        for labels, value in collection_errors:
+            family.add_metric(labels, value)
+        yield family
+        family = GaugeMetricFamily(self.prefix + '_exporter_samples',
+                                   'Number of samples of each metric family at the last collection',
+                                   labels=['array', 'family'])
+        for labels, value in samples:
+            family.add_metric(labels, value)
+        yield family
+
@@ -0,0 +1,164 @@
+import itertools
+import logging
+import threading
+import time
+from prometheus_client.core import GaugeMetricFamily
+
+
+logger = logging.getLogger(__name__)
+
+# Targets not scraped for this many polling intervals are no longer polled
+DEFAULT_EXPIRY_INTERVALS = 10
+
+
+class Snapshot():
+    """
+    Result of a collection from an array, holding the collected metric
+    families and the time the collection completed. The families are
+    collected lazily, as they are first read, and kept, so that many
+    consumers can read the snapshot at once: each one is handed the
+    families already collected and then follows the collection, which is
+    never run twice. The output can thus be rendered while the array is
+    still being collected.
+    Provides a 'collect' method, so that it can be registered in a
+    Prometheus client registry in place of the array collector.
+    """
+    _versions = itertools.count(1)
+
+    def __init__(self, families):
+        self.families = []
+        self.timestamp = None
+        self.error = None
+        self.version = next(Snapshot._versions)
+        self._source = iter(families)
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        """Whether all the families have been collected, or the collection failed."""
+        return self._source is None
+
+    def age(self):
+        return time.time() - self.timestamp
+
+    def _family(self, i):
+        """
+        Return the i-th family, collecting the families up to it if not
+        collected yet, or None if the collection ended before it. Raise the
+        error of a failed collection.
+        """
+        if i < len(self.families):
+            return self.families[i]
+        with self._lock:
+            while i >= len(self.families):
+                if self.error is not None:
+                    raise self.error
+                if self._source is None:
+                    return None
+                try:
+                    self.families.append(next(self._source))
+                except StopIteration:
+                    self._source = None
+                    self.timestamp = time.time()
+                except Exception as e:
+                    self._source = None
+                    self.error = e
+                    raise
+            return self.families[i]
+
+    def fill(self):
+        """
+        Collect all the families not collected yet and return the snapshot.
+        Raise the error of a failed collection.
+        """
+        while self._family(len(self.families)) is not None:
+            pass
+        return self
+
+    def collect(self):
+        i = 0
+        family = self._family(i)
+        while family is not None:
+            yield family
+            i += 1
+            family = self._family(i)
+        # The collection time, unlike the age, keeps the output of the
+        # snapshot the same every time it is rendered
+        yield GaugeMetricFamily('pure_exporter_snapshot_timestamp_seconds',
+                                'Time the array data served by the exporter was collected',
+                                value=self.timestamp)
+
+
+class _Target():
+    """
+    Array polled in background, with its latest snapshot
+    """
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.snapshot = None
+        self.error = None
+        self.ready = threading.Event()
+        self.last_scrape = time.monotonic()
+
+
+class Poller():
+    """
+    Background polling engine that decouples the Prometheus scrapes from the
+    collection of the array data. Each array is registered the first time it
+    is scraped and it is then collected every 'interval' seconds by its own
+    worker thread, while the scrapes are served from the latest snapshot.
+    Arrays that have not been scraped for 'expiry' seconds are dropped.
+    :param interval: seconds between two collections of the same array.
+    :type interval: int
+    :param expiry: seconds after the last scrape for which an array is
+                   still polled.
+    :type expiry: int
+    """
+    def __init__(self, interval, expiry=None):
+        self.interval = interval
+        self.expiry = expiry or interval * DEFAULT_EXPIRY_INTERVALS
+        self._targets = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, name, factory, timeout=None):
+        """
+        Return the latest snapshot of the array identified by key, registering
+        the array for background polling if it is not polled yet. factory is
+        called with no arguments to build the array collector.
+        The first time an array is requested, wait up to timeout seconds for
+        its first collection to complete.
+        """
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:
+                target = _Target(name, factory)
+                self._targets[key] = target
+                threading.Thread(target=self._run, args=(key, target),
+                                 name='poller-{}'.format(name),
+                                 daemon=True).start()
+            target.last_scrape = time.monotonic()
+        if not target.ready.wait(timeout):
+            raise TimeoutError('first collection of {} still in progress'.format(name))
+        snapshot = target.snapshot
+        if snapshot is None:
+            raise target.error
+        return snapshot
+
+    def _run(self, key, target):
+        while True:
+            start = time.monotonic()
+            with self._lock:
+                if start - target.last_scrape > self.expiry:
+                    del self._targets[key]
+                    logger.info('%s: not scraped anymore, polling stopped', target.name)
+                    return
+            try:
+                target.snapshot = Snapshot(target.factory().collect()).fill()
+                target.error = None
+            except Exception as e:
+                # Keep serving the previous snapshot, which gets older
+                logger.warning('%s: %s', target.name, str(e))
+                target.error = e
+            target.ready.set()
+            time.sleep(max(0, self.interval - (time.monotonic() - start)))
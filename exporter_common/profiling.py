@@ -0,0 +1,198 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Seconds between two stack samples of the sampling profiler
+DEFAULT_SAMPLING_INTERVAL = 0.005
+
+# Categories of the functions of a profile, by path fragment of their module
+# or, for the built-in functions, by fragment of their name
+_CATEGORIES = (
+    ('REST client', ('purestorage', 'purity_fb', 'requests', 'urllib3', 'aiohttp',
+                     'http', 'ssl', 'socket', 'json', 'email', 'six.py', 'selectors')),
+    ('serialization', ('exposition', 'prometheus_client')),
+    ('waiting for workers', ('acquire', 'threading.py', 'concurrent')),
+)
+
+
+def _category(path, name):
+    """Return the category of a function of a profile."""
+    if path.endswith('_metrics.py') or path.endswith('compact_metric_family.py'):
+        return 'metric classes'
+    if ('flasharray_metrics' in path or 'flashblade_metrics' in path or
+            path.endswith('session_pool.py') or path.endswith('instrumentation.py')):
+        return 'array wrapper'
+    where = name if path == '~' else path
+    for category, fragments in _CATEGORIES:
+        if any(f in where for f in fragments):
+            return category
+    return 'other'
+
+
+def _frame_name(code):
+    # The module is named by its package and file, e.g. requests/sessions.py
+    path = '/'.join(code.co_filename.replace(os.sep, '/').split('/')[-2:])
+    return '{} ({}:{})'.format(code.co_name, path, code.co_firstlineno)
+
+
+class _ProfiledExecutor(ThreadPoolExecutor):
+    """
+    Thread pool running every task under the profiler
+    """
+    def __init__(self, profiler, max_workers):
+        super().__init__(max_workers=max_workers)
+        self._profiler = profiler
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(self._profiler.run, fn, *args, **kwargs)
+
+
+class Profiler():
+    """
+    Profile of the work done for a single scrape, possibly spread over
+    several threads. Each function given to run, and each task of the
+    thread pools returned by executor, is profiled either deterministically
+    by cProfile, the profiles of all the threads being merged at the end,
+    or by sampling the stacks of the threads running them every interval
+    seconds, which gives the collapsed stacks used to draw flame graphs.
+    :param sampling: sample the thread stacks instead of using cProfile.
+    :type sampling: bool
+    :param interval: seconds between two stack samples.
+    :type interval: float
+    """
+    def __init__(self, sampling=False, interval=DEFAULT_SAMPLING_INTERVAL):
+        self.sampling = sampling
+        self.interval = interval
+        self.phases = []
+        self._profiles = []
+        self._stacks = Counter()
+        self._threads = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        if self.sampling:
+            self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            with self._lock:
+                threads = set(self._threads)
+            for ident, frame in sys._current_frames().items():
+                if ident not in threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+
+    def executor(self, max_workers):
+        """Return a thread pool whose tasks are profiled."""
+        return _ProfiledExecutor(self, max_workers)
+
+    def run(self, func, *args, **kwargs):
+        """Call func under the profiler and return its result."""
+        if getattr(self._local, 'active', False):
+            # Already profiled by an outer call in this thread
+            return func(*args, **kwargs)
+        self._local.active = True
+        try:
+            if self.sampling:
+                ident = threading.get_ident()
+                with self._lock:
+                    self._threads.add(ident)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self._threads.discard(ident)
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self._lock:
+                    self._profiles.append(profile)
+        finally:
+            self._local.active = False
+
+    def phase(self, name, func, *args, **kwargs):
+        """Call func under the profiler, recording its wall time as a phase."""
+        start = time.monotonic()
+        try:
+            return self.run(func, *args, **kwargs)
+        finally:
+            self.phases.append((name, time.monotonic() - start))
+
+    def stats(self):
+        """Return the pstats.Stats of the merged cProfile profiles."""
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def pstats_dump(self):
+        """Return the profile in the format written by pstats dump_stats."""
+        return marshal.dumps(self.stats().stats)
+
+    def collapsed(self):
+        """Return the sampled stacks in the collapsed stack format."""
+        return ''.join('{} {}\n'.format(stack, count)
+                       for stack, count in sorted(self._stacks.items()))
+
+    def summary(self, top=30, title=''):
+        """
+        Return a text summary of the profile: the wall time of each phase,
+        the time spent by category of code, and, for cProfile profiles, the
+        top functions by own and by cumulative time.
+        """
+        out = io.StringIO()
+        if title:
+            out.write(title + '\n\n')
+        for name, elapsed in self.phases:
+            out.write('{:<24} {:9.3f} s wall time\n'.format(name, elapsed))
+
+        categories = Counter()
+        if self.sampling:
+            unit = 'samples'
+            for stack, count in self._stacks.items():
+                leaf = stack.rsplit(';', 1)[-1]
+                name, _, where = leaf.rpartition(' (')
+                categories[_category(where.rsplit(':', 1)[0], name)] += count
+        else:
+            unit = 's'
+            stats = self.stats()
+            for (path, _, name), (_, _, tottime, _, _) in stats.stats.items():
+                categories[_category(path, name)] += tottime
+        total = sum(categories.values()) or 1
+        out.write('\nOwn time by category, over all the profiled threads:\n')
+        for category, value in categories.most_common():
+            out.write('  {:<24} {:>9.3f} {:<8} {:5.1f}%\n'.format(
+                category, value, unit, 100.0 * value / total))
+
+        if not self.sampling:
+            for key in ('tottime', 'cumulative'):
+                out.write('\nTop {} functions by {}:\n'.format(top, key))
+                stats = self.stats()
+                stats.stream = out
+                stats.sort_stats(key).print_stats(top)
+        return out.getvalue()
@@ -0,0 +1,80 @@
+import gzip
+import threading
+from collections import OrderedDict
+from .singleflight import SingleFlight
+
+
+# Maximum size in bytes of the bodies kept in the cache
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# Compression level of the gzip copies, trading ratio for speed
+GZIP_LEVEL = 6
+
+
+class RenderedBody():
+    """
+    Exposition body rendered from a snapshot, with a gzip compressed copy
+    built the first time it is requested.
+    """
+    def __init__(self, snapshot, body):
+        self.version = snapshot.version
+        self.etag = '{:x}-{:x}'.format(int(snapshot.timestamp * 1e6), snapshot.version)
+        self.body = body
+        self._gzipped = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.body) + len(self._gzipped or b'')
+
+    def gzipped(self):
+        with self._lock:
+            if self._gzipped is None:
+                self._gzipped = gzip.compress(self.body, GZIP_LEVEL)
+        return self._gzipped
+
+
+class RenderCache():
+    """
+    Cache of the exposition bodies rendered from the latest snapshot of each
+    target, so that repeated scrapes of unchanged data are answered with
+    the same bytes instead of rendering them again. Only the body of the
+    latest snapshot version is kept for each key, and the least recently
+    used bodies are dropped once the cache exceeds max_bytes.
+    :param max_bytes: maximum size of the cached bodies and their gzip
+                      copies.
+    :type max_bytes: int
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, key, snapshot, render, compressed=False):
+        """
+        Return the RenderedBody of snapshot for key, calling render with the
+        snapshot to build the body if not cached yet. If compressed is True,
+        the gzip copy of the body is built as well.
+        """
+        with self._lock:
+            rendered = self._bodies.get(key)
+            if rendered is not None and rendered.version == snapshot.version:
+                self._bodies.move_to_end(key)
+            else:
+                rendered = None
+        if rendered is None:
+            # Concurrent scrapes of a new snapshot render it only once
+            rendered = self._flights.do((key, snapshot.version),
+                                        lambda: RenderedBody(snapshot, render(snapshot)))
+        if compressed:
+            rendered.gzipped()
+        with self._lock:
+            current = self._bodies.get(key)
+            if current is None or current.version <= rendered.version:
+                self._bodies[key] = rendered
+                self._bodies.move_to_end(key)
+            size = sum(b.size for b in self._bodies.values())
+            while size > self.max_bytes and len(self._bodies) > 1:
+                size -= self._bodies.popitem(last=False)[1].size
+        return rendered
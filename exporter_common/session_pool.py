@@ -0,0 +1,179 @@
+import abc
+import contextlib
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_MAX_SIZE = 256
+DEFAULT_IDLE_TTL = 900
+
+
+class _Session():
+    """
+    Authenticated REST session to a single array
+    """
+    def __init__(self, client):
+        self.client = client
+        self.last_used = time.monotonic()
+        # Number of scrapes using the session, which is not closed meanwhile
+        self.users = 0
+        # Array data cached across scrapes, sharing the session lifetime
+        self.cache = {}
+
+
+class SessionPool(abc.ABC):
+    """
+    Process-wide pool of authenticated array REST sessions, keyed by array
+    endpoint and hashed api token, so that consecutive scrapes of the same
+    array reuse a warm session instead of logging in every time.
+    A session is in use from get() until release() is called with its
+    client. Sessions idle for more than idle_ttl seconds are closed, and
+    the least recently used session is evicted once the pool holds
+    max_size sessions. Sessions in use are never closed by the pool, which
+    may then temporarily hold more than max_size sessions.
+    The REST calls in flight against an array, through any of its
+    sessions and from all the scrapes, are bounded by the semaphore
+    returned by limit() for its endpoint.
+    Subclasses log in to and out of the arrays of their type by
+    implementing _login() and _logout().
+    :param max_size: maximum number of sessions kept in the pool.
+    :type max_size: int
+    :param idle_ttl: seconds after which an unused session is closed.
+    :type idle_ttl: int
+    :param max_calls: maximum number of REST calls in flight against a
+                      single array, None for no limit.
+    :type max_calls: int
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, idle_ttl=DEFAULT_IDLE_TTL,
+                 max_calls=None):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.max_calls = max_calls
+        self._sessions = OrderedDict()
+        # Sessions in use, by id of their client
+        self._in_use = {}
+        # REST call semaphores, by endpoint of the pooled sessions
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(endpoint, api_token):
+        return (endpoint, hashlib.sha256(api_token.encode('utf-8')).hexdigest())
+
+    @abc.abstractmethod
+    def _login(self, endpoint, api_token):
+        """Return a client logged in to the array."""
+
+    @abc.abstractmethod
+    def _logout(self, client):
+        """Close the session of a client, ignoring the errors."""
+
+    def _expire(self, now, reserve=0):
+        """
+        Remove from the pool the sessions that have been idle for too long,
+        and the least recently used ones until there is room for reserve
+        new sessions, skipping the sessions in use. Must be called with the
+        pool lock held.
+        """
+        expired = []
+        for key, session in list(self._sessions.items()):
+            if (now - session.last_used < self.idle_ttl and
+                    len(self._sessions) + reserve <= self.max_size):
+                break
+            if session.users == 0:
+                expired.append(self._sessions.pop(key))
+        if expired:
+            endpoints = set(endpoint for endpoint, _ in self._sessions)
+            for endpoint in [e for e in self._limits if e not in endpoints]:
+                del self._limits[endpoint]
+        return expired
+
+    def _checkout(self, session, now):
+        """Mark a session as in use. Must be called with the pool lock held."""
+        session.last_used = now
+        session.users += 1
+        self._in_use[id(session.client)] = session
+
+    def get(self, endpoint, api_token):
+        """
+        Return an authenticated client for the given array, logging in only
+        if no warm session is available. The session is in use until
+        release() is called with the client.
+        """
+        key = self._key(endpoint, api_token)
+        with self._lock:
+            now = time.monotonic()
+            expired = self._expire(now)
+            session = self._sessions.get(key)
+            if session is not None:
+                self._checkout(session, now)
+                self._sessions.move_to_end(key)
+        for s in expired:
+            self._logout(s.client)
+        if session is not None:
+            return session.client
+
+        # Log in outside of the lock, as it requires a few round trips
+        session = _Session(self._login(endpoint, api_token))
+        with self._lock:
+            current = self._sessions.get(key)
+            if current is None:
+                expired = self._expire(time.monotonic(), reserve=1)
+                self._sessions[key] = session
+            else:
+                # Another scrape logged in meanwhile, use its session
+                expired = [session]
+                session = current
+            self._checkout(session, time.monotonic())
+        for s in expired:
+            self._logout(s.client)
+        return session.client
+
+    def release(self, client):
+        """
+        End the use of the session of a client returned by get(), which
+        may be closed from then on.
+        """
+        with self._lock:
+            session = self._in_use.get(id(client))
+            if session is None:
+                return
+            session.users -= 1
+            if session.users == 0:
+                del self._in_use[id(client)]
+
+    def limit(self, endpoint):
+        """
+        Return the semaphore bounding to max_calls the REST calls in flight
+        against the array at endpoint, shared by all its sessions, to be
+        held by every call issued through a session of the array while in
+        use. Return a context doing nothing if max_calls is None.
+        """
+        if self.max_calls is None:
+            return contextlib.nullcontext()
+        with self._lock:
+            limit = self._limits.get(endpoint)
+            if limit is None:
+                limit = self._limits[endpoint] = threading.BoundedSemaphore(self.max_calls)
+        return limit
+
+    def cache(self, endpoint, api_token):
+        """
+        Return the dictionary of data cached across scrapes for the given
+        array, or an empty one if the array has no pooled session.
+        """
+        with self._lock:
+            session = self._sessions.get(self._key(endpoint, api_token))
+        return session.cache if session is not None else {}
+
+    def clear(self):
+        """Close all the pooled sessions, including the ones in use."""
+        with self._lock:
+            expired = list(self._sessions.values())
+            self._sessions.clear()
+            self._in_use.clear()
+            self._limits.clear()
+        for s in expired:
+            self._logout(s.client)
@@ -0,0 +1,73 @@
+import threading
+import weakref
+
+
+class _Call():
+    """
+    Collection in flight, with its outcome once completed
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    """
+    Coalesce concurrent requests for the same data. While a call for a given
+    key is in flight, later callers with the same key do not issue their own
+    call but wait for the in-flight one and share its result. Callers
+    arriving after the call completed start a new one, so no cached, stale
+    result is ever returned.
+    """
+    def __init__(self):
+        self._calls = {}
+        # Snapshots being collected, dropped once no one reads them
+        self._snapshots = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Call func with no arguments and return its result, unless a call
+        for key is already in flight, in which case wait for its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def share(self, key, func):
+        """
+        Call func with no arguments and return the lazily collected
+        Snapshot it returns, unless a snapshot for key is still being
+        collected, in which case return that one. Unlike with do(), later
+        callers join the collection until its last family is collected,
+        not only until func returns, as long as the snapshot is being read.
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+        if snapshot is not None and not snapshot.done:
+            return snapshot
+        snapshot = self.do(key, func)
+        with self._lock:
+            current = self._snapshots.get(key)
+            if current is None or current.done:
+                self._snapshots[key] = snapshot
+        return snapshot
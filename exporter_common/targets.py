@@ -0,0 +1,148 @@
+import os
+import threading
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+ARRAY_TYPES = {
+    'fa': 'flasharray',
+    'flasharray': 'flasharray',
+    'fb': 'flashblade',
+    'flashblade': 'flashblade',
+}
+
+TIERS = ('inventory', 'hardware', 'space', 'usage', 'performance')
+
+
+class Target():
+    """
+    Array of the target registry, scraped by name
+    """
+    def __init__(self, name, array_type, address, token, refresh_intervals):
+        self.name = name
+        self.array_type = array_type
+        self.address = address
+        self.token = token
+        self.refresh_intervals = refresh_intervals
+
+    def __eq__(self, other):
+        return isinstance(other, Target) and vars(self) == vars(other)
+
+
+def _token(name, entry, basedir):
+    refs = [k for k in ('token', 'token_file', 'token_env') if k in entry]
+    if len(refs) != 1:
+        raise ValueError("target '{}': exactly one of token, token_file "
+                         "and token_env is required".format(name))
+    if 'token_file' in entry:
+        path = os.path.join(basedir, str(entry['token_file']))
+        with open(path) as f:
+            return f.read().strip()
+    if 'token_env' in entry:
+        token = os.environ.get(str(entry['token_env']))
+        if not token:
+            raise ValueError("target '{}': environment variable {} is not set"
+                             .format(name, entry['token_env']))
+        return token.strip()
+    return str(entry['token'])
+
+
+def _target(name, entry, basedir):
+    if not isinstance(entry, dict):
+        raise ValueError("target '{}': not a mapping".format(name))
+    array_type = ARRAY_TYPES.get(str(entry.get('type', '')).lower())
+    if array_type is None:
+        raise ValueError("target '{}': type must be one of {}"
+                         .format(name, ', '.join(ARRAY_TYPES)))
+    address = entry.get('address')
+    if not address:
+        raise ValueError("target '{}': address is required".format(name))
+    intervals = entry.get('refresh_intervals') or {}
+    if not isinstance(intervals, dict) or not set(intervals) <= set(TIERS):
+        raise ValueError("target '{}': refresh_intervals keys must be among {}"
+                         .format(name, ', '.join(TIERS)))
+    return Target(name, array_type, str(address), _token(name, entry, basedir),
+                  {tier: int(v) for tier, v in intervals.items()})
+
+
+def parse(path):
+    """
+    Parse a target registry file and return its targets and groups, as
+    dictionaries by name. Raise ValueError if the file is not valid.
+    """
+    if yaml is None:
+        raise RuntimeError('The target registry requires the PyYAML package')
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    basedir = os.path.dirname(os.path.abspath(path))
+    targets = {}
+    for name, entry in (config.get('targets') or {}).items():
+        targets[str(name)] = _target(str(name), entry, basedir)
+    groups = {}
+    for name, members in (config.get('groups') or {}).items():
+        if not isinstance(members, list):
+            raise ValueError("group '{}': not a list of targets".format(name))
+        for member in members:
+            if str(member) not in targets:
+                raise ValueError("group '{}': unknown target '{}'".format(name, member))
+        groups[str(name)] = [str(m) for m in members]
+    return targets, groups
+
+
+class TargetRegistry():
+    """
+    Registry of the arrays known to the exporter, loaded from a YAML file
+    mapping each target name to the array type, address, API token reference
+    and optional refresh intervals, with optional named groups of targets:
+
+        targets:
+          fa-prod-01:
+            type: flasharray
+            address: fa-prod-01.example.com
+            token_file: fa-prod-01.token
+            refresh_intervals:
+              space: 300
+        groups:
+          prod: [fa-prod-01]
+
+    The token is given either inline (token), as the path of a file holding
+    it (token_file, relative to the registry file) or as the name of an
+    environment variable (token_env). The registry can be loaded again at
+    any time, the targets and groups being replaced at once, and only if the
+    whole file is valid.
+    :param path: path of the registry file.
+    :type path: str
+    """
+    def __init__(self, path):
+        self.path = path
+        self._state = ({}, {})
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the registry file and return the targets added or changed
+        since the previous load.
+        """
+        with self._lock:
+            targets, groups = parse(self.path)
+            current = self._state[0]
+            changed = [t for name, t in targets.items() if current.get(name) != t]
+            self._state = (targets, groups)
+        return changed
+
+    def get(self, name):
+        """Return the target of the given name, or None if unknown."""
+        return self._state[0].get(name)
+
+    def group(self, name):
+        """Return the targets of the given group, or None if unknown."""
+        targets, groups = self._state
+        if name not in groups:
+            return None
+        return [targets[member] for member in groups[name]]
+
+    def __len__(self):
+        return len(self._state[0])
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Record the REST calls of a scrape of a real array to a cassette, and
+replay the cassette offline through the collector.
+
+The record command scrapes an array once with every refresh tier fetched,
+through the same collector as the exporter, and writes the method,
+parameters, response and duration of each REST call to a gzip compressed
+cassette. The API token is read from the PURE_API_TOKEN environment
+variable, or prompted for, and is not recorded. With --scrub, the serial
+numbers and the ids of the array objects are replaced by pseudonyms.
+
+The replay command scrapes the cassette instead of the array, each call
+taking its recorded duration multiplied by --scale, 0 to answer at once,
+and reports the wall time, the number of replayed calls and the size of
+the exposition of each run. With --profile, the last run is profiled as
+by the /debug/profile endpoint of the exporter.
+
+Run from the repository root:
+    python extra/benchmarks/cassettes.py record flasharray array01.example.com fa01.json.gz --scrub
+    python extra/benchmarks/cassettes.py replay fa01.json.gz --scale 0 --runs 5 --profile
+"""
+
+import argparse
+import getpass
+import os
+import sys
+import time
+
+from stored_results import ROOT
+sys.path.insert(0, ROOT)
+
+from exporter_common import Profiler, Snapshot, generate_text  # noqa: E402
+import flasharray_collector  # noqa: E402
+from flasharray_collector.flasharray_collector import DEFAULT_MAX_WORKERS  # noqa: E402
+import flashblade_collector  # noqa: E402
+
+PACKAGES = {'flasharray': flasharray_collector, 'flashblade': flashblade_collector}
+COLLECTORS = {'flasharray': flasharray_collector.FlasharrayCollector,
+              'flashblade': flashblade_collector.FlashbladeCollector}
+
+
+def record(args):
+    token = os.environ.get('PURE_API_TOKEN') or getpass.getpass('API token: ')
+    cassette = PACKAGES[args.array_type].Cassette(
+        scrub=args.scrub, info={'endpoint': args.endpoint, 'm_type': args.m_type,
+                                'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())})
+    start = time.perf_counter()
+    collector = COLLECTORS[args.array_type](args.endpoint, token, args.m_type, cassette=cassette)
+    body = b''.join(generate_text(Snapshot(collector.collect())))
+    elapsed = time.perf_counter() - start
+    cassette.save(args.output)
+    print('Recorded {} REST calls in {:.2f} s, {:.2f} MiB of metrics, to {} ({:.2f} MiB)'.format(
+          len(cassette), elapsed, len(body) / 2**20, args.output,
+          os.path.getsize(args.output) / 2**20))
+
+
+def replay(args):
+    cassette = None
+    for package in PACKAGES.values():
+        try:
+            cassette = package.Cassette.load(args.cassette, args.scale)
+            break
+        except ValueError:
+            continue
+    if cassette is None:
+        sys.exit('{} is not a cassette'.format(args.cassette))
+    array_type = cassette.info['array_type']
+    m_type = args.m_type or cassette.info.get('m_type', 'all')
+    print('{} {} cassette of {}, recorded {}{}'.format(
+          cassette.info['calls'], array_type, cassette.info.get('endpoint'),
+          cassette.info.get('date'), ', scrubbed' if cassette.info.get('scrubbed') else ''))
+
+    print('{:>4} {:>9} {:>6} {:>10}'.format('run', 'time (s)', 'calls', 'size (MiB)'))
+    for run in range(args.runs):
+        cassette.rewind()
+        profiler = Profiler() if args.profile and run == args.runs - 1 else None
+
+        def collect():
+            c = COLLECTORS[array_type](cassette.info.get('endpoint'), '', m_type, cassette=cassette)
+            if profiler is not None and array_type == 'flasharray':
+                c.fa.executor = profiler.executor(DEFAULT_MAX_WORKERS)
+            return Snapshot(c.collect()).fill()
+
+        start = time.perf_counter()
+        if profiler is not None:
+            with profiler:
+                snapshot = profiler.phase('collection', collect)
+                body = profiler.phase('rendering', lambda: b''.join(generate_text(snapshot)))
+        else:
+            body = b''.join(generate_text(collect()))
+        print('{:>4} {:>9.2f} {:>6} {:>10.2f}'.format(
+              run + 1, time.perf_counter() - start, cassette.replayed, len(body) / 2**20))
+    if cassette.missed:
+        print('\n{} calls not found in the cassette, recorded with another metrics type'
+              ' or version of the collector:'.format(sum(cassette.missed.values())))
+        for key in sorted(cassette.missed):
+            print('  ' + key)
+    if args.profile:
+        print('\n' + profiler.summary(args.top, 'Profile of the {} metrics of {}, scale {}'.format(
+              m_type, args.cassette, args.scale)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay of array REST calls')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    rec = commands.add_parser('record', help='record a scrape of an array')
+    rec.add_argument('array_type', choices=sorted(COLLECTORS))
+    rec.add_argument('endpoint', help='address of the array management interface')
+    rec.add_argument('output', help='path of the cassette, e.g. array01.json.gz')
+    rec.add_argument('--m-type', default='all', help='metrics type (default: all)')
+    rec.add_argument('--scrub', action='store_true',
+                     help='replace the serial numbers and ids with pseudonyms')
+    rec.set_defaults(func=record)
+    rep = commands.add_parser('replay', help='replay the scrape of a cassette')
+    rep.add_argument('cassette')
+    rep.add_argument('--m-type', help='metrics type (default: the recorded one)')
+    rep.add_argument('--scale', type=float, default=1.0,
+                     help='factor of the recorded durations of the calls, 0 not to wait')
+    rep.add_argument('--runs', type=int, default=1, help='number of scrapes')
+    rep.add_argument('--profile', action='store_true', help='profile the last scrape')
+    rep.add_argument('--top', type=int, default=30, help='number of top functions profiled')
+    rep.set_defaults(func=replay)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Benchmark of the throughput of concurrent scrapes of many arrays.
+
+Starts the exporter in the gunicorn setup of the Docker image, two sync
+workers, and in the ASGI serving mode, a single uvicorn process, then
+scrapes the /metrics/flasharray/volumes endpoint of N_ARRAYS distinct
+arrays at once, as a Prometheus server does at each scrape interval. The
+arrays are synthetic and answer each REST call after LATENCY seconds, so
+that the results reflect how many scrapes each setup keeps in flight
+rather than the speed of a real array. Reports the time to complete all
+the scrapes and the median and slowest scrape durations.
+
+Requires gunicorn and uvicorn. Run from the repository root:
+    python extra/benchmarks/concurrent_scrapes.py
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+
+N_ARRAYS = 150
+N_VOLUMES = 200
+LATENCY = 0.1
+TOKEN = '01234567-0123-0123-0123-0123456789ab'
+
+
+class SlowArray():
+    """Minimal stand-in for purestorage.FlashArray answering after a delay."""
+    def __init__(self, endpoint, **kwargs):
+        self.names = ['vol{}'.format(i) for i in range(N_VOLUMES)]
+
+    def list_volumes(self, **kwargs):
+        time.sleep(LATENCY)
+        if kwargs.get('protocol_endpoint'):
+            return []
+        if kwargs.get('space'):
+            return [{'name': n, 'size': i, 'volumes': i, 'snapshots': i,
+                     'total': i, 'data_reduction': 1.5}
+                    for i, n in enumerate(self.names)]
+        if kwargs.get('action'):
+            return [{'name': n, 'reads_per_sec': i, 'writes_per_sec': i,
+                     'usec_per_read_op': i, 'usec_per_write_op': i,
+                     'output_per_sec': i, 'input_per_sec': i}
+                    for i, n in enumerate(self.names)]
+        return [{'name': n, 'serial': '{:024X}'.format(i)}
+                for i, n in enumerate(self.names)]
+
+    def list_vgroups(self, **kwargs):
+        time.sleep(LATENCY)
+        return []
+
+    def invalidate_cookie(self):
+        pass
+
+
+def _patch():
+    import purestorage
+    purestorage.FlashArray = SlowArray
+
+
+def wsgi_app():
+    """Application factory of the gunicorn setup."""
+    _patch()
+    import pure_exporter
+    return pure_exporter.app
+
+
+def asgi_app():
+    """Application factory of the ASGI serving mode."""
+    _patch()
+    import pure_exporter_asgi
+    return pure_exporter_asgi.app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start(command, port):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen('http://127.0.0.1:{}/'.format(port), timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('server did not start: {}'.format(' '.join(command)))
+
+
+def scrape(port, array):
+    url = 'http://127.0.0.1:{}/metrics/flasharray/volumes?endpoint=array{}'.format(port, array)
+    req = urllib.request.Request(url, headers={'Authorization': 'Bearer ' + TOKEN})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        size = len(resp.read())
+    return time.perf_counter() - start, size
+
+
+def measure(port):
+    with ThreadPoolExecutor(max_workers=N_ARRAYS) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda a: scrape(port, a), range(N_ARRAYS)))
+        elapsed = time.perf_counter() - start
+    durations = sorted(d for d, _ in results)
+    return elapsed, durations[len(durations) // 2], durations[-1]
+
+
+def main():
+    setups = (
+        ('gunicorn sync', lambda port: [
+            sys.executable, '-m', 'gunicorn', '--workers=2',
+            '--bind=127.0.0.1:{}'.format(port), 'concurrent_scrapes:wsgi_app()']),
+        ('asgi', lambda port: [
+            sys.executable, '-m', 'uvicorn', '--factory', '--log-level=warning',
+            '--port={}'.format(port), 'concurrent_scrapes:asgi_app']),
+    )
+    print('{} arrays of {} volumes, {:.0f} ms per REST call'.format(
+          N_ARRAYS, N_VOLUMES, LATENCY * 1000))
+    print('{:>14} {:>10} {:>12} {:>12} {:>12}'.format(
+          'server', 'time (s)', 'scrapes/s', 'median (s)', 'max (s)'))
+    for name, command in setups:
+        port = free_port()
+        server = start(command(port), port)
+        try:
+            elapsed, median, slowest = measure(port)
+        finally:
+            server.terminate()
+            server.wait()
+        print('{:>14} {:>10.2f} {:>12.1f} {:>12.2f} {:>12.2f}'.format(
+              name, elapsed, N_ARRAYS / elapsed, median, slowest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Benchmark of the exposition formats served by the exporter.
+
+Renders the volume metrics of a synthetic array of 10k volumes, collected
+once, in the Prometheus text, OpenMetrics text and Prometheus protobuf
+formats, and reports the best encoding time of a few runs together with
+the size of the output, plain and gzip compressed.
+
+Run from the repository root:
+    python extra/benchmarks/exposition_formats.py
+"""
+
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import purestorage
+from flasharray_collector import FlasharrayCollector
+from exporter_common import FORMATS, Snapshot
+from text_exposition import N_VOLUMES, SyntheticArray
+
+
+def measure(render, snapshot, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = b''.join(render(snapshot))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    array = SyntheticArray(N_VOLUMES)
+    # Serve the synthetic array in place of a real session
+    purestorage.FlashArray = lambda endpoint, **kwargs: array
+    snapshot = Snapshot(FlasharrayCollector('synthetic', 'benchmark', 'volumes').collect()).fill()
+
+    print('{:>12} {:>10} {:>12} {:>12}'.format('format', 'time (s)', 'size (MiB)', 'gzip (MiB)'))
+    for fmt, (_, render) in FORMATS.items():
+        elapsed, body = measure(render, snapshot)
+        print('{:>12} {:>10.4f} {:>12.2f} {:>12.2f}'.format(
+              fmt, elapsed, len(body) / 2**20, len(gzip.compress(body, 6)) / 2**20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Benchmark of complete FlashArray scrapes against the mock REST server.
+
+Starts a mock_flasharray server for each fleet size, then, for each
+metrics type, scrapes it twice from a fresh process, through the same
+collector and text exposition as the exporter: the first scrape, as
+after a restart of the exporter, logs in and fetches every refresh
+tier, the second one reuses the pooled session and the cached slow
+changing data. Reports the wall time and the number of REST calls of
+both scrapes, the peak RSS of the scraping process and the size of the
+exposition.
+
+The results are appended to results/flasharray_scrapes.jsonl, tagged
+with the git version of the tree, and compared with the last results
+stored for another version, to make regressions visible.
+
+Run from the repository root:
+    python extra/benchmarks/flasharray_scrapes.py
+    python extra/benchmarks/flasharray_scrapes.py --fleet large --latency 0.05
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import stored_results
+from stored_results import ROOT
+from mock_flasharray import Fleet, MockFlashArray
+from mock_server import mock_stats
+sys.path.insert(0, ROOT)
+
+FLEETS = {
+    'small': dict(volumes=100, hosts=20, vgroups=5, pods=2),
+    'medium': dict(volumes=5000, hosts=500, vgroups=50, pods=10),
+    'large': dict(volumes=50000, hosts=5000, vgroups=200, pods=50),
+}
+M_TYPES = ('array', 'volumes', 'hosts', 'pods', 'all')
+TOKEN = '01234567-0123-0123-0123-0123456789ab'
+
+# Compared figures, with the relative change above which they are flagged
+TOLERANCES = {'cold_s': 0.15, 'warm_s': 0.15, 'cold_calls': 0.0,
+              'warm_calls': 0.0, 'peak_rss_mib': 0.10, 'size_mib': 0.01}
+
+
+def scrape(address, m_type):
+    """Scrape the mock array twice in this process and print the figures as JSON."""
+    from flasharray_collector import FlasharrayCollector
+    from exporter_common import Snapshot, generate_text
+
+    figures = {}
+    for run in ('cold', 'warm'):
+        mock_stats(address, reset=True)
+        start = time.perf_counter()
+        collector = FlasharrayCollector(address, TOKEN, m_type)
+        body = b''.join(generate_text(Snapshot(collector.collect())))
+        figures[run + '_s'] = time.perf_counter() - start
+        figures[run + '_calls'] = mock_stats(address)['calls']
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    figures['peak_rss_mib'] = rss / (2**20 if sys.platform == 'darwin' else 2**10)
+    figures['size_mib'] = len(body) / 2**20
+    print(json.dumps(figures))
+
+
+def measure(address, m_type):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--scrape', address, m_type],
+                         check=True, stdout=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=ROOT))
+    return json.loads(out.stdout.decode().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of FlashArray scrapes')
+    parser.add_argument('--fleet', action='append', choices=sorted(FLEETS),
+                        help='fleet size, repeated for several (default: small and medium)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds taken by the mock array to answer each REST call')
+    parser.add_argument('--no-save', action='store_true', help='do not store the results')
+    parser.add_argument('--scrape', nargs=2, metavar=('ADDRESS', 'M_TYPE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.scrape:
+        return scrape(*args.scrape)
+
+    record = stored_results.new_record(latency=args.latency)
+    print('{:>7} {:>8} {:>9} {:>6} {:>9} {:>6} {:>10} {:>10}'.format(
+          'fleet', 'm_type', 'cold (s)', 'calls', 'warm (s)', 'calls', 'RSS (MiB)', 'size (MiB)'))
+    for name in args.fleet or ['small', 'medium']:
+        server = MockFlashArray(Fleet(**FLEETS[name]), args.latency).start()
+        try:
+            for m_type in M_TYPES:
+                r = dict(measure(server.address, m_type), fleet=name, m_type=m_type)
+                record['results'].append(r)
+                print('{:>7} {:>8} {:>9.2f} {:>6} {:>9.2f} {:>6} {:>10.1f} {:>10.2f}'.format(
+                      name, m_type, r['cold_s'], r['cold_calls'], r['warm_s'],
+                      r['warm_calls'], r['peak_rss_mib'], r['size_mib']))
+        finally:
+            server.stop()
+
+    before = stored_results.previous('flasharray_scrapes', record, ['latency'])
+    if before is not None:
+        stored_results.compare(record, before, ['fleet', 'm_type'], TOLERANCES)
+    if not args.no_save:
+        stored_results.store('flasharray_scrapes', record)
+
+
+if __name__ == '__main__':
+    main()
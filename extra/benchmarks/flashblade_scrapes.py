@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Benchmark of FlashBlade scrapes against the mock REST server.
+
+Starts a mock_flashblade server for each fleet size, then, for the array,
+usage and clients metrics types, scrapes it twice from a fresh process,
+through the same collector and text exposition as the exporter, the
+first scrape logging in and fetching every refresh tier, the second one
+reusing the pooled session and the cached data. Reports the wall time
+and the number of REST calls of both scrapes, the peak RSS of the
+scraping process and the size of the exposition, followed by the time
+spent in each metric class, as recorded by the exporter metrics.
+
+The scrapes must not issue more REST calls than the budget of their
+metrics type, which grows with the number of chunks of file system and
+bucket names, not with the number of file systems and buckets: the
+benchmark exits with status 1 if a per entity call pattern comes back.
+
+The results are appended to results/flashblade_scrapes.jsonl, tagged
+with the git version of the tree, and compared with the last results
+stored for another version with the same latency and transport.
+
+Run from the repository root:
+    python extra/benchmarks/flashblade_scrapes.py
+    python extra/benchmarks/flashblade_scrapes.py --fleet large --transport async --latency 0.05
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import stored_results
+from stored_results import ROOT
+from mock_flashblade import Fleet, MockFlashBlade
+from mock_server import mock_stats
+sys.path.insert(0, ROOT)
+
+from flashblade_collector.flashblade_metrics.flashblade import NAMES_PER_CALL  # noqa: E402
+
+FLEETS = {
+    'small': dict(file_systems=100, buckets=50, clients=200, users_per_fs=5),
+    'medium': dict(file_systems=1000, buckets=500, clients=2000, users_per_fs=10),
+    'large': dict(file_systems=5000, buckets=2000, clients=10000, users_per_fs=20),
+}
+M_TYPES = ('array', 'usage', 'clients')
+TOKEN = 'T-01234567-0123-0123-0123-0123456789ab'
+
+# Compared figures, with the relative change above which they are flagged
+TOLERANCES = {'cold_s': 0.15, 'warm_s': 0.15, 'cold_calls': 0.0,
+              'warm_calls': 0.0, 'peak_rss_mib': 0.10, 'size_mib': 0.01}
+
+
+def call_budget(fleet, m_type):
+    """
+    Return the maximum number of REST calls of a scrape of the metrics
+    type. The array metrics are listed by chunks of names, on top of less
+    than 20 array wide calls, while the usage is still listed per file
+    system, after the file systems.
+    """
+    chunks = (math.ceil(fleet['file_systems'] / NAMES_PER_CALL)
+              + math.ceil(fleet['buckets'] / NAMES_PER_CALL))
+    return {'array': 20 + chunks, 'usage': 1 + 2 * fleet['file_systems'], 'clients': 1}[m_type]
+
+
+def collection_times():
+    """Return the total time spent so far in each metric class."""
+    from flashblade_collector.flashblade_metrics.instrumentation import instrumentation
+
+    times = {}
+    for family in instrumentation.collect():
+        if family.name != instrumentation.prefix + '_exporter_collection_duration_seconds':
+            continue
+        for sample in family.samples:
+            if sample.name.endswith('_sum'):
+                times[sample.labels['collector']] = sample.value
+    return times
+
+
+def scrape(address, m_type, transport):
+    """Scrape the mock array twice in this process and print the figures as JSON."""
+    from flashblade_collector import FlashbladeCollector
+    from exporter_common import Snapshot, generate_text
+
+    figures = {'collectors': {}}
+    for run in ('cold', 'warm'):
+        mock_stats(address, reset=True)
+        before = collection_times()
+        start = time.perf_counter()
+        collector = FlashbladeCollector(address, TOKEN, m_type, transport=transport)
+        body = b''.join(generate_text(Snapshot(collector.collect())))
+        figures[run + '_s'] = time.perf_counter() - start
+        figures[run + '_calls'] = mock_stats(address)['calls']
+        for name, total in collection_times().items():
+            figures['collectors'].setdefault(name, {})[run + '_s'] = total - before.get(name, 0.0)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    figures['peak_rss_mib'] = rss / (2**20 if sys.platform == 'darwin' else 2**10)
+    figures['size_mib'] = len(body) / 2**20
+    print(json.dumps(figures))
+
+
+def measure(address, m_type, transport):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--scrape',
+                          address, m_type, transport],
+                         check=True, stdout=subprocess.PIPE, env=dict(os.environ, PYTHONPATH=ROOT))
+    return json.loads(out.stdout.decode().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of FlashBlade scrapes')
+    parser.add_argument('--fleet', action='append', choices=sorted(FLEETS),
+                        help='fleet size, repeated for several (default: small and medium)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds taken by the mock array to answer each REST call')
+    parser.add_argument('--transport', choices=('sync', 'async'), default='sync')
+    parser.add_argument('--no-save', action='store_true', help='do not store the results')
+    parser.add_argument('--scrape', nargs=3, metavar=('ADDRESS', 'M_TYPE', 'TRANSPORT'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.scrape:
+        return scrape(*args.scrape)
+
+    record = stored_results.new_record(latency=args.latency, transport=args.transport)
+    print('{:>7} {:>8} {:>9} {:>6} {:>9} {:>6} {:>10} {:>10}'.format(
+          'fleet', 'm_type', 'cold (s)', 'calls', 'warm (s)', 'calls', 'RSS (MiB)', 'size (MiB)'))
+    for name in args.fleet or ['small', 'medium']:
+        server = MockFlashBlade(Fleet(**FLEETS[name]), args.latency).start()
+        try:
+            for m_type in M_TYPES:
+                r = dict(measure(server.address, m_type, args.transport), fleet=name, m_type=m_type)
+                record['results'].append(r)
+                print('{:>7} {:>8} {:>9.2f} {:>6} {:>9.2f} {:>6} {:>10.1f} {:>10.2f}'.format(
+                      name, m_type, r['cold_s'], r['cold_calls'], r['warm_s'],
+                      r['warm_calls'], r['peak_rss_mib'], r['size_mib']))
+        finally:
+            server.stop()
+
+    print('\n{:>7} {:<32} {:>9} {:>9}'.format('fleet', 'collector', 'cold (s)', 'warm (s)'))
+    for r in record['results']:
+        for collector, times in sorted(r['collectors'].items(), key=lambda c: -c[1]['cold_s']):
+            print('{:>7} {:<32} {:>9.3f} {:>9.3f}'.format(
+                  r['fleet'], collector, times['cold_s'], times['warm_s']))
+
+    before = stored_results.previous('flashblade_scrapes', record, ['latency', 'transport'])
+    if before is not None:
+        stored_results.compare(record, before, ['fleet', 'm_type'], TOLERANCES)
+    if not args.no_save:
+        stored_results.store('flashblade_scrapes', record)
+
+    over = [(r, call_budget(FLEETS[r['fleet']], r['m_type'])) for r in record['results']]
+    over = [(r, budget) for r, budget in over if max(r['cold_calls'], r['warm_calls']) > budget]
+    for r, budget in over:
+        print('\nREST call budget exceeded: {} {} scrape issued {} calls, budget {}'.format(
+              r['fleet'], r['m_type'], max(r['cold_calls'], r['warm_calls']), budget))
+    if over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
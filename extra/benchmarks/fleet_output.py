@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Check of the output of the fleet scrapes against mock arrays.
+
+Starts three mock_flasharray and three mock_flashblade servers, the
+FlashBlades with enough users for their usage metrics to be collected in
+several chunks, then renders each fleet as the fleet endpoints do, with
+an unreachable array on top of the mock ones. The output is parsed by
+the prometheus_client text parser, which starts a new family whenever
+the samples of a family are interrupted by another one: each family must
+be parsed only once and hold the series of every array collected, the
+same as the output of the array scraped on its own, and the unreachable
+array must be reported down.
+The script exits with status 1 if any of these checks fails.
+
+Run from the repository root:
+    python extra/benchmarks/fleet_output.py
+"""
+
+import collections
+import logging
+import sys
+import time
+
+from stored_results import ROOT
+from mock_flasharray import Fleet as FlashArrayFleet, MockFlashArray
+from mock_flashblade import Fleet as FlashBladeFleet, MockFlashBlade
+sys.path.insert(0, ROOT)
+
+from prometheus_client.parser import text_string_to_metric_families  # noqa: E402
+from exporter_common import Fleet, Snapshot, generate_text  # noqa: E402
+from flasharray_collector import FlasharrayCollector  # noqa: E402
+from flashblade_collector import FlashbladeCollector  # noqa: E402
+
+FLEETS = {
+    'flasharray': (MockFlashArray, FlashArrayFleet(volumes=200, hosts=20, vgroups=5, pods=2),
+                   FlasharrayCollector, '01234567-0123-0123-0123-0123456789ab'),
+    'flashblade': (MockFlashBlade, FlashBladeFleet(file_systems=5, buckets=5, clients=20,
+                                                   users_per_fs=500),
+                   FlashbladeCollector, 'T-01234567-0123-0123-0123-0123456789ab'),
+}
+ARRAYS = 3
+UNREACHABLE = '127.0.0.1:1'
+
+
+def families(body):
+    """
+    Return the samples of an output by family name. Raise AssertionError
+    if the samples of a family are split across the output.
+    """
+    parsed = collections.OrderedDict()
+    for family in text_string_to_metric_families(body.decode('utf-8')):
+        if family.name in parsed:
+            raise AssertionError('family {} is split in the output'.format(family.name))
+        parsed[family.name] = family.samples
+    return parsed
+
+
+def series(samples, array=None):
+    """
+    Return the sorted (sample name, labels) pairs of samples, only of the
+    given array if any, without their array label.
+    """
+    pairs = []
+    for s in samples:
+        labels = dict(s.labels)
+        if array is not None and labels.pop('array', None) != array:
+            continue
+        pairs.append((s.name, tuple(sorted(labels.items()))))
+    return sorted(pairs)
+
+
+def check(array_type):
+    """Render a fleet of mock arrays and return the list of failed checks."""
+    server_class, fleet, collector, token = FLEETS[array_type]
+    servers = [server_class(fleet).start() for _ in range(ARRAYS)]
+    try:
+        def collect(address):
+            return Snapshot(collector(address, token).collect()).fill()
+
+        addresses = [s.address for s in servers]
+        start = time.perf_counter()
+        body = b''.join(Fleet(timeout=30).generate_text(
+            [(a, (a,)) for a in addresses + [UNREACHABLE]], collect))
+        elapsed = time.perf_counter() - start
+        try:
+            output = families(body)
+        except AssertionError as e:
+            return [str(e)]
+        print('{:>10} {:>6} families {:>7} samples {:>6.2f} s'.format(
+              array_type, len(output), sum(len(s) for s in output.values()), elapsed))
+
+        errors = []
+        for address in addresses:
+            for name, samples in families(b''.join(generate_text(collect(address)))).items():
+                got = series(output.get(name, []), address)
+                if got != series(samples):
+                    errors.append('{}: {} samples of {}, {} expected'.format(
+                                  address, len(got), name, len(samples)))
+        up = {s.labels['array']: s.value for s in output.get('pure_exporter_array_up', [])}
+        if up != dict({a: 1.0 for a in addresses}, **{UNREACHABLE: 0.0}):
+            errors.append('unexpected pure_exporter_array_up: {}'.format(up))
+        return errors
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def main():
+    # The connection failures of the unreachable array are expected
+    logging.disable(logging.WARNING)
+    errors = []
+    for array_type in sorted(FLEETS):
+        errors += ['{}: {}'.format(array_type, e) for e in check(array_type)]
+    for e in errors:
+        print(e)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Check of the listings of FlashBlade entities by names against the mock REST
+server.
+
+Starts a mock_flashblade server, then lists the performance of more file
+systems than fit in a single call through FlashBlade._list_by_names, with
+each transport, as the collector does: all the names, all the names by
+pages smaller than a chunk, and all the names plus one the array does not
+know, which it rejects. Each listing must return the items of every
+existing file system once, with the number of REST calls expected from
+the chunks of NAMES_PER_CALL names, the continuation tokens of the pages
+and the per-name calls retrying the rejected chunk.
+The script exits with status 1 if any listing differs.
+
+Run from the repository root:
+    python extra/benchmarks/list_by_names.py
+"""
+
+import math
+import sys
+
+from stored_results import ROOT
+from mock_flashblade import Fleet, MockFlashBlade
+from mock_server import mock_stats
+sys.path.insert(0, ROOT)
+
+from flashblade_collector.flashblade_metrics.flashblade import FlashBlade, NAMES_PER_CALL  # noqa: E402
+
+FILE_SYSTEMS = 2 * NAMES_PER_CALL + 20
+PAGE_SIZE = 20
+MISSING = 'fs-missing'
+TOKEN = 'T-01234567-0123-0123-0123-0123456789ab'
+
+
+def pages(count, limit=None):
+    """Return the number of pages of a listing of count items."""
+    return max(1, math.ceil(count / limit)) if limit else 1
+
+
+def expected_calls(names, limit=None):
+    """
+    Return the number of REST calls listing names: the pages of each chunk
+    of NAMES_PER_CALL names, plus, for a chunk holding the missing name,
+    the pages of each of its names requested on its own.
+    """
+    calls = 0
+    for i in range(0, len(names), NAMES_PER_CALL):
+        chunk = names[i:i + NAMES_PER_CALL]
+        if MISSING in chunk:
+            # The rejected chunk fails on its first page
+            calls += 1 + sum(1 if n == MISSING else pages(1, limit) for n in chunk)
+        else:
+            calls += pages(len(chunk), limit)
+    return calls
+
+
+def main():
+    fleet = Fleet(file_systems=FILE_SYSTEMS, buckets=1, clients=1, users_per_fs=1)
+    names = list(fleet.fs_names)
+    cases = [('names', names, {}),
+             ('pages', names, {'limit': PAGE_SIZE}),
+             ('missing', names + [MISSING], {}),
+             ('missing, pages', names[:NAMES_PER_CALL // 2] + [MISSING] +
+              names[NAMES_PER_CALL // 2:], {'limit': PAGE_SIZE})]
+    server = MockFlashBlade(fleet).start()
+    failed = False
+    try:
+        print('{:>9} {:<16} {:>6} {:>6} {:>9} {:>6}'.format(
+              'transport', 'listing', 'names', 'items', 'expected', 'calls'))
+        for transport in ('sync', 'async'):
+            fb = FlashBlade(server.address, TOKEN, transport=transport)
+            func = fb.flashblade.file_systems.list_file_systems_performance
+            for case, listed, kwargs in cases:
+                mock_stats(server.address, reset=True)
+                items = fb._list_by_names(func, listed, protocol='nfs', **kwargs)
+                calls = mock_stats(server.address)['calls']
+                expected = expected_calls(listed, kwargs.get('limit'))
+                got = sorted(item.name for item in items)
+                ok = got == sorted(names) and calls == expected
+                failed = failed or not ok
+                print('{:>9} {:<16} {:>6} {:>6} {:>9} {:>6}{}'.format(
+                      transport, case, len(listed), len(items), expected, calls,
+                      '' if ok else '  FAILED'))
+    finally:
+        server.stop()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
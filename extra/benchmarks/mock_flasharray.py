@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""
+Stand-in FlashArray REST 1.x server for the offline benchmarks.
+
+Serves, over HTTPS, the REST calls issued by the purestorage client of
+the FlashArray collector: version negotiation, session login and logout,
+array info and KPIs, volumes and their KPIs, protocol endpoints and host
+connections, volume groups, hosts, pods, network interfaces, hardware
+components and open messages. The array content is synthesized from the
+sizes of a Fleet, and every REST call is answered after a configurable
+latency, so that the collector sees payloads and round trips of the
+order of those of a real array of that size.
+
+The REST calls answered and the logins are counted, see mock_server.
+
+Run standalone, then scrape the exporter with endpoint=127.0.0.1:8443
+and any well-formed API token:
+    python extra/benchmarks/mock_flasharray.py --volumes 10000 --hosts 1000 --latency 0.05
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from mock_server import MockServer
+
+
+REST_VERSIONS = ['1.{}'.format(n) for n in range(20)]
+
+SAMPLE_TIME = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+class Fleet():
+    """
+    Synthetic content of a FlashArray. One volume out of three belongs to
+    a pod and one out of two to a volume group, every volume is connected
+    to a host and every tenth volume to a group of four hosts.
+    :param volumes: number of volumes.
+    :type volumes: int
+    :param hosts: number of hosts.
+    :type hosts: int
+    :param vgroups: number of volume groups.
+    :type vgroups: int
+    :param pods: number of pods.
+    :type pods: int
+    :param interfaces: number of network interfaces.
+    :type interfaces: int
+    """
+    def __init__(self, volumes=1000, hosts=100, vgroups=20, pods=4, interfaces=8):
+        self.hosts = ['host{}'.format(i) for i in range(max(1, hosts))]
+        self.vgroups = ['vg{}'.format(i) for i in range(max(1, vgroups))]
+        self.pods = ['pod{}'.format(i) for i in range(pods)]
+        self.interfaces = ['ct{}.eth{}'.format(i % 2, i // 2) for i in range(interfaces)]
+        self.protocol_endpoints = ['pe0', 'pe1']
+        self.volumes = []
+        for i in range(volumes):
+            name = 'vol{}'.format(i)
+            if i % 2:
+                name = '{}/{}'.format(self.vgroups[i % len(self.vgroups)], name)
+            elif self.pods and i % 3 == 0:
+                name = '{}::{}'.format(self.pods[i % len(self.pods)], name)
+            self.volumes.append(name)
+
+    def __repr__(self):
+        return '{} volumes, {} hosts, {} pods'.format(
+            len(self.volumes), len(self.hosts), len(self.pods))
+
+    @staticmethod
+    def _performance(params, i, array=False):
+        """Return the KPIs of entity i selected by the parameters of a monitor call."""
+        mirrored = params.get('mirrored')
+        if params.get('latency'):
+            kpis = {'local_queue_usec_per_op': i % 50,
+                    'queue_usec_per_read_op': i % 60, 'queue_usec_per_write_op': i % 70,
+                    'san_usec_per_read_op': i % 80, 'san_usec_per_write_op': i % 90,
+                    'qos_rate_limit_usec_per_read_op': 0, 'qos_rate_limit_usec_per_write_op': 0}
+            if mirrored:
+                kpis.update({'queue_usec_per_mirrored_write_op': i % 70,
+                             'san_usec_per_mirrored_write_op': i % 90,
+                             'qos_rate_limit_usec_per_mirrored_write_op': 0})
+        elif params.get('size'):
+            kpis = {'bytes_per_read': 4096 + i % 4096, 'bytes_per_write': 8192 + i % 4096,
+                    'bytes_per_op': 6144 + i % 4096}
+            if mirrored:
+                kpis['bytes_per_mirrored_write'] = 8192 + i % 4096
+        else:
+            kpis = {'reads_per_sec': i % 1000, 'writes_per_sec': i % 700,
+                    'output_per_sec': 4096 * (i % 1000), 'input_per_sec': 8192 * (i % 700),
+                    'usec_per_read_op': 100 + i % 400, 'usec_per_write_op': 150 + i % 400}
+            if mirrored:
+                kpis.update({'mirrored_writes_per_sec': i % 300,
+                             'mirrored_input_per_sec': 8192 * (i % 300),
+                             'usec_per_mirrored_write_op': 200 + i % 400})
+            if array:
+                kpis['queue_depth'] = i % 32
+        kpis['time'] = SAMPLE_TIME
+        return kpis
+
+    @staticmethod
+    def _space(i):
+        return {'size': 2**40 + i, 'volumes': 2**30 + i, 'snapshots': 2**20 + i,
+                'total': 2**30 + 2**20 + 2 * i, 'data_reduction': 1.0 + (i % 50) / 10,
+                'total_reduction': 2.0 + (i % 50) / 10, 'thin_provisioning': 0.5,
+                'shared_space': None}
+
+    def array(self, params):
+        if not params:
+            return {'array_name': 'mock-array', 'id': str(uuid.UUID(int=1)),
+                    'version': '6.1.0', 'revision': '202101010000+abcdef',
+                    'hostname': 'mock-array'}
+        if params.get('space'):
+            return [{'hostname': 'mock-array', 'capacity': 2**50, 'provisioned': 2**51,
+                     'volumes': 2**45, 'snapshots': 2**40, 'shared_space': 2**38,
+                     'system': 0, 'replication': 2**30, 'total': 2**45 + 2**41,
+                     'data_reduction': 4.2, 'total_reduction': 9.1,
+                     'thin_provisioning': 0.6}]
+        return [dict(self._performance(params, len(self.volumes), array=True),
+                     hostname='mock-array')]
+
+    def volume(self, params):
+        if params.get('protocol_endpoint'):
+            return [{'name': n, 'serial': 'F{:023X}'.format(i),
+                     'created': SAMPLE_TIME, 'source': None}
+                    for i, n in enumerate(self.protocol_endpoints)]
+        if params.get('connect'):
+            connections = []
+            n_hosts = len(self.hosts)
+            for i, name in enumerate(self.volumes):
+                connections.append({'name': name, 'host': self.hosts[i % n_hosts],
+                                    'lun': 1 + i // n_hosts, 'hgroup': None})
+                if i % 10 == 0:
+                    for h in range(1, 5):
+                        connections.append({'name': name, 'host': self.hosts[(i + h) % n_hosts],
+                                            'lun': 254 - h, 'hgroup': 'hg{}'.format(i % 16)})
+            return connections
+        if params.get('space'):
+            return [dict(self._space(i), name=n) for i, n in enumerate(self.volumes)]
+        if params.get('action') == 'monitor':
+            volumes = [dict(self._performance(params, i), name=n)
+                       for i, n in enumerate(self.volumes)]
+            volumes += [dict(self._performance(params, 0), name=n)
+                        for n in self.protocol_endpoints]
+            return volumes
+        return [{'name': n, 'serial': '{:024X}'.format(i), 'size': 2**40 + i,
+                 'created': SAMPLE_TIME, 'source': None, 'time_remaining': None}
+                for i, n in enumerate(self.volumes)]
+
+    def vgroup(self, params):
+        members = {vg: [] for vg in self.vgroups}
+        for name in self.volumes:
+            if '/' in name:
+                members[name.split('/')[0]].append(name)
+        return [{'name': vg, 'volumes': members[vg]} for vg in self.vgroups]
+
+    def host(self, params):
+        if params.get('space'):
+            return [dict(self._space(i), name=n) for i, n in enumerate(self.hosts)]
+        if params.get('action') == 'monitor':
+            return [dict(self._performance(params, i), name=n) for i, n in enumerate(self.hosts)]
+        return [{'name': n, 'iqn': ['iqn.2010-01.com.example:{}'.format(n)],
+                 'wwn': [], 'nqn': [], 'hgroup': None} for n in self.hosts]
+
+    def pod(self, params):
+        if params.get('space'):
+            return [dict(self._space(i), name=n) for i, n in enumerate(self.pods)]
+        if params.get('action') == 'monitor':
+            return [dict(self._performance(params, i), name=n) for i, n in enumerate(self.pods)]
+        arrays = [{'array_id': str(uuid.UUID(int=1)), 'name': 'mock-array',
+                   'status': 'online', 'mediator_status': 'online'},
+                  {'array_id': str(uuid.UUID(int=2)), 'name': 'mock-peer',
+                   'status': 'online', 'mediator_status': 'online', 'progress': None}]
+        return [{'name': n, 'arrays': arrays, 'source': None, 'time_remaining': None}
+                for n in self.pods]
+
+    def network(self, params):
+        if params.get('error'):
+            kpis = {'other_errors_per_sec': 0, 'received_crc_errors_per_sec': 0,
+                    'received_frame_errors_per_sec': 0, 'total_errors_per_sec': 0,
+                    'transmitted_carrier_errors_per_sec': 0,
+                    'transmitted_dropped_errors_per_sec': 0, 'time': SAMPLE_TIME}
+            return [dict(kpis, name=n) for n in self.interfaces]
+        if params.get('action') == 'monitor':
+            return [{'name': n, 'received_bytes_per_sec': 2**20 * i,
+                     'transmitted_bytes_per_sec': 2**20 * i,
+                     'received_packets_per_sec': 1000 * i,
+                     'transmitted_packets_per_sec': 1000 * i, 'time': SAMPLE_TIME}
+                    for i, n in enumerate(self.interfaces)]
+        return [{'name': n, 'enabled': True, 'speed': 25 * 10**9, 'mtu': 9000,
+                 'services': ['iscsi'], 'address': '10.0.0.{}'.format(i + 1)}
+                for i, n in enumerate(self.interfaces)]
+
+    def hardware(self, params):
+        components = [{'name': 'CH0', 'status': 'ok'}]
+        components += [{'name': 'CH0.BAY{}'.format(i), 'status': 'ok' if i < 20 else 'not_installed'}
+                       for i in range(24)]
+        components += [{'name': 'CH0.PWR{}'.format(i), 'status': 'ok', 'voltage': 12.0}
+                       for i in range(2)]
+        components += [{'name': 'CH0.TMP{}'.format(i), 'status': 'ok', 'temperature': 25 + i}
+                       for i in range(4)]
+        for ct in range(2):
+            components.append({'name': 'CT{}'.format(ct), 'status': 'ok'})
+            components += [{'name': 'CT{}.FAN{}'.format(ct, i), 'status': 'ok'} for i in range(6)]
+            components += [{'name': 'CT{}.TMP{}'.format(ct, i), 'status': 'ok', 'temperature': 40 + i}
+                           for i in range(8)]
+            components += [{'name': 'CT{}.ETH{}'.format(ct, i), 'status': 'ok'} for i in range(4)]
+        for c in components:
+            c.setdefault('temperature', None)
+            c.setdefault('voltage', None)
+        return components
+
+    def message(self, params):
+        severities = ('critical', 'warning', 'warning', 'info', 'info', 'info')
+        return [{'id': i, 'current_severity': severities[i % len(severities)],
+                 'category': 'hardware', 'code': 100 + i, 'opened': SAMPLE_TIME,
+                 'component_name': 'ct0.eth{}'.format(i), 'event': 'failure'}
+                for i in range(12)]
+
+
+class MockFlashArray(MockServer):
+    """
+    Stand-in FlashArray answering the REST calls of the purestorage client
+    with the content of a Fleet. Any API token opens a session, whose
+    cookie is required by the other calls.
+    """
+    RESOURCES = ('array', 'volume', 'vgroup', 'host', 'pod', 'network', 'hardware', 'message')
+
+    def __init__(self, fleet, latency=0.0, port=0, cert=None):
+        super().__init__(fleet, latency, port, cert)
+        self._sessions = set()
+
+    def route(self, handler, path, query):
+        length = int(handler.headers.get('Content-Length') or 0)
+        try:
+            params = json.loads(handler.rfile.read(length) or b'null') or {}
+        except ValueError:
+            return self.reply(handler, 400, {'msg': 'Invalid JSON body'})
+        method = handler.command
+
+        if path == ['api', 'api_version']:
+            return self.reply(handler, 200, {'version': REST_VERSIONS})
+        if len(path) < 3 or path[0] != 'api' or path[1] not in REST_VERSIONS:
+            return self.reply(handler, 404, {'msg': 'Not found'})
+
+        resource = '/'.join(path[2:])
+        if resource == 'auth/session' and method == 'POST':
+            if not params.get('api_token'):
+                return self.reply(handler, 400, {'msg': 'Invalid credentials'})
+            session = uuid.uuid4().hex
+            self._sessions.add(session)
+            self.login()
+            time.sleep(self.latency)
+            return self.reply(handler, 200, {'username': 'pureuser'}, self._cookie(session))
+
+        session = handler.headers.get('Cookie', '').partition('session=')[2].split(';')[0]
+        if session not in self._sessions:
+            return self.reply(handler, 401, {'msg': 'Session expired'})
+        if resource == 'auth/session' and method == 'DELETE':
+            self._sessions.discard(session)
+            return self.reply(handler, 200, {'username': 'pureuser'})
+        if method != 'GET' or resource not in self.RESOURCES:
+            return self.reply(handler, 404, {'msg': 'Not found'})
+
+        self.count(resource)
+        data = self.cached((resource, json.dumps(params, sort_keys=True)),
+                           lambda: getattr(self.fleet, resource)(params))
+        time.sleep(self.latency)
+        self.reply(handler, 200, data, self._cookie(session))
+
+    @staticmethod
+    def _cookie(session):
+        # The purestorage client forgets its session when a response has no cookie
+        return [('Set-Cookie', 'session={}; Path=/; Secure'.format(session))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in FlashArray REST 1.x server')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--volumes', type=int, default=1000)
+    parser.add_argument('--hosts', type=int, default=100)
+    parser.add_argument('--vgroups', type=int, default=20)
+    parser.add_argument('--pods', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds taken to answer each REST call')
+    args = parser.parse_args()
+    fleet = Fleet(args.volumes, args.hosts, args.vgroups, args.pods)
+    server = MockFlashArray(fleet, args.latency, args.port).start()
+    print('Mock FlashArray of {} listening on {}'.format(fleet, server.address))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
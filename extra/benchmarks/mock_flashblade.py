@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""
+Stand-in FlashBlade REST 1.x server for the offline benchmarks.
+
+Serves, over HTTPS, the REST calls issued by the purity_fb client of the
+FlashBlade collector: version negotiation, login and logout, array info,
+performance by protocol, protocol specific performance and space, file
+systems and their performance, buckets and their S3 performance, replica
+links, user and group usage, clients performance, alerts and hardware.
+The array content is synthesized from the sizes of a Fleet, and every
+REST call is answered after a configurable latency. The names and
+file_system_names filters, and the limit, start and token pagination
+parameters, are honored as by the array, which rejects with HTTP 400 the
+listings filtered by a name it does not know.
+
+The REST calls answered and the logins are counted, see mock_server.
+
+Run standalone, then scrape the exporter with endpoint=127.0.0.1:8444
+and any well-formed API token:
+    python extra/benchmarks/mock_flashblade.py --file-systems 2000 --clients 5000 --latency 0.05
+"""
+
+import argparse
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from mock_server import MockServer
+
+
+REST_VERSIONS = ['1.{}'.format(n) for n in range(13)]
+
+# Time of the performance samples, in milliseconds since the epoch
+SAMPLE_TIME = int(time.time()) * 1000
+
+PROTOCOLS = ('nfs', 'smb', 'http', 's3')
+
+NFS_OPS = ('access', 'create', 'fsinfo', 'fsstat', 'getattr', 'link', 'lookup', 'mkdir',
+           'pathconf', 'read', 'readdir', 'readdirplus', 'readlink', 'remove', 'rename',
+           'rmdir', 'setattr', 'symlink', 'write')
+
+
+def _plural(op):
+    return op + ('es' if op.endswith('s') else 's')
+
+
+class Fleet():
+    """
+    Synthetic content of a FlashBlade. Every file system carries the
+    quotas and usage of users_per_fs users and as many groups, and one
+    file system and one bucket out of ten are replicated.
+    :param file_systems: number of file systems.
+    :type file_systems: int
+    :param buckets: number of buckets.
+    :type buckets: int
+    :param clients: number of clients reported by the clients performance.
+    :type clients: int
+    :param users_per_fs: number of users, and of groups, of each file system.
+    :type users_per_fs: int
+    :param blades: number of blades.
+    :type blades: int
+    """
+    def __init__(self, file_systems=500, buckets=200, clients=1000, users_per_fs=10, blades=15):
+        self.fs_names = ['fs{}'.format(i) for i in range(file_systems)]
+        self.bucket_names = ['bucket{}'.format(i) for i in range(buckets)]
+        self.client_names = ['10.{}.{}.{}:{}'.format(i // 65536 % 256, i // 256 % 256, i % 256,
+                                                 600 + i % 400) for i in range(clients)]
+        self.users_per_fs = users_per_fs
+        self.blades = blades
+
+    def __repr__(self):
+        return '{} file systems, {} buckets, {} clients'.format(
+            len(self.fs_names), len(self.bucket_names), len(self.client_names))
+
+    @staticmethod
+    def _selected(names, params, key='names'):
+        """
+        Return the index and name of the entities selected by the filter
+        key. Raise LookupError if the filter names an unknown entity.
+        """
+        if key not in params:
+            return enumerate(names)
+        wanted = set(params[key])
+        selected = [(i, n) for i, n in enumerate(names) if n in wanted]
+        if len(selected) < len(wanted):
+            raise LookupError(sorted(wanted - set(n for _, n in selected))[0])
+        return selected
+
+    @staticmethod
+    def _space(i):
+        return {'virtual': 2**40 + i, 'unique': 2**39 + i, 'snapshots': 2**30 + i,
+                'total_physical': 2**39 + 2**30 + 2 * i, 'data_reduction': 1.0 + (i % 30) / 10}
+
+    @staticmethod
+    def _performance(name, i):
+        return {'name': name, 'time': SAMPLE_TIME,
+                'reads_per_sec': i % 1000, 'writes_per_sec': i % 700, 'others_per_sec': i % 300,
+                'usec_per_read_op': 100 + i % 400, 'usec_per_write_op': 150 + i % 400,
+                'usec_per_other_op': 50 + i % 100,
+                'read_bytes_per_sec': 4096 * (i % 1000), 'write_bytes_per_sec': 8192 * (i % 700),
+                'bytes_per_read': 4096, 'bytes_per_write': 8192, 'bytes_per_op': 6144,
+                'input_per_sec': 8192 * (i % 700), 'output_per_sec': 4096 * (i % 1000)}
+
+    @staticmethod
+    def _s3_performance(name, i):
+        return {'name': name, 'time': SAMPLE_TIME,
+                'others_per_sec': i % 100, 'usec_per_other_op': 50 + i % 100,
+                'read_buckets_per_sec': i % 10, 'usec_per_read_bucket_op': 200 + i % 100,
+                'read_objects_per_sec': i % 1000, 'usec_per_read_object_op': 300 + i % 400,
+                'write_buckets_per_sec': i % 5, 'usec_per_write_bucket_op': 400 + i % 100,
+                'write_objects_per_sec': i % 700, 'usec_per_write_object_op': 500 + i % 400}
+
+    def arrays(self, params):
+        return [{'id': str(uuid.UUID(int=1)), 'name': 'mock-blade', 'os': 'Purity//FB',
+                 'version': '3.3.0', 'revision': '202201010000+abcdef', 'time': SAMPLE_TIME}]
+
+    def arrays_performance(self, params):
+        return [self._performance('mock-blade', PROTOCOLS.index(params.get('protocol', 'nfs')))]
+
+    def arrays_nfs_specific_performance(self, params):
+        perf = {'name': 'mock-blade', 'time': SAMPLE_TIME}
+        for i, op in enumerate(NFS_OPS):
+            perf['usec_per_{}_op'.format(op)] = 100 + i
+            perf[_plural(op) + '_per_sec'] = 1000 + i
+        for i, (op, ops) in enumerate((('file_metadata_create', 'file_metadata_creates'),
+                                       ('file_metadata_modify', 'file_metadata_modifies'),
+                                       ('file_metadata_read', 'file_metadata_reads'),
+                                       ('share_metadata_read', 'share_metadata_reads'))):
+            perf['aggregate_usec_per_{}_op'.format(op)] = 100 + i
+            perf['aggregate_{}_per_sec'.format(ops)] = 1000 + i
+        return [perf]
+
+    def arrays_http_specific_performance(self, params):
+        perf = {'name': 'mock-blade', 'time': SAMPLE_TIME,
+                'others_per_sec': 10, 'usec_per_other_op': 100}
+        for i, op in enumerate(('read_dir', 'write_dir', 'read_file', 'write_file')):
+            perf['usec_per_{}_op'.format(op)] = 100 + i
+            perf['{}s_per_sec'.format(op)] = 1000 + i
+        return [perf]
+
+    def arrays_s3_specific_performance(self, params):
+        return [self._s3_performance('mock-blade', 1)]
+
+    def arrays_space(self, params):
+        return [{'name': 'mock-blade', 'capacity': 2**52, 'time': SAMPLE_TIME,
+                 'space': dict(self._space(0), virtual=2**50, total_physical=2**49)}]
+
+    def arrays_clients_performance(self, params):
+        return [self._performance(n, i)
+                for i, n in self._selected(self.client_names, params)]
+
+    def file_systems(self, params):
+        return [{'name': n, 'id': str(uuid.UUID(int=1000 + i)), 'provisioned': 2**42,
+                 'created': SAMPLE_TIME, 'destroyed': False, 'space': self._space(i),
+                 'nfs': {'enabled': True, 'rules': '*(rw,no_root_squash)'},
+                 'smb': {'enabled': False}, 'http': {'enabled': False}}
+                for i, n in self._selected(self.fs_names, params)]
+
+    def file_systems_performance(self, params):
+        return [self._performance(n, i)
+                for i, n in self._selected(self.fs_names, params)]
+
+    def buckets(self, params):
+        return [{'name': n, 'id': str(uuid.UUID(int=100000 + i)),
+                 'account': {'name': 'account{}'.format(i % 20)}, 'object_count': 1000 * i,
+                 'created': SAMPLE_TIME, 'destroyed': False, 'space': self._space(i),
+                 'versioning': 'none'}
+                for i, n in self._selected(self.bucket_names, params)]
+
+    def buckets_s3_specific_performance(self, params):
+        return [self._s3_performance(n, i)
+                for i, n in self._selected(self.bucket_names, params)]
+
+    def bucket_replica_links(self, params):
+        return [{'local_bucket': {'name': n}, 'remote_bucket': {'name': n},
+                 'remote': {'name': 'mock-peer'},
+                 'remote_credentials': {'name': 'mock-peer/credentials'},
+                 'direction': 'outbound', 'lag': 1000 + i, 'status': 'replicating'}
+                for i, n in enumerate(self.bucket_names) if i % 10 == 0]
+
+    def file_system_replica_links(self, params):
+        return [{'local_file_system': {'name': n}, 'remote_file_system': {'name': n},
+                 'remote': {'name': 'mock-peer'},
+                 'direction': 'outbound', 'lag': 1000 + i, 'status': 'replicating'}
+                for i, n in enumerate(self.fs_names) if i % 10 == 0]
+
+    def _usage(self, kind, params):
+        usage = []
+        for i, fs in self._selected(self.fs_names, params, 'file_system_names'):
+            for u in range(self.users_per_fs):
+                uid = 1000 + u
+                usage.append({'file_system': {'name': fs, 'id': str(uuid.UUID(int=1000 + i))},
+                              kind: {'name': '{}{}'.format(kind, uid), 'id': uid},
+                              'quota': 2**30 if u % 2 else None, 'usage': 2**20 * (u + i % 10)})
+        return usage
+
+    def usage_users(self, params):
+        return self._usage('user', params)
+
+    def usage_groups(self, params):
+        return self._usage('group', params)
+
+    def alerts(self, params):
+        severities = ('critical', 'warning', 'warning', 'info', 'info', 'info')
+        return [{'name': str(i), 'index': i, 'code': 100 + i, 'state': 'open',
+                 'severity': severities[i % len(severities)], 'created': SAMPLE_TIME,
+                 'component_name': 'ch1.fb{}'.format(i)}
+                for i in range(12)]
+
+    def hardware(self, params):
+        def component(name, type, index, slot=None, status='healthy'):
+            return {'name': name, 'type': type, 'index': index, 'slot': slot,
+                    'status': status, 'model': 'mock-{}'.format(type),
+                    'serial': 'SN{:06d}'.format(index), 'identify': 'off'}
+
+        components = [component('CH1', 'ch', 1)]
+        components += [component('CH1.FB{}'.format(i), 'fb', i, i,
+                                 'healthy' if i <= self.blades else 'unused')
+                       for i in range(1, 16)]
+        for fm in (1, 2):
+            components.append(component('CH1.FM{}'.format(fm), 'fm', fm, fm))
+            components += [component('CH1.FM{}.ETH{}'.format(fm, i), 'eth', i, i)
+                           for i in range(1, 9)]
+            components += [component('CH1.FM{}.FAN{}'.format(fm, i), 'fan', i, i)
+                           for i in range(1, 4)]
+        components += [component('CH1.PWR{}'.format(i), 'pwr', i, i) for i in range(1, 5)]
+        return components
+
+
+class MockFlashBlade(MockServer):
+    """
+    Stand-in FlashBlade answering the REST calls of the purity_fb client
+    with the content of a Fleet. Any API token is accepted by the login,
+    whose x-auth-token is required by the other calls.
+    """
+    RESOURCES = ('arrays', 'arrays/performance', 'arrays/http-specific-performance',
+                 'arrays/nfs-specific-performance', 'arrays/s3-specific-performance',
+                 'arrays/space', 'arrays/clients/performance', 'file-systems',
+                 'file-systems/performance', 'buckets', 'buckets/s3-specific-performance',
+                 'bucket-replica-links', 'file-system-replica-links',
+                 'usage/users', 'usage/groups', 'alerts', 'hardware')
+
+    def __init__(self, fleet, latency=0.0, port=0, cert=None):
+        super().__init__(fleet, latency, port, cert)
+        self._sessions = set()
+
+    def route(self, handler, path, query):
+        method = handler.command
+        # purity_fb sends a body with some of the POST requests
+        handler.rfile.read(int(handler.headers.get('Content-Length') or 0))
+
+        if path == ['api', 'api_version']:
+            return self.reply(handler, 200, {'versions': REST_VERSIONS})
+        if path == ['api', 'login'] and method == 'POST':
+            if not handler.headers.get('api-token'):
+                return self.reply(handler, 400, {'errors': [{'message': 'Missing api-token'}]})
+            session = uuid.uuid4().hex
+            self._sessions.add(session)
+            self.login()
+            time.sleep(self.latency)
+            return self.reply(handler, 200, {'username': 'pureuser'}, [('x-auth-token', session)])
+
+        session = handler.headers.get('x-auth-token')
+        if session not in self._sessions:
+            return self.reply(handler, 401, {'errors': [{'message': 'Session expired'}]})
+        if path == ['api', 'logout'] and method == 'POST':
+            self._sessions.discard(session)
+            return self.reply(handler, 200, {})
+        resource = '/'.join(path[2:])
+        if (len(path) < 3 or path[0] != 'api' or path[1] not in REST_VERSIONS or
+                method != 'GET' or resource not in self.RESOURCES):
+            return self.reply(handler, 404, {'errors': [{'message': 'Not found'}]})
+
+        self.count(resource)
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+        for csv in ('names', 'file_system_names'):
+            if csv in params:
+                params[csv] = params[csv].split(',')
+        try:
+            data = self.cached((resource, query), lambda: self._page(resource, params))
+        except LookupError as e:
+            time.sleep(self.latency)
+            return self.reply(handler, 400, {'errors': [
+                {'message': 'Item does not exist', 'context': str(e.args[0])}]})
+        time.sleep(self.latency)
+        self.reply(handler, 200, data)
+
+    def _page(self, resource, params):
+        """Return the response of a listing, paginated as asked by the request."""
+        items = getattr(self.fleet, resource.replace('/', '_').replace('-', '_'))(params)
+        start = int(params.get('token') or params.get('start') or 0)
+        limit = int(params['limit']) if params.get('limit') else len(items)
+        end = start + limit
+        return {'items': items[start:end],
+                'pagination_info': {'continuation_token': str(end) if end < len(items) else None,
+                                    'total_item_count': len(items)}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in FlashBlade REST 1.x server')
+    parser.add_argument('--port', type=int, default=8444)
+    parser.add_argument('--file-systems', type=int, default=500)
+    parser.add_argument('--buckets', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--users-per-fs', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds taken to answer each REST call')
+    args = parser.parse_args()
+    fleet = Fleet(args.file_systems, args.buckets, args.clients, args.users_per_fs)
+    server = MockFlashBlade(fleet, args.latency, args.port).start()
+    print('Mock FlashBlade of {} listening on {}'.format(fleet, server.address))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
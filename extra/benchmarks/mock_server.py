@@ -0,0 +1,150 @@
+"""
+HTTPS server scaffolding shared by the stand-in array REST servers.
+"""
+
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def self_signed_cert(directory):
+    """Create a self-signed certificate and key in directory, return their paths."""
+    if shutil.which('openssl') is None:
+        raise RuntimeError('openssl is required to generate the mock server certificate')
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                    '-subj', '/CN=localhost', '-days', '1', '-keyout', key, '-out', cert],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def mock_stats(address, reset=False):
+    """Return the statistics of the mock array at address, then reset them if asked."""
+    context = ssl._create_unverified_context()
+    req = urllib.request.Request('https://{}/mock/stats'.format(address),
+                                 method='DELETE' if reset else 'GET')
+    with urllib.request.urlopen(req, context=context) as resp:
+        return json.load(resp)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.mock.handle(self)
+
+    do_POST = do_GET
+    do_DELETE = do_GET
+
+
+class MockServer():
+    """
+    Threaded HTTPS server answering the REST calls of an array client with
+    the content of a fleet, after latency seconds. Subclasses implement
+    route, which answers the requests outside of /mock/stats, the path
+    reporting the number of REST calls answered, by resource, and of
+    logins, which are reset by a DELETE of the same path. The encoded
+    responses can be kept with cached, as the fleet does not change.
+    :param fleet: synthetic content of the array.
+    :param latency: seconds taken to answer each REST call.
+    :type latency: float
+    :param port: TCP port to listen on, 0 for any free port.
+    :type port: int
+    :param cert: path of the certificate and key files, generated if None.
+    :type cert: tuple
+    """
+    def __init__(self, fleet, latency=0.0, port=0, cert=None):
+        self.fleet = fleet
+        self.latency = latency
+        self.calls = Counter()
+        self.logins = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._tmpdir = None
+        if cert is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='mock-array-')
+            cert = self_signed_cert(self._tmpdir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*cert)
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.daemon_threads = True
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def address(self):
+        """Endpoint of the mock array, as given to the exporter."""
+        return '127.0.0.1:{}'.format(self._server.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {'calls': sum(self.calls.values()), 'logins': self.logins,
+                    'by_resource': dict(self.calls)}
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.logins = 0
+
+    def count(self, resource):
+        with self._lock:
+            self.calls[resource] += 1
+
+    def login(self):
+        with self._lock:
+            self.logins += 1
+
+    def cached(self, key, build):
+        """Return the encoded response of key, built by calling build the first time."""
+        data = self._responses.get(key)
+        if data is None:
+            data = json.dumps(build()).encode('utf-8')
+            with self._lock:
+                self._responses[key] = data
+        return data
+
+    def reply(self, handler, status, body, headers=()):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def handle(self, handler):
+        path, _, query = handler.path.partition('?')
+        path = path.strip('/').split('/')
+        if path == ['mock', 'stats']:
+            if handler.command == 'DELETE':
+                self.reset()
+            return self.reply(handler, 200, self.stats())
+        self.route(handler, path, query)
+
+    def route(self, handler, path, query):
+        raise NotImplementedError
@@ -0,0 +1,83 @@
+"""
+Storage of the benchmark results, to compare them between versions.
+
+The results of each benchmark are appended to results/<name>.jsonl, one
+JSON record per run, holding the git version of the tree, the date, the
+Python version, the settings of the run and a list of result rows.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..', '..')
+
+
+def version():
+    """Return the git version of the tree, as given by git describe."""
+    try:
+        out = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                             check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return out.stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def path(name):
+    return os.path.join(HERE, 'results', name + '.jsonl')
+
+
+def new_record(**settings):
+    """Return an empty record of a run with the given settings."""
+    return dict(settings, version=version(), python=platform.python_version(),
+                date=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), results=[])
+
+
+def store(name, record):
+    os.makedirs(os.path.dirname(path(name)), exist_ok=True)
+    with open(path(name), 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def previous(name, record, settings):
+    """
+    Return the last stored record of another version whose settings, given
+    by their keys, are those of record, or None.
+    """
+    if not os.path.exists(path(name)):
+        return None
+    found = None
+    with open(path(name)) as f:
+        for line in f:
+            r = json.loads(line)
+            if r['version'] != record['version'] and all(r.get(k) == record.get(k) for k in settings):
+                found = r
+    return found
+
+
+def compare(record, before, keys, tolerances):
+    """
+    Print the figures of record grown by more than their tolerance, a
+    relative change, since the record before. The rows of both records
+    are matched by the values of keys.
+    """
+    print('\nCompared with {} of {}:'.format(before['version'], before['date']))
+    old = {tuple(r[k] for k in keys): r for r in before['results']}
+    flagged = 0
+    for r in record['results']:
+        o = old.get(tuple(r[k] for k in keys))
+        if o is None:
+            continue
+        for figure, tolerance in tolerances.items():
+            if not o.get(figure):
+                continue
+            change = (r[figure] - o[figure]) / o[figure]
+            if change > tolerance:
+                flagged += 1
+                print('  {:<20} {:<13} {:>10.3f} -> {:<10.3f} {:+.0%}'.format(
+                      ' '.join(str(r[k]) for k in keys), figure, o[figure], r[figure], change))
+    if not flagged:
+        print('  no regression')
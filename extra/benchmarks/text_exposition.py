@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+Benchmark of a complete /metrics/flasharray/volumes scrape rendering.
+
+Compares the former path, where the volume metric classes build
+prometheus_client GaugeMetricFamily objects rendered by generate_latest,
+with the current one, where they build compact gauge families rendered
+and streamed in chunks by the exporter text writer. Runs on a synthetic
+array of 10k volumes carrying all the space and performance KPIs, and
+reports the best time of a few runs and the peak memory allocated by a
+single scrape. Both paths produce the same output.
+
+Run from the repository root:
+    python extra/benchmarks/text_exposition.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import purestorage
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from flasharray_collector import FlasharrayCollector
+from flasharray_collector.flasharray_metrics import mappings
+from flasharray_collector.flasharray_metrics import volume_space_metrics
+from flasharray_collector.flasharray_metrics import volume_performance_metrics
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
+from exporter_common import Snapshot, generate_text
+
+
+N_VOLUMES = 10000
+PERFORMANCE_KEYS = (list(mappings.volume_latency_mapping) +
+                    list(mappings.volume_bandwidth_mapping) +
+                    list(mappings.volume_iops_mapping))
+
+
+class SyntheticArray():
+    """Minimal stand-in for purestorage.FlashArray serving volumes."""
+    def __init__(self, n_volumes):
+        self.names = []
+        for i in range(n_volumes):
+            name = 'vol{}'.format(i)
+            if i % 3 == 0:
+                name = 'pod{}::{}'.format(i % 7, name)
+            elif i % 3 == 1:
+                name = 'vg{}/{}'.format(i % 40, name)
+            self.names.append(name)
+        self.vgroups = [{'name': 'vg{}'.format(g),
+                         'volumes': [n for n in self.names if n.startswith('vg{}/'.format(g))]}
+                        for g in range(40)]
+        self.space = [{'name': n, 'size': i, 'volumes': i, 'snapshots': i,
+                       'total': i, 'data_reduction': 1.5}
+                      for i, n in enumerate(self.names)]
+        self.performance = [dict({'name': n}, **{k: i for k in PERFORMANCE_KEYS})
+                            for i, n in enumerate(self.names)]
+
+    def list_volumes(self, **kwargs):
+        if kwargs.get('protocol_endpoint'):
+            return []
+        if kwargs.get('space'):
+            return self.space
+        if kwargs.get('action'):
+            # All the monitor variants report the same KPIs here
+            return self.performance
+        return [{'name': n, 'serial': '{:024X}'.format(i)}
+                for i, n in enumerate(self.names)]
+
+    def list_vgroups(self, **kwargs):
+        return self.vgroups
+
+    def invalidate_cookie(self):
+        pass
+
+
+def use_family(family):
+    volume_space_metrics.CompactGaugeMetricFamily = family
+    volume_performance_metrics.CompactGaugeMetricFamily = family
+
+
+def scrape():
+    registry = CollectorRegistry()
+    registry.register(Snapshot(FlasharrayCollector('synthetic', 'benchmark', 'volumes').collect()).fill())
+    return registry
+
+
+def legacy():
+    """GaugeMetricFamily samples rendered at once by generate_latest."""
+    use_family(GaugeMetricFamily)
+    body = generate_latest(scrape())
+    return len(body)
+
+
+def streaming():
+    """Compact samples streamed in chunks by the exporter text writer."""
+    use_family(CompactGaugeMetricFamily)
+    size = 0
+    for chunk in generate_text(scrape()):
+        size += len(chunk)
+    return size
+
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, size
+
+
+def main():
+    array = SyntheticArray(N_VOLUMES)
+    # Serve the synthetic array in place of a real session
+    purestorage.FlashArray = lambda endpoint, **kwargs: array
+
+    use_family(GaugeMetricFamily)
+    reference = generate_latest(scrape()).split(b'\n')
+    use_family(CompactGaugeMetricFamily)
+    output = b''.join(generate_text(scrape())).split(b'\n')
+    # Only the snapshot timestamp differs between two scrapes
+    assert [l for l in reference if b'snapshot_timestamp' not in l] == \
+           [l for l in output if b'snapshot_timestamp' not in l]
+
+    print('{:>10} {:>10} {:>12} {:>12}'.format('method', 'time (s)', 'peak (MiB)', 'output (MiB)'))
+    for func in (legacy, streaming):
+        elapsed, peak, size = measure(func)
+        print('{:>10} {:>10.4f} {:>12.1f} {:>12.1f}'.format(
+              func.__name__, elapsed, peak / 2**20, size / 2**20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the volume group resolution done by FlashArray.get_volumes.
+
+Compares the former per-volume scan of every volume group membership list
+with the reverse membership index, on synthetic arrays of growing size.
+The time per volume of the index stays flat as the array grows, while the
+scan grows linearly with the number of volume groups.
+
+Run from the repository root:
+    python extra/benchmarks/vgroup_index.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import purestorage
+from flasharray_collector.flasharray_metrics.flasharray import FlashArray, PURE_NAA
+
+
+class SyntheticArray():
+    """Minimal stand-in for purestorage.FlashArray serving an inventory."""
+    def __init__(self, endpoint, n_volumes, n_vgroups):
+        self.endpoint = endpoint
+        self.vols = []
+        self.vgroups = [{'name': 'vg{}'.format(g), 'volumes': []} for g in range(n_vgroups)]
+        for i in range(n_volumes):
+            if i % 2:
+                vg = self.vgroups[i % n_vgroups]
+                name = '{}/vol{}'.format(vg['name'], i)
+                vg['volumes'].append(name)
+            else:
+                name = 'vol{}'.format(i)
+            self.vols.append({'name': name, 'serial': '{:024X}'.format(i)})
+
+    def list_volumes(self, **kwargs):
+        if kwargs and 'pending' not in kwargs:
+            return []
+        return [dict(v) for v in self.vols]
+
+    def list_vgroups(self, **kwargs):
+        return self.vgroups
+
+    def invalidate_cookie(self):
+        pass
+
+
+def scan(array):
+    """Volume group resolution as implemented before the index."""
+    vgroups = array.list_vgroups()
+    vdict = {}
+    for v in array.list_volumes(pending='true'):
+        v['naaid'] = PURE_NAA + v['serial']
+        v['vgroup'] = ''
+        for vg in vgroups:
+            if v['name'] in vg['volumes']:
+                v['vgroup'] = vg['name']
+        vdict[v['name']] = v
+    return vdict
+
+
+def index(array):
+    """Volume group resolution through FlashArray.get_volumes."""
+    fa = FlashArray(array.endpoint, 'benchmark', max_workers=1,
+                    refresh_intervals={'inventory': 0, 'space': 0})
+    fa.get_volumes()
+    return fa.volumes
+
+
+def measure(func, array, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(array)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arrays = {}
+    # Serve the synthetic arrays in place of real sessions
+    purestorage.FlashArray = lambda endpoint, **kwargs: arrays[endpoint]
+
+    print('{:>8} {:>8} {:>12} {:>12} {:>14} {:>14}'.format(
+          'volumes', 'vgroups', 'scan (s)', 'index (s)', 'scan us/vol', 'index us/vol'))
+    for n_volumes in [1000, 2000, 4000, 8000]:
+        n_vgroups = n_volumes // 25
+        array = SyntheticArray('array{}'.format(n_volumes), n_volumes, n_vgroups)
+        arrays[array.endpoint] = array
+        assert scan(array) == index(array)
+        t_scan = measure(scan, array)
+        t_index = measure(index, array)
+        print('{:>8} {:>8} {:>12.4f} {:>12.4f} {:>14.2f} {:>14.2f}'.format(
+              n_volumes, n_vgroups, t_scan, t_index,
+              t_scan / n_volumes * 1e6, t_index / n_volumes * 1e6))
+
+
+if __name__ == '__main__':
+    main()
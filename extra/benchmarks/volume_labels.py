@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the label handling of the FlashArray volume metrics.
+
+Compares the former volume metric classes, which split the volume name
+into pod and volume for every sample of every metric family, with the
+current ones, which reuse the label tuple computed once per volume when
+the inventory is built. Runs on a synthetic array of 10k volumes carrying
+all the space and performance KPIs.
+
+Run from the repository root:
+    python extra/benchmarks/volume_labels.py
+"""
+
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from prometheus_client.core import GaugeMetricFamily
+from flasharray_collector.flasharray_metrics import mappings
+from flasharray_collector.flasharray_metrics.flasharray import PURE_NAA, volume_labels
+from flasharray_collector.flasharray_metrics.volume_space_metrics import VolumeSpaceMetrics
+from flasharray_collector.flasharray_metrics.volume_performance_metrics import VolumePerformanceMetrics
+
+
+VOLUME_MAPPINGS = [mappings.volume_latency_mapping,
+                   mappings.volume_bandwidth_mapping,
+                   mappings.volume_iops_mapping]
+
+
+class SyntheticArray():
+    """Minimal stand-in for the FlashArray wrapper serving volumes."""
+    def __init__(self, n_volumes):
+        self.volumes = []
+        for i in range(n_volumes):
+            name = 'vol{}'.format(i)
+            if i % 3 == 0:
+                name = 'pod{}::{}'.format(i % 7, name)
+            v = {'name': name,
+                 'naaid': PURE_NAA + '{:024X}'.format(i),
+                 'vgroup': 'vg{}'.format(i % 40) if i % 2 else '',
+                 'size': i, 'volumes': i, 'snapshots': i, 'total': i,
+                 'data_reduction': 1.5}
+            for mapping in VOLUME_MAPPINGS:
+                for k in mapping:
+                    v[k] = i
+            self.volumes.append(v)
+
+    def add_labels(self):
+        for v in self.volumes:
+            v['labels'] = volume_labels(v)
+
+    def get_volumes(self):
+        return self.volumes
+
+
+def split(fa):
+    """Volume metrics as built before the shared label tuples."""
+    labels = ['volume', 'naaid', 'pod', 'vgroup']
+    p = re.compile(r'::')
+
+    def split_vname(vname):
+        v_name = re.compile(r'::').split(vname)
+        if len(v_name) == 1:
+            v_name = ['/'] + v_name
+        return v_name
+
+    families = []
+    data_reduction = GaugeMetricFamily('purefa_volume_space_datareduction_ratio', '',
+                                       labels=labels, unit='ratio')
+    size = GaugeMetricFamily('purefa_volume_space_size_bytes', '', labels=labels)
+    allocated = GaugeMetricFamily('purefa_volume_space_bytes', '', labels=labels + ['dimension'])
+    for v in fa.get_volumes():
+        v_name = split_vname(v['name'])
+        data_reduction.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup']], v['data_reduction'])
+    for v in fa.get_volumes():
+        v_name = split_vname(v['name'])
+        size.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup']], v['size'])
+    for v in fa.get_volumes():
+        v_name = split_vname(v['name'])
+        for d in ('volumes', 'snapshots', 'total'):
+            allocated.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup'], d], v[d])
+    families += [data_reduction, size, allocated]
+    for mapping in VOLUME_MAPPINGS:
+        metric = GaugeMetricFamily('purefa_volume_performance', '', labels=labels + ['dimension'])
+        for e in fa.get_volumes():
+            for k in mapping:
+                if k in e:
+                    e_name = p.split(e['name'])
+                    if len(e_name) == 1:
+                        e_name = ['/'] + e_name
+                    metric.add_metric([e_name[1], e['naaid'], e_name[0], e['vgroup'], mapping[k]], e[k])
+        families.append(metric)
+    return families
+
+
+def tuples(fa):
+    """Volume metrics built by the current metric classes."""
+    return (list(VolumeSpaceMetrics(fa).get_metrics()) +
+            list(VolumePerformanceMetrics(fa).get_metrics()))
+
+
+def measure(func, fa, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(fa)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    families = func(fa)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    samples = sum(len(f.samples) for f in families)
+    return best, peak, samples
+
+
+def main():
+    n_volumes = 10000
+    fa = SyntheticArray(n_volumes)
+    start = time.perf_counter()
+    fa.add_labels()
+    t_labels = time.perf_counter() - start
+
+    print('{:>8} {:>10} {:>10} {:>12} {:>12}'.format(
+          'method', 'samples', 'time (s)', 'peak (MiB)', 'us/sample'))
+    for func in (split, tuples):
+        elapsed, peak, samples = measure(func, fa)
+        print('{:>8} {:>10} {:>10.4f} {:>12.1f} {:>12.2f}'.format(
+              func.__name__, samples, elapsed, peak / 2**20, elapsed / samples * 1e6))
+    print('label tuples computed once per inventory refresh in {:.4f} s'.format(t_labels))
+
+
+if __name__ == '__main__':
+    main()
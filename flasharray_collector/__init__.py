@@ -1 +1,2 @@
 from .flasharray_collector import FlasharrayCollector
+from .flasharray_metrics.cassette import Cassette
@@ -1,4 +1,4 @@
-from .flasharray_metrics.flasharray import FlashArray
+from .flasharray_metrics.flasharray import FlashArray, DEFAULT_MAX_WORKERS
 from .flasharray_metrics.array_info_metrics import ArrayInfoMetrics
 from .flasharray_metrics.array_hardware_metrics import ArrayHardwareMetrics
 from .flasharray_metrics.array_events_metrics import ArrayEventsMetrics
@@ -13,6 +13,7 @@ from .flasharray_metrics.pod_status_metrics import PodStatusMetrics
 from .flasharray_metrics.pod_space_metrics import PodSpaceMetrics
 from .flasharray_metrics.pod_performance_metrics import PodPerformanceMetrics
 from .flasharray_metrics.network_interface_metrics import NetworkInterfacePerformanceMetrics
+from .flasharray_metrics.instrumentation import instrumentation
 
 
 class FlasharrayCollector():
@@ -26,33 +27,53 @@ class FlasharrayCollector():
     :type target: str
     :param api_token: API token of the user with which to log in.
     :type api_token: str
+    :param max_workers: maximum number of concurrent REST calls to the array.
+    :type max_workers: int
+    :param refresh_intervals: refresh interval in seconds of each tier of
+                              array data, e.g. {'hardware': 600}.
+    :type refresh_intervals: dict
+    :param timestamps: expose the performance samples with the time
+                       reported by the array.
+    :type timestamps: bool
+    :param cassette: cassette recording the REST calls of the scrape, or
+                     replaying them in place of the array.
+    :type cassette: Cassette
     """
-    def __init__(self, endpoint, api_token, request = 'all'):
+    def __init__(self, endpoint, api_token, request = 'all',
+                 max_workers=DEFAULT_MAX_WORKERS, refresh_intervals=None,
+                 timestamps=False, cassette=None):
         self.fa = None
         try:
-            self.fa = FlashArray(endpoint, api_token)
+            self.fa = FlashArray(endpoint, api_token, max_workers,
+                                 refresh_intervals, timestamps, cassette)
         except Exception as e:
             raise Exception('Connection for FlashArray {} not initialized. Check array name/address and api-token'.format(endpoint))
+        self.endpoint = endpoint
         self.request = request
 
+    def _metrics(self, metrics_class):
+        """Return the metrics of a metric class, recording their collection."""
+        return instrumentation.collection(self.endpoint, metrics_class.__name__,
+                                          lambda: metrics_class(self.fa).get_metrics())
+
     def collect(self):
         """Global collector method for all the collected array metrics."""
         if self.request in ['all', 'array']:
-            yield from ArrayInfoMetrics(self.fa).get_metrics()
-            yield from ArrayHardwareMetrics(self.fa).get_metrics()
-            yield from ArrayEventsMetrics(self.fa).get_metrics()
-            yield from ArraySpaceMetrics(self.fa).get_metrics()
-            yield from ArrayPerformanceMetrics(self.fa).get_metrics()
-            yield from NetworkInterfacePerformanceMetrics(self.fa).get_metrics()
+            yield from self._metrics(ArrayInfoMetrics)
+            yield from self._metrics(ArrayHardwareMetrics)
+            yield from self._metrics(ArrayEventsMetrics)
+            yield from self._metrics(ArraySpaceMetrics)
+            yield from self._metrics(ArrayPerformanceMetrics)
+            yield from self._metrics(NetworkInterfacePerformanceMetrics)
         if self.request in ['all', 'volumes']:
-            yield from VolumeSpaceMetrics(self.fa).get_metrics()
-            yield from VolumePerformanceMetrics(self.fa).get_metrics()
+            yield from self._metrics(VolumeSpaceMetrics)
+            yield from self._metrics(VolumePerformanceMetrics)
         if self.request in ['all', 'hosts']:
-            yield from HostSpaceMetrics(self.fa).get_metrics()
-            yield from HostPerformanceMetrics(self.fa).get_metrics()
+            yield from self._metrics(HostSpaceMetrics)
+            yield from self._metrics(HostPerformanceMetrics)
         if self.request in ['all', 'pods']:
-            yield from PodStatusMetrics(self.fa).get_metrics()
-            yield from PodSpaceMetrics(self.fa).get_metrics()
-            yield from PodPerformanceMetrics(self.fa).get_metrics()
+            yield from self._metrics(PodStatusMetrics)
+            yield from self._metrics(PodSpaceMetrics)
+            yield from self._metrics(PodPerformanceMetrics)
         if self.request in ['all']:
-            yield from HostVolumeMetrics(self.fa).get_metrics()
+            yield from self._metrics(HostVolumeMetrics)
@@ -31,9 +31,11 @@ class ArrayPerformanceMetrics():
         Create metrics of gauge type, with dimension as label.
         Metrics values can be iterated over.
         """
+        timestamp = self.fa.sample_time(entity_list)
         for k in mapping:
             if k in entity_list:
-                metric.add_metric([mapping[k]], entity_list[k] if entity_list[k] is not None else 0)
+                metric.add_metric([mapping[k]], entity_list[k] if entity_list[k] is not None else 0,
+                                  timestamp=timestamp)
 
     def _latency(self):
         """
@@ -0,0 +1,80 @@
+import functools
+import json
+import time
+import purestorage
+from purestorage.purestorage import ResponseDict, ResponseList
+from exporter_common import cassette
+
+
+class _RecordingClient():
+    """
+    Proxy of a purestorage.FlashArray client recording every method call
+    on a cassette
+    """
+    def __init__(self, client, cassette):
+        self._client = client
+        self._cassette = cassette
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(**kwargs):
+            start = time.perf_counter()
+            try:
+                result = attr(**kwargs)
+            except purestorage.PureError as e:
+                self._cassette.record(name, kwargs, time.perf_counter() - start, error=e)
+                raise
+            self._cassette.record(name, kwargs, time.perf_counter() - start, result)
+            return result
+        return call
+
+
+class Cassette(cassette.Cassette):
+    """
+    Recording of the REST calls of FlashArray scrapes. A new cassette
+    records the calls issued through the client proxy returned by client(),
+    while a cassette read by load() answers the calls of the stand-in
+    client returned by client() from the recording.
+    The API token and the session cookies are never recorded, as the calls
+    are recorded at the level of the client methods.
+    :param scrub: whether to replace the serial numbers and the ids of the
+                  array, volumes and host initiators with pseudonyms.
+    :type scrub: bool
+    :param info: description of the recording, stored in the file header.
+    :type info: dict
+    """
+    ARRAY_TYPE = 'flasharray'
+    # Response fields identifying the array and its hardware, volumes and
+    # host initiators
+    SCRUBBED_KEYS = frozenset(['id', 'serial', 'wwn', 'iqn', 'nqn'])
+
+    def client(self, client=None):
+        """
+        Return a proxy of client recording its calls or, when replaying,
+        a stand-in client answering from the cassette.
+        """
+        if self.replaying:
+            return cassette.ReplayClient(self)
+        return _RecordingClient(client, self)
+
+    def _encode(self, response):
+        return 'dict' if isinstance(response, dict) else 'list', response
+
+    def _decode(self, type_name, data):
+        # The collector modifies the responses in place
+        if type_name == 'dict':
+            return ResponseDict(json.loads(data))
+        return ResponseList(json.loads(data))
+
+    def _encode_error(self, error):
+        return error.reason
+
+    def _error(self, data):
+        return purestorage.PureError(data)
+
+    def _missing(self, method, params):
+        return purestorage.PureError('No recorded call of {} with {}'.format(method, params))
@@ -1,6 +1,11 @@
-import re
+import sys
+import time
 import urllib3
 import purestorage
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .session_pool import sessions
+from .instrumentation import instrumentation
 
 
 # disable ceritificate warnings
@@ -23,18 +28,74 @@ pod_kpi_params = volume_kpi_params
 
 nic_kpi_params = base_kpi_params + [{'error': True}]
 
+# Maximum number of REST calls issued concurrently by a scrape, within the
+# limit of the calls in flight against the array set by the session pool
+DEFAULT_MAX_WORKERS = 4
+
+# Seconds for which the data of each refresh tier is reused across scrapes
+# before being requested again to the array. 0 means at every scrape.
+DEFAULT_REFRESH_INTERVALS = {'inventory': 600,
+                             'hardware': 600,
+                             'space': 120,
+                             'performance': 0}
+
+
+
+def volume_labels(v):
+    """
+    Return the label values shared by all the metrics of a volume: volume
+    name, NAA id, pod and volume group. Strings are interned, as the same
+    values are repeated in every volume metric family.
+    """
+    v_name = v['name'].split('::')
+    if len(v_name) == 1:
+        v_name = ['/'] + v_name
+    return (sys.intern(v_name[1]), sys.intern(v['naaid']),
+            sys.intern(v_name[0]), sys.intern(v['vgroup']))
+
 
 class FlashArray:
     """
     Base class for FlashArray Prometheus array info
+    :param max_workers: maximum number of REST calls issued at the same
+                        time by the scrape. The calls of all the scrapes of
+                        the array are further bounded by sessions.max_calls.
+    :type max_workers: int
+    :param refresh_intervals: refresh interval in seconds of the 'inventory',
+                              'hardware', 'space' and 'performance' tiers,
+                              overriding DEFAULT_REFRESH_INTERVALS.
+    :type refresh_intervals: dict
+    :param timestamps: whether performance samples carry the time the
+                       array reported for them.
+    :type timestamps: bool
+    :param cassette: cassette on which to record the REST calls, or from
+                     which to replay them without connecting to the array.
+                     Either way the data cached by previous scrapes is not
+                     used, so that every call of the scrape is recorded.
+    :type cassette: Cassette
     """
-    def __init__(self, endpoint, api_token):
+    def __init__(self, endpoint, api_token, max_workers=DEFAULT_MAX_WORKERS,
+                 refresh_intervals=None, timestamps=False, cassette=None):
         self.flasharray = None
+        self.timestamps = timestamps
+        self._sample_times = {}
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self.refresh_intervals = dict(DEFAULT_REFRESH_INTERVALS,
+                                      **(refresh_intervals or {}))
+        self.cache = {}
+        # Pooled client, in use until the end of the scrape
+        self._session = None
         try:
-            self.flasharray =  purestorage.FlashArray(
-                endpoint,
-                api_token=api_token,
-                user_agent='Purity_FA_Prometheus_exporter/1.0')
+            if cassette is not None and cassette.replaying:
+                self.flasharray = cassette.client()
+            elif cassette is not None:
+                self._session = sessions.get(endpoint, api_token)
+                self.flasharray = cassette.client(
+                    instrumentation.client(self._session, sessions.limit(endpoint)))
+            else:
+                self._session = sessions.get(endpoint, api_token)
+                self.flasharray = instrumentation.client(self._session, sessions.limit(endpoint))
+                self.cache = sessions.cache(endpoint, api_token)
         except purestorage.PureError:
             pass
 
@@ -42,25 +103,94 @@ class FlashArray:
         self.hosts = None
         self.volumes = None
         self.vgroups = None
+        self.volume_vgroups = None
         self.pods = None
         self.host_volumes = None
         self.network_interfaces = None
 
     def __del__(self):
-        if self.flasharray:
-            self.flasharray.invalidate_cookie()
+        # The REST session is left open in the pool for the next scrape
+        self.executor.shutdown(wait=False)
+        if self._session is not None:
+            sessions.release(self._session)
 
-    def get_array(self):
-        if self.array is not None:
-            return self.array
-        self.array = self.flasharray.get()
+    @staticmethod
+    def _cache_key(func, params):
+        return (func.__name__, tuple(sorted(params.items())))
+
+    def _cached(self, tier, func, **params):
+        """
+        Call func with the given parameters, reusing the result of a previous
+        scrape if it is more recent than the refresh interval of the tier.
+        The returned data is shared with other scrapes and must not be
+        modified.
+        """
+        interval = self.refresh_intervals.get(tier, 0)
+        if interval <= 0:
+            return func(**params)
+        key = self._cache_key(func, params)
+        now = time.monotonic()
+        entry = self.cache.get(key)
+        if entry is not None and now - entry[0] < interval:
+            return entry[1]
+        result = func(**params)
+        self.cache[key] = (now, result)
+        return result
+
+    def _uncache(self, func, **params):
+        """Discard the cached result of func, if any."""
+        self.cache.pop(self._cache_key(func, params), None)
 
-        for params in array_kpi_params:
+    def _submit(self, func, params_list):
+        """
+        Dispatch one call of func for each set of parameters in params_list
+        through the array thread pool. Space KPIs are requested in the
+        'space' tier, all the others in the 'performance' one.
+        """
+        return [self.executor.submit(self._cached,
+                                     'space' if params.get('space') else 'performance',
+                                     func, **params)
+                for params in params_list]
+
+    def _completed(self, futures):
+        """
+        Yield the results of the dispatched calls as soon as they land,
+        skipping the ones that failed.
+        """
+        for f in as_completed(futures):
             try:
-                a = self.flasharray.get(**params)[0]
-                self.array.update(a)
+                yield f.result()
             except purestorage.PureError:
                 pass
+
+    def sample_time(self, entity):
+        """
+        Return the time of the performance KPIs of entity, in seconds since
+        the epoch, as reported by the array in the 'time' field. Return
+        None if sample timestamps are disabled or the time is not known.
+        """
+        if not self.timestamps or entity.get('time') is None:
+            return None
+        t = entity['time']
+        # All the entities of a listing share the same time
+        ts = self._sample_times.get(t)
+        if ts is None:
+            try:
+                ts = datetime.strptime(t, '%Y-%m-%dT%H:%M:%SZ').replace(
+                    tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                return None
+            self._sample_times[t] = ts
+        return ts
+
+    def get_array(self):
+        if self.array is not None:
+            return self.array
+        kpis = self._submit(self.flasharray.get, array_kpi_params)
+        self.array = dict(self._cached('hardware', self.flasharray.get))
+
+        for a in self._completed(kpis):
+            self.array.update(a[0])
         return self.array
 
 
@@ -74,24 +204,44 @@ class FlashArray:
         return self.flasharray.list_messages(open=True)
 
     def get_hardware_status(self):
-        return self.flasharray.list_hardware()
+        return self._cached('hardware', self.flasharray.list_hardware)
 
-    def get_volumes(self):
-        if self.volumes is not None:
-            return list(self.volumes.values())
-        vdict = {}
+    def get_volume_vgroups(self):
+        """
+        Return the volume group membership index, mapping the name of each
+        volume belonging to a volume group to the name of the group.
+        """
+        if self.volume_vgroups is not None:
+            return self.volume_vgroups
         if self.vgroups is None:
             self.vgroups = self.flasharray.list_vgroups()
+        vgdict = {}
+        for vg in self.vgroups:
+            for v in vg['volumes']:
+                vgdict[v] = vg['name']
+        self.volume_vgroups = vgdict
+        return self.volume_vgroups
+
+    def _list_volume_inventory(self):
+        """
+        Retrieve the slow changing attributes of the array volumes: names,
+        serials and NAA ids, volume group membership and protocol endpoints.
+        Return the dictionary of volumes keyed by name, and the set of
+        protocol endpoint names.
+        """
+        vdict = {}
+        pe_names = set()
+        pes = self.executor.submit(self.flasharray.list_volumes, protocol_endpoint=True)
+        self.vgroups = self.volume_vgroups = None
+        vgdict = self.get_volume_vgroups()
         for v in self.flasharray.list_volumes(pending='true'):
             v['naaid'] = PURE_NAA + v['serial']
-            v['vgroup'] = ''
-            for vg in self.vgroups:
-                if v['name'] in vg['volumes']:
-                    v['vgroup'] = vg['name']
+            v['vgroup'] = vgdict.get(v['name'], '')
+            v['labels'] = volume_labels(v)
             vdict[v['name']] = v
 
         try:
-            for v in self.flasharray.list_volumes(protocol_endpoint=True):
+            for v in pes.result():
                 # PE do not have these metrics, so it is necessasy to poulate with fake values
                 v['naaid'] = PURE_NAA + v['serial']
                 v['size'] = 0
@@ -100,16 +250,40 @@ class FlashArray:
                 v['total'] = 0
                 v['data_reduction'] = 0
                 v['vgroup'] = ''
+                v['labels'] = volume_labels(v)
                 vdict[v['name']] = v
+                pe_names.add(v['name'])
         except purestorage.PureError:
             pass
+        return vdict, pe_names
 
-        for params in volume_kpi_params:
-            try:
-                for v in self.flasharray.list_volumes(**params):
+    def get_volumes(self):
+        """
+        Return the array volumes, joining the KPIs requested at this scrape
+        onto the volume inventory, which is cached in the 'inventory' tier.
+        """
+        if self.volumes is not None:
+            return list(self.volumes.values())
+        futures = self._submit(self.flasharray.list_volumes, volume_kpi_params)
+        inventory, pe_names = self._cached('inventory', self._list_volume_inventory)
+        kpis = list(self._completed(futures))
+        names = set(v['name'] for vl in kpis for v in vl)
+        if not names.issubset(inventory):
+            # Volumes created since the inventory was retrieved
+            self._uncache(self._list_volume_inventory)
+            inventory, pe_names = self._cached('inventory', self._list_volume_inventory)
+
+        # Volumes no longer reported in any KPI have been eradicated, which
+        # can only be told if none of the KPI listings failed
+        complete = len(kpis) == len(futures)
+        vdict = {}
+        for name, v in inventory.items():
+            if not complete or name in names or name in pe_names:
+                vdict[name] = dict(v)
+        for vl in kpis:
+            for v in vl:
+                if v['name'] in vdict:
                     vdict[v['name']].update(v)
-            except purestorage.PureError:
-                pass
         # vdict = {key:val for key, val in vdict.items() if val['time_remaining'] is None}
         self.volumes = vdict
         return list(self.volumes.values())
@@ -118,30 +292,41 @@ class FlashArray:
         if self.hosts is not None:
             return list(self.hosts.values())
         hdict = {}
+        kpis = self._submit(self.flasharray.list_hosts, host_kpi_params)
         try:
             for h in self.flasharray.list_hosts():
+                h['labels'] = (sys.intern(h['name']),)
                 hdict[h['name']] = h
         except purestorage.PureError:
             pass
 
-        for params in host_kpi_params:
-            try:
-                for h in self.flasharray.list_hosts(**params):
+        # The space KPIs are cached, and may list hosts deleted since
+        for hl in self._completed(kpis):
+            for h in hl:
+                if h['name'] in hdict:
                     hdict[h['name']].update(h)
-            except purestorage.PureError:
-                pass
         self.hosts = hdict
         return list(self.hosts.values())
 
     def get_host_volumes(self):
+        """
+        Return every host to volume connection of the array, retrieved
+        with a single array-wide listing. Volumes shared through a host
+        group are reported once per host of the group.
+        """
         if self.host_volumes is not None:
             return list(self.host_volumes.values())
         hvdict = {}
-
+        self.get_volumes()
         try:
-            for h in self.get_hosts():
-                for c in self.flasharray.list_host_connections(h['name']):
-                    hvdict[h['name']] = {'host': h['name'], 'naaid': self.volumes[c['vol']]['naaid']}
+            for c in self.flasharray.list_volumes(connect=True):
+                if c['name'] not in self.volumes:
+                    continue
+                # The same host and volume pair is listed for both private
+                # and host group connections
+                hvdict[(c['host'], c['name'])] = {'host': c['host'],
+                                                  'volume': c['name'],
+                                                  'naaid': self.volumes[c['name']]['naaid']}
         except purestorage.PureError:
             pass
 
@@ -152,18 +337,19 @@ class FlashArray:
         if self.pods is not None:
             return list(self.pods.values())
         pdict = {}
+        kpis = self._submit(self.flasharray.list_pods, pod_kpi_params)
         try:
             for p in self.flasharray.list_pods(pending='true'):
+                p['labels'] = (sys.intern(p['name']),)
                 pdict[p['name']] = p
         except purestorage.PureError:
             pass
 
-        for params in pod_kpi_params:
-            try:
-                for p in self.flasharray.list_pods(**params):
+        # The space KPIs are cached, and may list pods destroyed since
+        for pl in self._completed(kpis):
+            for p in pl:
+                if p['name'] in pdict:
                     pdict[p['name']].update(p)
-            except purestorage.PureError:
-                pass
         # pdict = {key:val for key, val in pdict.items() if val['time_remaining'] is None}
         self.pods = pdict
         return list(self.pods.values())
@@ -172,17 +358,15 @@ class FlashArray:
         if self.network_interfaces is not None:
             return list(self.network_interfaces.values())
         nicdict = {}
+        kpis = self._submit(self.flasharray.list_network_interfaces, nic_kpi_params)
         try:
             for n in self.flasharray.list_network_interfaces():
                 nicdict[n['name']] = n
         except purestorage.PureError:
             pass
 
-        for params in nic_kpi_params:
-            try:
-                for n in self.flasharray.list_network_interfaces(**params):
-                    nicdict[n['name']].update(n)
-            except purestorage.PureError:
-                pass
+        for nl in self._completed(kpis):
+            for n in nl:
+                nicdict[n['name']].update(n)
         self.network_interfaces = nicdict
         return list(self.network_interfaces.values())
\ No newline at end of file
@@ -1,4 +1,4 @@
-from prometheus_client.core import GaugeMetricFamily
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 from . import mappings
 
 class HostPerformanceMetrics():
@@ -8,15 +8,15 @@ class HostPerformanceMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.latency = GaugeMetricFamily('purefa_host_performance_latency_usec',
-                                         'FlashArray host IO latency',
-                                         labels=['host', 'dimension'])
-        self.bandwidth = GaugeMetricFamily('purefa_host_performance_bandwidth_bytes',
-                                           'FlashArray host bandwidth',
-                                           labels=['host', 'dimension'])
-        self.iops = GaugeMetricFamily('purefa_host_performance_iops',
-                                      'FlashArray host IOPS',
-                                      labels=['host', 'dimension'])
+        self.latency = CompactGaugeMetricFamily('purefa_host_performance_latency_usec',
+                                                'FlashArray host IO latency',
+                                                labels=['host', 'dimension'])
+        self.bandwidth = CompactGaugeMetricFamily('purefa_host_performance_bandwidth_bytes',
+                                                  'FlashArray host bandwidth',
+                                                  labels=['host', 'dimension'])
+        self.iops = CompactGaugeMetricFamily('purefa_host_performance_iops',
+                                             'FlashArray host IOPS',
+                                             labels=['host', 'dimension'])
 
     def _mk_metric(self, metric, entity_list, mapping):
         """
@@ -25,9 +25,10 @@ class HostPerformanceMetrics():
         Metrics values can be iterated over.
         """
         for e in entity_list:
+            timestamp = self.fa.sample_time(e)
             for k in mapping:
                 if k in e:
-                    metric.add_metric([e['name'], mapping[k]], e[k])
+                    metric.add_metric(e['labels'] + (mapping[k],), e[k], timestamp=timestamp)
 
     def _latency(self):
         """
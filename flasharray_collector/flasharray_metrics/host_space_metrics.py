@@ -1,4 +1,4 @@
-from prometheus_client.core import GaugeMetricFamily
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 
 
 class HostSpaceMetrics():
@@ -8,31 +8,31 @@ class HostSpaceMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.data_reduction = GaugeMetricFamily('purefa_host_space_datareduction_ratio',
-                                                'FlashArray host volumes data reduction ratio',
-                                                labels=['host'],
-                                                unit='ratio')
-        self.size = GaugeMetricFamily('purefa_host_space_size_bytes',
-                                      'FlashArray host volumes size',
-                                      labels=['host'])
-        self.allocated = GaugeMetricFamily('purefa_host_space_bytes',
-                                           'FlashArray host volumes allocated space',
-                                           labels=['host', 'dimension'])
+        self.data_reduction = CompactGaugeMetricFamily('purefa_host_space_datareduction_ratio',
+                                                       'FlashArray host volumes data reduction ratio',
+                                                       labels=['host'],
+                                                       unit='ratio')
+        self.size = CompactGaugeMetricFamily('purefa_host_space_size_bytes',
+                                             'FlashArray host volumes size',
+                                             labels=['host'])
+        self.allocated = CompactGaugeMetricFamily('purefa_host_space_bytes',
+                                                  'FlashArray host volumes allocated space',
+                                                  labels=['host', 'dimension'])
 
     def _data_reduction(self):
         for h in self.fa.get_hosts():
-            self.data_reduction.add_metric([h['name']], h['data_reduction'] if h['data_reduction'] is not None else 0)
+            self.data_reduction.add_metric(h['labels'], h['data_reduction'] if h['data_reduction'] is not None else 0)
 
 
     def _size(self):
         for h in self.fa.get_hosts():
-            self.size.add_metric([h['name']], h['size'] if h['size'] is not None else 0)
+            self.size.add_metric(h['labels'], h['size'] if h['size'] is not None else 0)
 
     def _allocated(self):
         for h in self.fa.get_hosts():
-            self.allocated.add_metric([h['name'], 'volumes'], h['volumes'] if h['volumes'] is not None else 0)
-            self.allocated.add_metric([h['name'], 'snapshots'], h['snapshots'] if h['snapshots'] is not None else 0)
-            self.allocated.add_metric([h['name'], 'total'], h['total'] if h['total'] is not None else 0)
+            self.allocated.add_metric(h['labels'] + ('volumes',), h['volumes'] if h['volumes'] is not None else 0)
+            self.allocated.add_metric(h['labels'] + ('snapshots',), h['snapshots'] if h['snapshots'] is not None else 0)
+            self.allocated.add_metric(h['labels'] + ('total',), h['total'] if h['total'] is not None else 0)
 
     def get_metrics(self):
         self._data_reduction()
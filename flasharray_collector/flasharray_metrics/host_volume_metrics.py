@@ -1,4 +1,4 @@
-from prometheus_client.core import GaugeMetricFamily
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 
 
 class HostVolumeMetrics():
@@ -8,9 +8,9 @@ class HostVolumeMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.map_host_vol = GaugeMetricFamily('purefa_host_volumes_info',
-                                              'FlashArray host volumes connections',
-                                              labels=['host', 'naaid'])
+        self.map_host_vol = CompactGaugeMetricFamily('purefa_host_volumes_info',
+                                                     'FlashArray host volumes connections',
+                                                     labels=['host', 'naaid'])
 
     def _map_host_vol(self):
         for hv in self.fa.get_host_volumes():
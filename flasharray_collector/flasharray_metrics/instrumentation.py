@@ -0,0 +1,46 @@
+import contextlib
+import functools
+from exporter_common.instrumentation import Instrumentation
+
+
+class _InstrumentedClient():
+    """
+    Proxy of a purestorage.FlashArray client recording every method call,
+    issued while holding limit
+    """
+    def __init__(self, client, instrumentation, limit):
+        self._client = client
+        self._instrumentation = instrumentation
+        self._limit = limit
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            # The time waiting for the limit is not part of the call duration
+            with self._limit, self._instrumentation.rest_call(self._client, attr, kwargs):
+                return attr(*args, **kwargs)
+        return call
+
+
+class FlasharrayInstrumentation(Instrumentation):
+    """
+    Record of the work done by the FlashArray collector, whose REST calls
+    are recorded by a proxy of the purestorage client.
+    """
+    def client(self, client, limit=None):
+        """
+        Return a proxy of a client recording the REST calls, each one
+        issued while holding the limit context if given.
+        """
+        return _InstrumentedClient(client, self, limit or contextlib.nullcontext())
+
+    def on_response(self, response, *args, **kwargs):
+        """requests response hook accounting the size of the responses."""
+        self.add_payload(len(response.content))
+
+
+instrumentation = FlasharrayInstrumentation('purefa')
@@ -20,9 +20,10 @@ class NetworkInterfacePerformanceMetrics():
         Metrics values can be iterated over.
         """
         for e in entity_list:
+            timestamp = self.fa.sample_time(e)
             for k in mapping:
                 if k in e:
-                    metric.add_metric([e['name'], mapping[k]], e[k])
+                    metric.add_metric([e['name'], mapping[k]], e[k], timestamp=timestamp)
 
     def _performance(self):
         """
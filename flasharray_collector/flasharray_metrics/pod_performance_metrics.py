@@ -1,4 +1,4 @@
-from prometheus_client.core import GaugeMetricFamily
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 from . import mappings
 
 
@@ -9,15 +9,15 @@ class PodPerformanceMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.latency = GaugeMetricFamily('purefa_pod_performance_latency_usec',
-                                         'FlashArray pod IO latency',
-                                         labels=['pod', 'dimension'])
-        self.bandwidth = GaugeMetricFamily('purefa_pod_performance_bandwidth_bytes',
-                                           'FlashArray pod bandwidth',
-                                           labels=['pod', 'dimension'])
-        self.iops = GaugeMetricFamily('purefa_pod_performance_iops',
-                                      'FlashArray pod IOPS',
-                                      labels=['pod', 'dimension'])
+        self.latency = CompactGaugeMetricFamily('purefa_pod_performance_latency_usec',
+                                                'FlashArray pod IO latency',
+                                                labels=['pod', 'dimension'])
+        self.bandwidth = CompactGaugeMetricFamily('purefa_pod_performance_bandwidth_bytes',
+                                                  'FlashArray pod bandwidth',
+                                                  labels=['pod', 'dimension'])
+        self.iops = CompactGaugeMetricFamily('purefa_pod_performance_iops',
+                                             'FlashArray pod IOPS',
+                                             labels=['pod', 'dimension'])
 
     def _mk_metric(self, metric, entity_list, mapping):
         """
@@ -26,9 +26,10 @@ class PodPerformanceMetrics():
         Metrics values can be iterated over.
         """
         for e in entity_list:
+            timestamp = self.fa.sample_time(e)
             for k in mapping:
                 if k in e:
-                    metric.add_metric([e['name'], mapping[k]], e[k])
+                    metric.add_metric(e['labels'] + (mapping[k],), e[k], timestamp=timestamp)
 
     def _latency(self):
         """
@@ -1,4 +1,4 @@
-from prometheus_client.core import GaugeMetricFamily
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 
 
 class PodSpaceMetrics():
@@ -8,16 +8,16 @@ class PodSpaceMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.data_reduction = GaugeMetricFamily('purefa_pod_space_datareduction_ratio',
-                                                'FlashArray pod data reduction ratio',
-                                                labels=['pod'],
-                                                unit='ratio')
-        self.size = GaugeMetricFamily('purefa_pod_space_size_bytes',
-                                      'FlashArray pod size',
-                                      labels=['pod'])
-        self.allocated = GaugeMetricFamily('purefa_pod_space_bytes',
-                                           'FlashArray pod allocated space',
-                                           labels=['pod', 'dimension'])
+        self.data_reduction = CompactGaugeMetricFamily('purefa_pod_space_datareduction_ratio',
+                                                       'FlashArray pod data reduction ratio',
+                                                       labels=['pod'],
+                                                       unit='ratio')
+        self.size = CompactGaugeMetricFamily('purefa_pod_space_size_bytes',
+                                             'FlashArray pod size',
+                                             labels=['pod'])
+        self.allocated = CompactGaugeMetricFamily('purefa_pod_space_bytes',
+                                                  'FlashArray pod allocated space',
+                                                  labels=['pod', 'dimension'])
 
     def _data_reduction(self):
         """
@@ -25,7 +25,7 @@ class PodSpaceMetrics():
         Metrics values can be iterated over.
         """
         for p in self.fa.get_pods():
-            self.data_reduction.add_metric([p['name']], p['data_reduction'] if p['data_reduction'] is not None else 0)
+            self.data_reduction.add_metric(p['labels'], p['data_reduction'] if p['data_reduction'] is not None else 0)
 
     def _size(self):
         """
@@ -33,13 +33,13 @@ class PodSpaceMetrics():
         Metrics values can be iterated over.
         """
         for p in self.fa.get_pods():
-            self.size.add_metric([p['name']], p['size'] if p['size'] is not None else 0)
+            self.size.add_metric(p['labels'], p['size'] if p['size'] is not None else 0)
 
     def _allocated(self):
         for p in self.fa.get_pods():
-            self.allocated.add_metric([p['name'], 'volumes'], p['volumes'] if p['volumes'] is not None else 0)
-            self.allocated.add_metric([p['name'], 'snapshots'], p['snapshots'] if p['snapshots'] is not None else 0)
-            self.allocated.add_metric([p['name'], 'total'], p['total'] if p['total'] is not None else 0)
+            self.allocated.add_metric(p['labels'] + ('volumes',), p['volumes'] if p['volumes'] is not None else 0)
+            self.allocated.add_metric(p['labels'] + ('snapshots',), p['snapshots'] if p['snapshots'] is not None else 0)
+            self.allocated.add_metric(p['labels'] + ('total',), p['total'] if p['total'] is not None else 0)
 
     def get_metrics(self):
         self._data_reduction()
@@ -0,0 +1,35 @@
+import purestorage
+from exporter_common.session_pool import SessionPool
+from .instrumentation import instrumentation
+
+
+# Maximum number of REST calls in flight against a single FlashArray, from
+# all the scrapes
+DEFAULT_MAX_CALLS = 4
+
+
+class FlasharraySessionPool(SessionPool):
+    """
+    Pool of authenticated FlashArray REST sessions, reused across scrapes.
+    Expired sessions are renewed transparently by the purestorage client,
+    which logs in again when the array answers with HTTP 401.
+    """
+    def _login(self, endpoint, api_token):
+        # The response hook accounts the size of the REST responses
+        client = purestorage.FlashArray(
+            endpoint,
+            api_token=api_token,
+            user_agent='Purity_FA_Prometheus_exporter/1.0',
+            request_kwargs={'hooks': {'response': instrumentation.on_response}})
+        instrumentation.register(client, endpoint)
+        return client
+
+    def _logout(self, client):
+        instrumentation.forget(client)
+        try:
+            client.invalidate_cookie()
+        except purestorage.PureError:
+            pass
+
+
+sessions = FlasharraySessionPool(max_calls=DEFAULT_MAX_CALLS)
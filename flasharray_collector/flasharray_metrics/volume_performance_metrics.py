@@ -1,6 +1,5 @@
-from prometheus_client.core import GaugeMetricFamily
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 from . import mappings
-import re
 
 
 class VolumePerformanceMetrics():
@@ -10,30 +9,28 @@ class VolumePerformanceMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.latency = GaugeMetricFamily('purefa_volume_performance_latency_usec',
-                                         'FlashArray volume IO latency',
-                                         labels = ['volume', 'naaid', 'pod', 'vgroup' ,'dimension'])
-        self.bandwidth = GaugeMetricFamily('purefa_volume_performance_throughput_bytes',
-                                           'FlashArray volume throughput',
-                                           labels = ['volume', 'naaid', 'pod', 'vgroup' ,'dimension'])
-        self.iops = GaugeMetricFamily('purefa_volume_performance_iops',
-                                      'FlashArray volume IOPS',
-                                      labels = ['volume', 'naaid', 'pod', 'vgroup', 'dimension'])
+        self.latency = CompactGaugeMetricFamily('purefa_volume_performance_latency_usec',
+                                                'FlashArray volume IO latency',
+                                                labels = ['volume', 'naaid', 'pod', 'vgroup' ,'dimension'])
+        self.bandwidth = CompactGaugeMetricFamily('purefa_volume_performance_throughput_bytes',
+                                                  'FlashArray volume throughput',
+                                                  labels = ['volume', 'naaid', 'pod', 'vgroup' ,'dimension'])
+        self.iops = CompactGaugeMetricFamily('purefa_volume_performance_iops',
+                                             'FlashArray volume IOPS',
+                                             labels = ['volume', 'naaid', 'pod', 'vgroup', 'dimension'])
 
     def _mk_metric(self, metric, entity_list, mapping):
         """
-        Create metrics of gauge type, with volume name, naaid and
-        dimension as label.
+        Create metrics of gauge type, with volume name, naaid, pod, vgroup
+        and dimension as label.
         Metrics values can be iterated over.
         """
-        p = re.compile(r'::')
         for e in entity_list:
+            labels = e['labels']
+            timestamp = self.fa.sample_time(e)
             for k in mapping:
                 if k in e:
-                    e_name = p.split(e['name'])
-                    if len(e_name) == 1:
-                        e_name = ['/'] + e_name
-                    metric.add_metric([e_name[1], e['naaid'], e_name[0], e['vgroup'], mapping[k]], e[k])
+                    metric.add_metric(labels + (mapping[k],), e[k], timestamp=timestamp)
 
     def _latency(self):
         """
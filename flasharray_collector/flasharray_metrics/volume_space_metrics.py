@@ -1,5 +1,4 @@
-from prometheus_client.core import GaugeMetricFamily
-import re
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
 
 
 class VolumeSpaceMetrics():
@@ -9,23 +8,16 @@ class VolumeSpaceMetrics():
 
     def __init__(self, fa):
         self.fa = fa
-        self.data_reduction = GaugeMetricFamily('purefa_volume_space_datareduction_ratio',
-                                                'FlashArray volumes data reduction ratio',
-                                                labels=['volume', 'naaid', 'pod', 'vgroup'],
-                                                unit='ratio')
-        self.size = GaugeMetricFamily('purefa_volume_space_size_bytes',
-                                      'FlashArray volumes size',
-                                      labels=['volume', 'naaid', 'pod', 'vgroup'])
-        self.allocated = GaugeMetricFamily('purefa_volume_space_bytes',
-                                           'FlashArray allocated space',
-                                           labels=['volume', 'naaid', 'pod', 'vgroup', 'dimension'])
-
-    def __split_vname(self, vname):
-        p = re.compile(r'::')
-        v_name = p.split(vname)
-        if len(v_name) == 1:
-            v_name = ['/'] + v_name
-        return v_name
+        self.data_reduction = CompactGaugeMetricFamily('purefa_volume_space_datareduction_ratio',
+                                                       'FlashArray volumes data reduction ratio',
+                                                       labels=['volume', 'naaid', 'pod', 'vgroup'],
+                                                       unit='ratio')
+        self.size = CompactGaugeMetricFamily('purefa_volume_space_size_bytes',
+                                             'FlashArray volumes size',
+                                             labels=['volume', 'naaid', 'pod', 'vgroup'])
+        self.allocated = CompactGaugeMetricFamily('purefa_volume_space_bytes',
+                                                  'FlashArray allocated space',
+                                                  labels=['volume', 'naaid', 'pod', 'vgroup', 'dimension'])
 
     def _data_reduction(self):
         """
@@ -33,21 +25,18 @@ class VolumeSpaceMetrics():
         Metrics values can be iterated over.
         """
         for v in self.fa.get_volumes():
-            v_name = self.__split_vname(v['name'])
-            self.data_reduction.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup']], v['data_reduction'] if v['data_reduction'] is not None else 0)
+            self.data_reduction.add_metric(v['labels'], v['data_reduction'] if v['data_reduction'] is not None else 0)
 
 
     def _size(self):
         for v in self.fa.get_volumes():
-            v_name = self.__split_vname(v['name'])
-            self.size.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup']], v['size'] if v['size'] is not None else 0)
+            self.size.add_metric(v['labels'], v['size'] if v['size'] is not None else 0)
 
     def _allocated(self):
         for v in self.fa.get_volumes():
-            v_name = self.__split_vname(v['name'])
-            self.allocated.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup'], 'volumes'], v['volumes'] if v['volumes'] is not None else 0)
-            self.allocated.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup'], 'snapshots'], v['snapshots'] if v['snapshots'] is not None else 0)
-            self.allocated.add_metric([v_name[1], v['naaid'], v_name[0], v['vgroup'], 'total'], v['total'] if v['total'] is not None else 0)
+            self.allocated.add_metric(v['labels'] + ('volumes',), v['volumes'] if v['volumes'] is not None else 0)
+            self.allocated.add_metric(v['labels'] + ('snapshots',), v['snapshots'] if v['snapshots'] is not None else 0)
+            self.allocated.add_metric(v['labels'] + ('total',), v['total'] if v['total'] is not None else 0)
 
     def get_metrics(self):
         self._data_reduction()
@@ -1 +1,2 @@
 from .flashblade_collector import FlashbladeCollector
+from .flashblade_metrics.cassette import Cassette
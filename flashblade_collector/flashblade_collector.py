@@ -14,6 +14,7 @@ from .flashblade_metrics.buckets_replica_metrics import BucketsReplicaMetrics
 from .flashblade_metrics.filesystems_replica_metrics import FilesystemsReplicaMetrics
 from .flashblade_metrics.usage_users_metrics import UsageUsersMetrics
 from .flashblade_metrics.usage_groups_metrics import UsageGroupsMetrics
+from .flashblade_metrics.instrumentation import instrumentation
 
 
 class FlashbladeCollector():
@@ -27,32 +28,52 @@ class FlashbladeCollector():
     :type target: str
     :param api_token: API token of the user with which to log in.
     :type api_token: str
+    :param refresh_intervals: refresh interval in seconds of each tier of
+                              array data, e.g. {'hardware': 600}.
+    :type refresh_intervals: dict
+    :param timestamps: expose the performance samples with the time
+                       reported by the array.
+    :type timestamps: bool
+    :param transport: REST transport to the array, 'sync' or 'async'.
+    :type transport: str
+    :param cassette: cassette recording the REST calls of the scrape, or
+                     replaying them in place of the array.
+    :type cassette: Cassette
     """
-    def __init__(self, endpoint, api_token, request='all'):
+    def __init__(self, endpoint, api_token, request='all',
+                 refresh_intervals=None, timestamps=False, transport='sync',
+                 cassette=None):
         self.fb = None
         try:
-            self.fb = FlashBlade(endpoint, api_token)
+            self.fb = FlashBlade(endpoint, api_token, refresh_intervals,
+                                 timestamps, transport, cassette)
         except Exception as e:
             raise Exception('Connection with FlashBlade {} not initialized. Check array name/address and api-token'.format(endpoint))
+        self.endpoint = endpoint
         self.request = request
 
+    def _metrics(self, metrics_class):
+        """Return the metrics of a metric class, recording their collection."""
+        return instrumentation.collection(self.endpoint, metrics_class.__name__,
+                                          lambda: metrics_class(self.fb).get_metrics())
+
     def collect(self):
         """Global collector method for all the collected array metrics."""
         if self.request in ['all', 'array']:
-            yield from ArrayInfoMetrics(self.fb).get_metrics()
-            yield from ArrayHardwareMetrics(self.fb).get_metrics()
-            yield from ArrayEventsMetrics(self.fb).get_metrics()
-            yield from ArrayPerformanceMetrics(self.fb).get_metrics()
-            yield from ArraySpecificPerformanceMetrics(self.fb).get_metrics()
-            yield from ArraySpaceMetrics(self.fb).get_metrics()
-            yield from FilesystemsSpaceMetrics(self.fb).get_metrics()
-            yield from BucketsSpaceMetrics(self.fb).get_metrics()
-            yield from FilesystemsPerformanceMetrics(self.fb).get_metrics()
-            yield from BucketsPerformanceMetrics(self.fb).get_metrics()
-            yield from BucketsReplicaMetrics(self.fb).get_metrics()
-            yield from FilesystemsReplicaMetrics(self.fb).get_metrics()
+            yield from self._metrics(ArrayInfoMetrics)
+            yield from self._metrics(ArrayHardwareMetrics)
+            yield from self._metrics(ArrayEventsMetrics)
+            yield from self._metrics(ArrayPerformanceMetrics)
+            yield from self._metrics(ArraySpecificPerformanceMetrics)
+            yield from self._metrics(ArraySpaceMetrics)
+            yield from self._metrics(FilesystemsSpaceMetrics)
+            yield from self._metrics(BucketsSpaceMetrics)
+            yield from self._metrics(FilesystemsPerformanceMetrics)
+            yield from self._metrics(BucketsPerformanceMetrics)
+            yield from self._metrics(BucketsReplicaMetrics)
+            yield from self._metrics(FilesystemsReplicaMetrics)
         if self.request in ['all', 'usage']:
-            yield from UsageUsersMetrics(self.fb).get_metrics()
-            yield from UsageGroupsMetrics(self.fb).get_metrics()
+            yield from self._metrics(UsageUsersMetrics)
+            yield from self._metrics(UsageGroupsMetrics)
         if self.request in ['all', 'clients']:
-            yield from ClientsPerformanceMetrics(self.fb).get_metrics()
+            yield from self._metrics(ClientsPerformanceMetrics)
@@ -30,9 +30,10 @@ class ArrayPerformanceMetrics():
             m = self.fb.get_array_performance(p)
             if m is None:
                 continue
-            self.latency.add_metric([p, 'read'], m.usec_per_read_op)
-            self.latency.add_metric([p, 'write'], m.usec_per_write_op)
-            self.latency.add_metric([p, 'other'], m.usec_per_other_op)
+            ts = self.fb.sample_time(m)
+            self.latency.add_metric([p, 'read'], m.usec_per_read_op, timestamp=ts)
+            self.latency.add_metric([p, 'write'], m.usec_per_write_op, timestamp=ts)
+            self.latency.add_metric([p, 'other'], m.usec_per_other_op, timestamp=ts)
 
     def _iops(self):
         """
@@ -42,9 +43,10 @@ class ArrayPerformanceMetrics():
             m = self.fb.get_array_performance(p)
             if m is None:
                 continue
-            self.iops.add_metric([p, 'read'], m.reads_per_sec)
-            self.iops.add_metric([p, 'write'], m.writes_per_sec)
-            self.iops.add_metric([p, 'other'], m.others_per_sec)
+            ts = self.fb.sample_time(m)
+            self.iops.add_metric([p, 'read'], m.reads_per_sec, timestamp=ts)
+            self.iops.add_metric([p, 'write'], m.writes_per_sec, timestamp=ts)
+            self.iops.add_metric([p, 'other'], m.others_per_sec, timestamp=ts)
             # self.iops.add_metric([p, 'in'], m.input_per_sec)
             # self.iops.add_metric([p, 'out'], m.output_per_sec)
 
@@ -56,9 +58,10 @@ class ArrayPerformanceMetrics():
             m = self.fb.get_array_performance(p)
             if m is None:
                 continue
-            self.ops_size.add_metric([p, 'per_op'], m.bytes_per_op)
-            self.ops_size.add_metric([p, 'read'], m.bytes_per_read)
-            self.ops_size.add_metric([p, 'write'], m.bytes_per_write)
+            ts = self.fb.sample_time(m)
+            self.ops_size.add_metric([p, 'per_op'], m.bytes_per_op, timestamp=ts)
+            self.ops_size.add_metric([p, 'read'], m.bytes_per_read, timestamp=ts)
+            self.ops_size.add_metric([p, 'write'], m.bytes_per_write, timestamp=ts)
 
     def _throughput(self):
         """
@@ -68,8 +71,9 @@ class ArrayPerformanceMetrics():
             m = self.fb.get_array_performance(p)
             if m is None:
                 continue
-            self.throughput.add_metric([p, 'read'], m.read_bytes_per_sec)
-            self.throughput.add_metric([p, 'write'], m.write_bytes_per_sec)
+            ts = self.fb.sample_time(m)
+            self.throughput.add_metric([p, 'read'], m.read_bytes_per_sec, timestamp=ts)
+            self.throughput.add_metric([p, 'write'], m.write_bytes_per_sec, timestamp=ts)
 
     def get_metrics(self):
         self._latency()
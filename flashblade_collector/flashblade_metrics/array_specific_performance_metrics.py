@@ -32,10 +32,11 @@ class ArraySpecificPerformanceMetrics():
 
             m = self.fb.get_array_specific_performance(proto)
             if m is not None:
+                ts = self.fb.sample_time(m)
                 for _k in getattr(m, '__dict__'):
                     k = _k[1:]
                     if k in mapping.keys() and getattr(m, _k) is not None :
-                        metric.add_metric([proto, mapping[k]], getattr(m, _k))
+                        metric.add_metric([proto, mapping[k]], getattr(m, _k), timestamp=ts)
 
         _add_metric('nfs', self.latency)
         _add_metric('http', self.latency)
@@ -55,10 +56,11 @@ class ArraySpecificPerformanceMetrics():
 
             m = self.fb.get_array_specific_performance(proto)
             if m is not None:
+                ts = self.fb.sample_time(m)
                 for _k in getattr(m, '__dict__'):
                     k = _k[1:]
                     if k in mapping.keys() and getattr(m, _k) is not None :
-                        metric.add_metric([proto, mapping[k]], getattr(m, _k))
+                        metric.add_metric([proto, mapping[k]], getattr(m, _k), timestamp=ts)
 
         _add_metric('nfs', self.iops)
         _add_metric('http', self.iops)
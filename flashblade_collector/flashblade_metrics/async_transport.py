@@ -0,0 +1,215 @@
+import asyncio
+import atexit
+import threading
+import weakref
+from urllib.parse import quote
+from purity_fb import rest
+from purity_fb.api_client.api_client import ApiClient
+from .session_pool import sessions
+from .instrumentation import instrumentation
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# Maximum number of connections kept open towards all the arrays, and
+# towards a single array
+DEFAULT_MAX_CONNECTIONS = 256
+DEFAULT_MAX_CONNECTIONS_PER_ARRAY = 16
+
+
+class _Response():
+    """
+    REST response body in the form expected by the purity_fb deserializer
+    """
+    def __init__(self, data):
+        self.data = data
+
+
+class _AsyncApiClient(ApiClient):
+    """
+    purity_fb API client issuing its requests over aiohttp. Its call_api
+    returns a coroutine, so that the purity_fb API methods bound to it, e.g.
+    arrays.list_arrays_performance(protocol='nfs'), build the same REST 1.x
+    requests and deserialize the same models as the synchronous client, but
+    must be awaited.
+    The client shares the host, models and default headers, hence the
+    session token, of a pooled synchronous client, so that it needs no
+    login of its own and follows the renewals of the pooled session.
+    """
+    def __init__(self, client, http, timeout):
+        # The urllib3 pool of the base class is not needed
+        self.host = client._api_client.host
+        self.models = client._api_client.models
+        self.default_headers = client._api_client.default_headers
+        self.cookie = None
+        self.http = http
+        self.timeout = timeout
+        # API objects bound to the client, by purity_fb API class
+        self.apis = {}
+
+    def call_api(self, resource_path, method,
+                 path_params=None, query_params=None, header_params=None,
+                 body=None, post_params=None, files=None,
+                 response_type=None, auth_settings=None, callback=None,
+                 _return_http_data_only=None, collection_formats=None,
+                 _preload_content=True, _request_timeout=None):
+        return self._request(resource_path, method, path_params, query_params,
+                             header_params, body, response_type, auth_settings,
+                             _return_http_data_only, collection_formats)
+
+    async def _request(self, resource_path, method, path_params, query_params,
+                       header_params, body, response_type, auth_settings,
+                       _return_http_data_only, collection_formats):
+        headers = dict(header_params or {})
+        headers.update(self.default_headers)
+        headers = dict(self.parameters_to_tuples(
+            self.sanitize_for_serialization(headers), collection_formats))
+        for k, v in self.parameters_to_tuples(
+                self.sanitize_for_serialization(path_params or {}), collection_formats):
+            resource_path = resource_path.replace('{%s}' % k, quote(str(v), safe=''))
+        query = self.parameters_to_tuples(
+            self.sanitize_for_serialization(query_params or []), collection_formats)
+        self.update_params_for_auth(headers, query, auth_settings)
+        if body:
+            body = self.sanitize_for_serialization(body)
+
+        # Query values are formatted as urllib3 does, e.g. True as 'True'
+        async with self.http.request(method, self.host + resource_path,
+                                     params=[(k, str(v)) for k, v in query],
+                                     headers=headers, json=body,
+                                     timeout=self.timeout) as resp:
+            data = await resp.read()
+            instrumentation.add_payload(len(data))
+            status, reason, resp_headers = resp.status, resp.reason, resp.headers
+        if not 200 <= status <= 299:
+            e = rest.ApiException(status=status, reason=reason)
+            e.body = data
+            e.headers = resp_headers
+            raise e
+
+        result = None
+        if response_type:
+            result = self.deserialize(_Response(data), response_type)
+        if _return_http_data_only:
+            return result
+        return result, status, resp_headers
+
+
+class AsyncTransport():
+    """
+    Asyncio REST transport to the FlashBlade arrays, allowing many REST calls
+    to be in flight at once over a connection pool shared by all the arrays.
+    The calls are expressed as methods of the API objects of a pooled
+    purity_fb client, e.g. client.file_systems.list_file_systems_performance,
+    and are replayed on an asyncio event loop run by a background thread, so
+    that they can be issued by the synchronous collectors.
+    :param max_connections: maximum number of connections to all the arrays.
+    :type max_connections: int
+    :param max_connections_per_array: maximum number of connections, and of
+                                      concurrent calls, to a single array.
+    :type max_connections_per_array: int
+    """
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_connections_per_array=DEFAULT_MAX_CONNECTIONS_PER_ARRAY):
+        self.max_connections = max_connections
+        self.max_connections_per_array = max_connections_per_array
+        self._loop = None
+        self._http = None
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                if aiohttp is None:
+                    raise RuntimeError('The async FlashBlade transport requires the aiohttp package')
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='fb-transport',
+                                 daemon=True).start()
+                self._loop = loop
+                atexit.register(self.close)
+        return self._loop
+
+    async def _close(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        self._clients.clear()
+
+    def close(self):
+        """Close the connection pool and stop the event loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    def _client(self, client):
+        """
+        Return the async API client bound to a pooled client. Must be
+        called from the event loop.
+        """
+        if self._http is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                             limit_per_host=self.max_connections_per_array,
+                                             ssl=False)
+            self._http = aiohttp.ClientSession(connector=connector)
+        api_client = self._clients.get(client)
+        if api_client is None:
+            # Same timeouts as the synchronous pooled sessions
+            timeout = aiohttp.ClientTimeout(sock_connect=2.0, sock_read=60.0)
+            api_client = _AsyncApiClient(client, self._http, timeout)
+            self._clients[client] = api_client
+        return api_client
+
+    async def _call(self, client, api_token, func, kwargs):
+        with instrumentation.rest_call(client, func, kwargs):
+            return await self._renewing_call(client, api_token, func, kwargs)
+
+    async def _renewing_call(self, client, api_token, func, kwargs):
+        api_client = self._client(client)
+        api = api_client.apis.get(type(func.__self__))
+        if api is None:
+            api = type(func.__self__)(api_client)
+            api_client.apis[type(func.__self__)] = api
+        method = getattr(api, func.__name__)
+        auth_token = client._api_client.default_headers.get('x-auth-token')
+        try:
+            return await method(**kwargs)
+        except rest.ApiException as e:
+            if e.status != 401:
+                raise
+        # Log in again through the session pool, which blocks
+        await asyncio.get_running_loop().run_in_executor(
+            None, sessions.renew, client, api_token, auth_token)
+        return await method(**kwargs)
+
+    async def _gather(self, client, api_token, func, kwargs_list):
+        return await asyncio.gather(*[self._call(client, api_token, func, kwargs)
+                                      for kwargs in kwargs_list],
+                                    return_exceptions=True)
+
+    def call(self, client, api_token, func, **kwargs):
+        """
+        Issue a REST call given as a method of the API objects of a pooled
+        client, and return its response.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._call(client, api_token, func, kwargs), self._start()).result()
+
+    def gather(self, client, api_token, func, kwargs_list):
+        """
+        Issue concurrently the same REST call once per set of keyword
+        arguments, and return the responses in the same order, or the
+        exception raised by each failed call.
+        """
+        if not kwargs_list:
+            return []
+        return asyncio.run_coroutine_threadsafe(
+            self._gather(client, api_token, func, kwargs_list), self._start()).result()
+
+
+transport = AsyncTransport()
@@ -21,11 +21,12 @@ class BucketsPerformanceMetrics():
         account name and the bucket name as labels.
         """
         for b in self.buckets_performance:
-            self.latency.add_metric([b.name, 'read_buckets'], b.usec_per_read_bucket_op)
-            self.latency.add_metric([b.name, 'read_objects'], b.usec_per_read_object_op)
-            self.latency.add_metric([b.name, 'write_buckets'], b.usec_per_write_bucket_op)
-            self.latency.add_metric([b.name, 'write_objects'], b.usec_per_write_object_op)
-            self.latency.add_metric([b.name, 'other'], b.usec_per_other_op)
+            ts = self.fb.sample_time(b)
+            self.latency.add_metric([b.name, 'read_buckets'], b.usec_per_read_bucket_op, timestamp=ts)
+            self.latency.add_metric([b.name, 'read_objects'], b.usec_per_read_object_op, timestamp=ts)
+            self.latency.add_metric([b.name, 'write_buckets'], b.usec_per_write_bucket_op, timestamp=ts)
+            self.latency.add_metric([b.name, 'write_objects'], b.usec_per_write_object_op, timestamp=ts)
+            self.latency.add_metric([b.name, 'other'], b.usec_per_other_op, timestamp=ts)
 
     def _throughput(self):
         """
@@ -33,11 +34,12 @@ class BucketsPerformanceMetrics():
         the account name and the bucket name as labels.
         """
         for b in self.buckets_performance:
-            self.throughput.add_metric([b.name, 'read_buckets'], b.read_buckets_per_sec)
-            self.throughput.add_metric([b.name, 'read_objects'], b.read_objects_per_sec)
-            self.throughput.add_metric([b.name, 'write_buckets'], b.write_buckets_per_sec)
-            self.throughput.add_metric([b.name, 'write_objects'], b.write_objects_per_sec)
-            self.throughput.add_metric([b.name, 'other'], b.others_per_sec)
+            ts = self.fb.sample_time(b)
+            self.throughput.add_metric([b.name, 'read_buckets'], b.read_buckets_per_sec, timestamp=ts)
+            self.throughput.add_metric([b.name, 'read_objects'], b.read_objects_per_sec, timestamp=ts)
+            self.throughput.add_metric([b.name, 'write_buckets'], b.write_buckets_per_sec, timestamp=ts)
+            self.throughput.add_metric([b.name, 'write_objects'], b.write_objects_per_sec, timestamp=ts)
+            self.throughput.add_metric([b.name, 'other'], b.others_per_sec, timestamp=ts)
 
     def get_metrics(self):
         self._latency()
@@ -0,0 +1,119 @@
+import importlib
+import time
+from purity_fb import rest
+from purity_fb.api_client.api_client import ApiClient
+from exporter_common import cassette
+from .session_pool import sessions
+from .instrumentation import instrumentation
+
+
+class _Response():
+    """
+    REST response body in the form expected by the purity_fb deserializer
+    """
+    def __init__(self, data):
+        self.data = data
+
+
+class _ReplayClient():
+    """
+    Stand-in for a PurityFb client, e.g. client.file_systems.list_file_systems
+    """
+    def __init__(self, recording):
+        self._api = cassette.ReplayClient(recording)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._api
+
+
+class Cassette(cassette.Cassette):
+    """
+    Recording of the REST calls of FlashBlade scrapes, used by FlashBlade
+    as its REST transport. A new cassette issues the calls one at a time
+    through the pooled session and records them, while a cassette read by
+    load() answers the calls from the recording instead, one at a time,
+    with the stand-in client returned by client().
+    The API token and the session token are never recorded, as the calls
+    are recorded at the level of the API methods.
+    :param scrub: whether to replace the ids of the array, file systems
+                  and buckets and the hardware serial numbers with
+                  pseudonyms.
+    :type scrub: bool
+    :param info: description of the recording, stored in the file header.
+    :type info: dict
+    """
+    ARRAY_TYPE = 'flashblade'
+    # Response fields identifying the array, its hardware and its file
+    # systems and buckets
+    SCRUBBED_KEYS = frozenset(['id', 'serial'])
+
+    def __init__(self, scrub=False, info=None):
+        super().__init__(scrub, info)
+        # Only used to convert the models to and from JSON
+        self._api_client = ApiClient()
+        self._models = None
+
+    def client(self):
+        """Return a stand-in client answering from the cassette."""
+        return _ReplayClient(self)
+
+    def _encode(self, response):
+        # The models of the REST version the client was created for
+        self._models = type(response).__module__.rpartition('.')[0]
+        return type(response).__name__, self._api_client.sanitize_for_serialization(response)
+
+    def _decode(self, type_name, data):
+        return self._api_client.deserialize(_Response(data), type_name)
+
+    def _encode_error(self, error):
+        return {'status': error.status, 'reason': error.reason}
+
+    def _error(self, data):
+        return rest.ApiException(**data)
+
+    def _missing(self, method, params):
+        return rest.ApiException(status=404, reason='No recorded call of {} with {}'.format(
+                                 method, params))
+
+    def _header(self):
+        return {'models': self._models}
+
+    def call(self, client, api_token, func, **kwargs):
+        """
+        Issue a REST call given as a method of the API objects of client
+        and return its response, or replay it.
+        """
+        if self.replaying:
+            return self.replay(func.__name__, kwargs)
+        start = time.perf_counter()
+        try:
+            with instrumentation.rest_call(client, func, kwargs):
+                result = sessions.call(client, api_token, func, **kwargs)
+        except rest.ApiException as e:
+            self.record(func.__name__, kwargs, time.perf_counter() - start, error=e)
+            raise
+        self.record(func.__name__, kwargs, time.perf_counter() - start, result)
+        return result
+
+    def gather(self, client, api_token, func, kwargs_list):
+        """
+        Issue the same REST call once per set of keyword arguments, one at
+        a time, and return the responses in the same order, or the
+        exception raised by each failed call.
+        """
+        results = []
+        for kwargs in kwargs_list:
+            try:
+                results.append(self.call(client, api_token, func, **kwargs))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    @classmethod
+    def load(cls, path, scale=1.0):
+        loaded = super().load(path, scale)
+        if loaded.info.get('models'):
+            loaded._api_client.models = importlib.import_module(loaded.info['models'])
+        return loaded
@@ -26,39 +26,43 @@ class ClientsPerformanceMetrics():
         Create metrics of gauge type for client latency metrics.
         """
         for cperf in self.clients_performance:
+            ts = self.fb.sample_time(cperf)
             client, port = cperf.name.split(':')
-            self.latency.add_metric([client, port, 'read'], cperf.usec_per_read_op)
-            self.latency.add_metric([client, port, 'write'], cperf.usec_per_write_op)
-            self.latency.add_metric([client, port, 'other'], cperf.usec_per_other_op)
+            self.latency.add_metric([client, port, 'read'], cperf.usec_per_read_op, timestamp=ts)
+            self.latency.add_metric([client, port, 'write'], cperf.usec_per_write_op, timestamp=ts)
+            self.latency.add_metric([client, port, 'other'], cperf.usec_per_other_op, timestamp=ts)
 
     def _iops(self):
         """
         Create metrics of gauge type for client iops metrics.
         """
         for cperf in self.clients_performance:
+            ts = self.fb.sample_time(cperf)
             client, port = cperf.name.split(':')
-            self.iops.add_metric([client, port, 'read'], cperf.reads_per_sec)
-            self.iops.add_metric([client, port, 'write'], cperf.writes_per_sec)
-            self.iops.add_metric([client, port, 'other'], cperf.others_per_sec)
+            self.iops.add_metric([client, port, 'read'], cperf.reads_per_sec, timestamp=ts)
+            self.iops.add_metric([client, port, 'write'], cperf.writes_per_sec, timestamp=ts)
+            self.iops.add_metric([client, port, 'other'], cperf.others_per_sec, timestamp=ts)
 
     def _ops_size(self):
         """
         Create metrics of gauge type for client operations size  metrics.
         """
         for cperf in self.clients_performance:
+            ts = self.fb.sample_time(cperf)
             client, port = cperf.name.split(':')
-            self.ops_size.add_metric([client, port, 'per_op'], cperf.bytes_per_op)
-            self.ops_size.add_metric([client, port, 'read'], cperf.bytes_per_read)
-            self.ops_size.add_metric([client, port, 'write'], cperf.bytes_per_write)
+            self.ops_size.add_metric([client, port, 'per_op'], cperf.bytes_per_op, timestamp=ts)
+            self.ops_size.add_metric([client, port, 'read'], cperf.bytes_per_read, timestamp=ts)
+            self.ops_size.add_metric([client, port, 'write'], cperf.bytes_per_write, timestamp=ts)
 
     def _throughput(self):
         """
         Create metrics of gauge type for client throughput metrics.
         """
         for cperf in self.clients_performance:
+            ts = self.fb.sample_time(cperf)
             client, port = cperf.name.split(':')
-            self.throughput.add_metric([client, port, 'read'], cperf.read_bytes_per_sec)
-            self.throughput.add_metric([client, port, 'write'], cperf.write_bytes_per_sec)
+            self.throughput.add_metric([client, port, 'read'], cperf.read_bytes_per_sec, timestamp=ts)
+            self.throughput.add_metric([client, port, 'write'], cperf.write_bytes_per_sec, timestamp=ts)
 
     def get_metrics(self):
         self._latency()
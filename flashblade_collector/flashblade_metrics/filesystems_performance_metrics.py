@@ -29,9 +29,10 @@ class FilesystemsPerformanceMetrics():
         with filesystem name as label.
         """
         for f in self.nfs_filesystems_performance:
-            self.latency.add_metric(['nfs', f.name, 'read'], f.usec_per_read_op)
-            self.latency.add_metric(['nfs', f.name, 'write'], f.usec_per_write_op)
-            self.latency.add_metric(['nfs', f.name, 'other'], f.usec_per_other_op)
+            ts = self.fb.sample_time(f)
+            self.latency.add_metric(['nfs', f.name, 'read'], f.usec_per_read_op, timestamp=ts)
+            self.latency.add_metric(['nfs', f.name, 'write'], f.usec_per_write_op, timestamp=ts)
+            self.latency.add_metric(['nfs', f.name, 'other'], f.usec_per_other_op, timestamp=ts)
 
     def _iops(self):
         """
@@ -39,9 +40,10 @@ class FilesystemsPerformanceMetrics():
         with filesystem name as label.
         """
         for f in self.nfs_filesystems_performance:
-            self.iops.add_metric(['nfs', f.name, 'read'], f.reads_per_sec)
-            self.iops.add_metric(['nfs', f.name, 'write'], f.writes_per_sec)
-            self.iops.add_metric(['nfs', f.name, 'other'], f.others_per_sec)
+            ts = self.fb.sample_time(f)
+            self.iops.add_metric(['nfs', f.name, 'read'], f.reads_per_sec, timestamp=ts)
+            self.iops.add_metric(['nfs', f.name, 'write'], f.writes_per_sec, timestamp=ts)
+            self.iops.add_metric(['nfs', f.name, 'other'], f.others_per_sec, timestamp=ts)
 
     def _ops_size(self):
         """
@@ -50,9 +52,10 @@ class FilesystemsPerformanceMetrics():
         """
 
         for f in self.nfs_filesystems_performance:
-            self.ops_size.add_metric(['nfs', f.name, 'per_op'], f.bytes_per_op)
-            self.ops_size.add_metric(['nfs', f.name, 'read'], f.bytes_per_read)
-            self.ops_size.add_metric(['nfs', f.name, 'write'], f.bytes_per_write)
+            ts = self.fb.sample_time(f)
+            self.ops_size.add_metric(['nfs', f.name, 'per_op'], f.bytes_per_op, timestamp=ts)
+            self.ops_size.add_metric(['nfs', f.name, 'read'], f.bytes_per_read, timestamp=ts)
+            self.ops_size.add_metric(['nfs', f.name, 'write'], f.bytes_per_write, timestamp=ts)
 
     def _throughput(self):
         """
@@ -60,8 +63,9 @@ class FilesystemsPerformanceMetrics():
         with filesystem name as label.
         """
         for f in self.nfs_filesystems_performance:
-            self.throughput.add_metric(['nfs', f.name, 'read'], f.read_bytes_per_sec)
-            self.throughput.add_metric(['nfs', f.name, 'write'], f.write_bytes_per_sec)
+            ts = self.fb.sample_time(f)
+            self.throughput.add_metric(['nfs', f.name, 'read'], f.read_bytes_per_sec, timestamp=ts)
+            self.throughput.add_metric(['nfs', f.name, 'write'], f.write_bytes_per_sec, timestamp=ts)
 
     def get_metrics(self):
         self._latency()
@@ -1,25 +1,74 @@
+import sys
+import time
 import urllib3
-import six
-from purity_fb import PurityFb, rest
+from .session_pool import sessions
+from .instrumentation import instrumentation
+from . import async_transport
 
 # disable ceritificate warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Seconds for which the data of each refresh tier is reused across scrapes
+# before being requested again to the array. 0 means at every scrape. The
+# user and group usage is not cached by default, as the cached records
+# grow with the number of users.
+DEFAULT_REFRESH_INTERVALS = {'hardware': 600,
+                             'space': 120,
+                             'usage': 0,
+                             'performance': 0}
+
+# Maximum number of entity names given to a single listing call, keeping
+# the request URL short enough for the array
+NAMES_PER_CALL = 50
+
+# Maximum number of user or group usage records requested per call, and
+# number of file systems whose usage is requested at the same time, which
+# bound the usage responses held in memory
+USAGE_PAGE_SIZE = 1000
+USAGE_FILE_SYSTEMS_PER_ROUND = 16
 
 class FlashBlade():
     """
     Base class for FlashBlade Prometheus array info
+    :param refresh_intervals: refresh interval in seconds of the 'hardware',
+                              'space', 'usage' and 'performance' tiers,
+                              overriding DEFAULT_REFRESH_INTERVALS.
+    :type refresh_intervals: dict
+    :param timestamps: whether performance samples carry the time the
+                       array reported for them.
+    :type timestamps: bool
+    :param transport: 'sync' to issue the REST calls one at a time through
+                      purity_fb, 'async' to issue them through the asyncio
+                      transport, which runs the per filesystem and per
+                      bucket calls concurrently.
+    :type transport: str
+    :param cassette: cassette on which to record the REST calls, or from
+                     which to replay them without connecting to the array,
+                     used in place of the transport. Either way the data
+                     cached by previous scrapes is not used, so that every
+                     call of the scrape is recorded.
+    :type cassette: Cassette
     """
-    def __init__(self, endpoint, api_token):
-        self.flashblade = None
-        try:
-            self.flashblade = PurityFb(host=endpoint)
-            self.flashblade.disable_verify_ssl()
-            self.flashblade._api_client.user_agent = 'Purity_FB_Prometheus_exporter/1.0'
-            self.flashblade.request_timeout = urllib3.Timeout(connect=2.0, read=60.0)
-            self.flashblade.login(api_token)
-        except Exceprion:
-            pass
+    def __init__(self, endpoint, api_token, refresh_intervals=None,
+                 timestamps=False, transport='sync', cassette=None):
+        self.api_token = api_token
+        # Pooled client, in use until the end of the scrape
+        self._session = None
+        self.timestamps = timestamps
+        self.transport = None
+        if cassette is not None:
+            self.transport = cassette
+        elif transport == 'async':
+            self.transport = async_transport.transport
+        self.refresh_intervals = dict(DEFAULT_REFRESH_INTERVALS,
+                                      **(refresh_intervals or {}))
+        if cassette is not None and cassette.replaying:
+            self.flashblade = cassette.client()
+            self.cache = {}
+        else:
+            self._session = sessions.get(endpoint, api_token)
+            self.flashblade = self._session
+            self.cache = {} if cassette is not None else sessions.cache(endpoint, api_token)
         self.filesystems = []
         self.buckets = []
         self.array_performance = {}
@@ -36,27 +85,132 @@ class FlashBlade():
         self.buckets_performance = []
         self.buckets_replica_links = []
         self.filesystems_replica_links = []
-        self.users_usage = []
-        self.groups_usage = []
         self.clients_performance = []
 
     def __del__(self):
-        if self.flashblade is not None:
-            self.flashblade.logout()
+        # The REST session is left open in the pool for the next scrape
+        if self._session is not None:
+            sessions.release(self._session)
+
+    def _call(self, func, **kwargs):
+        """
+        Issue a REST call through the pooled session, which is renewed
+        if it has expired on the array side.
+        """
+        if self.transport is not None:
+            return self.transport.call(self.flashblade, self.api_token, func, **kwargs)
+        with instrumentation.rest_call(self.flashblade, func, kwargs):
+            return sessions.call(self.flashblade, self.api_token, func, **kwargs)
+
+    def _call_all(self, func, kwargs_list, tier=None):
+        """
+        Issue the same REST call once per set of keyword arguments, and
+        return the responses in the same order, with None in place of the
+        failed calls. The async transport issues the calls concurrently.
+        If a tier is given, the responses are cached as by _cached.
+        """
+        interval = self.refresh_intervals.get(tier, 0) if tier else 0
+        now = time.monotonic()
+        keys = [self._cache_key(func, kwargs) for kwargs in kwargs_list]
+        responses = [None] * len(kwargs_list)
+        missing = []
+        for i, key in enumerate(keys):
+            entry = self.cache.get(key) if interval > 0 else None
+            if entry is not None and now - entry[0] < interval:
+                responses[i] = entry[1]
+            else:
+                missing.append(i)
+
+        if self.transport is not None:
+            results = self.transport.gather(self.flashblade, self.api_token, func,
+                                            [kwargs_list[i] for i in missing])
+        else:
+            results = []
+            for i in missing:
+                try:
+                    results.append(self._call(func, **kwargs_list[i]))
+                except Exception as e:
+                    results.append(e)
+        for i, result in zip(missing, results):
+            if isinstance(result, Exception):
+                continue
+            responses[i] = result
+            if interval > 0:
+                self.cache[keys[i]] = (now, result)
+        return responses
+
+    def _list_by_names(self, func, names, **kwargs):
+        """
+        Return the items of the listing func for the entities of the given
+        names, issuing one call per chunk of NAMES_PER_CALL names, all of
+        them concurrently with the async transport, and following the
+        continuation tokens of paginated responses. The names of a chunk
+        whose call failed are requested one at a time, so that a name the
+        array rejects, e.g. of a file system destroyed since it was listed,
+        does not cost the items of the whole chunk.
+        """
+        kwargs_list = [dict(kwargs, names=names[i:i + NAMES_PER_CALL])
+                       for i in range(0, len(names), NAMES_PER_CALL)]
+        items = []
+        while kwargs_list:
+            next_calls = []
+            for call_kwargs, res in zip(kwargs_list, self._call_all(func, kwargs_list)):
+                if res is None:
+                    if len(call_kwargs['names']) > 1 and 'token' not in call_kwargs:
+                        next_calls.extend(dict(kwargs, names=[n]) for n in call_kwargs['names'])
+                    continue
+                items.extend(res.items)
+                token = res.pagination_info.continuation_token if res.pagination_info else None
+                if token:
+                    next_calls.append(dict(call_kwargs, token=token))
+            kwargs_list = next_calls
+        return items
+
+    @staticmethod
+    def _cache_key(func, kwargs):
+        return (func.__name__, repr(sorted(kwargs.items())))
+
+    def _cached(self, tier, func, **kwargs):
+        """
+        Issue a REST call, reusing the response of a previous scrape if it
+        is more recent than the refresh interval of the tier. The returned
+        data is shared with other scrapes and must not be modified.
+        """
+        interval = self.refresh_intervals.get(tier, 0)
+        if interval <= 0:
+            return self._call(func, **kwargs)
+        key = self._cache_key(func, kwargs)
+        now = time.monotonic()
+        entry = self.cache.get(key)
+        if entry is not None and now - entry[0] < interval:
+            return entry[1]
+        result = self._call(func, **kwargs)
+        self.cache[key] = (now, result)
+        return result
+
+    def sample_time(self, perf):
+        """
+        Return the time of a performance object, in seconds since the epoch,
+        as reported by the array in milliseconds. Return None if sample
+        timestamps are disabled or the time is not known.
+        """
+        if not self.timestamps or getattr(perf, 'time', None) is None:
+            return None
+        return perf.time / 1000.0
 
     def get_array_info(self):
-        return self.flashblade.arrays.list_arrays().items[0]
+        return self._cached('hardware', self.flashblade.arrays.list_arrays).items[0]
 
     def get_open_alerts(self):
-        return self.flashblade.alerts.list_alerts(filter="state='open'").items
+        return self._call(self.flashblade.alerts.list_alerts, filter="state='open'").items
 
     def get_hardware_status(self):
-        return self.flashblade.hardware.list_hardware().items
+        return self._cached('hardware', self.flashblade.hardware.list_hardware).items
 
     def get_array_performance(self, proto):
         if self.array_performance[proto] is None:
             try:
-                self.array_performance[proto] = self.flashblade.arrays.list_arrays_performance(protocol=proto).items[0]
+                self.array_performance[proto] = self._call(self.flashblade.arrays.list_arrays_performance, protocol=proto).items[0]
             except Exception:
                 pass
         return self.array_performance[proto]
@@ -65,21 +219,21 @@ class FlashBlade():
         if proto == 'http':
             if self.array_specific_perf['http'] is None:
                 try:
-                    self.array_specific_perf['http'] = self.flashblade.arrays.list_arrays_http_specific_performance().items[0]
+                    self.array_specific_perf['http'] = self._call(self.flashblade.arrays.list_arrays_http_specific_performance).items[0]
                 except Exception:
                     pass
             return self.array_specific_perf['http']
         if proto == 'nfs':
             if self.array_specific_perf['nfs'] is None:
                 try:
-                    self.array_specific_perf['nfs'] = self.flashblade.arrays.list_arrays_nfs_specific_performance().items[0]
+                    self.array_specific_perf['nfs'] = self._call(self.flashblade.arrays.list_arrays_nfs_specific_performance).items[0]
                 except Exception:
                     pass
             return self.array_specific_perf['nfs']
         if proto == 's3':
             if self.array_specific_perf['s3'] is None:
                 try:
-                    self.array_specific_perf['s3'] = self.flashblade.arrays.list_arrays_s3_specific_performance().items[0]
+                    self.array_specific_perf['s3'] = self._call(self.flashblade.arrays.list_arrays_s3_specific_performance).items[0]
                 except Exception:
                     pass
             return self.array_specific_perf['s3']
@@ -87,7 +241,7 @@ class FlashBlade():
     def get_filesystems(self):
         if not self.filesystems: 
             try:
-                self.filesystems = self.flashblade.file_systems.list_file_systems().items
+                self.filesystems = self._cached('space', self.flashblade.file_systems.list_file_systems).items
             except Exception:
                 pass
         return self.filesystems
@@ -95,7 +249,7 @@ class FlashBlade():
     def get_array_space(self):
         if self.array_space is None:
             try:
-                self.array_space = self.flashblade.arrays.list_arrays_space().items[0]
+                self.array_space = self._cached('space', self.flashblade.arrays.list_arrays_space).items[0]
             except Exception:
                 pass
         return self.array_space
@@ -103,35 +257,29 @@ class FlashBlade():
     def get_buckets(self):
         if not self.buckets:
             try:
-                self.buckets = self.flashblade.buckets.list_buckets().items
+                self.buckets = self._cached('space', self.flashblade.buckets.list_buckets).items
             except Exception:
                 pass
         return self.buckets
 
     def get_nfs_filesystems_performance(self):
         if not self.nfs_filesystems_performance:
-            for f in self.get_filesystems():
-                try:
-                   self.nfs_filesystems_performance.append(
-                           self.flashblade.file_systems.list_file_systems_performance(protocol='nfs',names=[f.name]).items[0])
-                except Exception:
-                    pass
+            self.nfs_filesystems_performance = self._list_by_names(
+                self.flashblade.file_systems.list_file_systems_performance,
+                [f.name for f in self.get_filesystems()], protocol='nfs')
         return self.nfs_filesystems_performance
 
     def get_buckets_performance(self):
         if not self.buckets_performance:
-            for b in self.get_buckets():
-                try:
-                    self.buckets_performance.append(
-                        self.flashblade.buckets.list_buckets_s3_specific_performance(names=[b.name]).items[0])
-                except Exception:
-                    pass
+            self.buckets_performance = self._list_by_names(
+                self.flashblade.buckets.list_buckets_s3_specific_performance,
+                [b.name for b in self.get_buckets()])
         return self.buckets_performance
 
     def get_bucket_replica_links(self):
         if not self.buckets_replica_links:
             try:
-                self.buckets_replica_links = self.flashblade.bucket_replica_links.list_bucket_replica_links().items
+                self.buckets_replica_links = self._call(self.flashblade.bucket_replica_links.list_bucket_replica_links).items
             except Exception:
                 pass
         return self.buckets_replica_links
@@ -139,39 +287,70 @@ class FlashBlade():
     def get_filesystem_replica_links(self):
         if not self.filesystems_replica_links:
             try:
-                self.filesystems_replica_links = self.flashblade.file_system_replica_links.list_file_system_replica_links().items
+                self.filesystems_replica_links = self._call(self.flashblade.file_system_replica_links.list_file_system_replica_links).items
             except Exception:
                 pass
         return self.filesystems_replica_links
 
-    def get_users_usage(self):
-        if not self.users_usage:
-            for f in self.get_filesystems():
-                try:
-                    uu = self.flashblade.usage_users.list_user_usage(file_system_names=[f.name]).items
-                    if len(uu) == 0:
+    def _usage(self, func, entity):
+        """
+        Yield the (file system name, name, id, quota, usage) rows of the
+        user or group usage records listed by func, as entity gives, for
+        every file system. The usage of USAGE_FILE_SYSTEMS_PER_ROUND file
+        systems is requested at a time, concurrently with the async
+        transport, by pages of USAGE_PAGE_SIZE records, each page being
+        turned into rows as soon as it lands, so that the responses held
+        in memory do not grow with the number of users. The rows of each
+        file system are cached in the 'usage' tier, if enabled, once all
+        its pages have been received. The file systems whose listing fails
+        are skipped, save the rows of the pages already received.
+        """
+        interval = self.refresh_intervals.get('usage', 0)
+        now = time.monotonic()
+        pending = []
+        for f in self.get_filesystems():
+            key = self._cache_key(func, {'file_system_names': [f.name]})
+            entry = self.cache.get(key) if interval > 0 else None
+            if entry is not None and now - entry[0] < interval:
+                yield from entry[1]
+            else:
+                pending.append(f.name)
+
+        for i in range(0, len(pending), USAGE_FILE_SYSTEMS_PER_ROUND):
+            rows = {}
+            kwargs_list = [{'file_system_names': [name], 'limit': USAGE_PAGE_SIZE}
+                           for name in pending[i:i + USAGE_FILE_SYSTEMS_PER_ROUND]]
+            while kwargs_list:
+                next_calls = []
+                for kwargs, res in zip(kwargs_list, self._call_all(func, kwargs_list)):
+                    fs_name = kwargs['file_system_names'][0]
+                    if res is None:
+                        rows.pop(fs_name, None)
                         continue
-                    self.users_usage = self.users_usage + uu
-                except Exception:
-                    pass
-        return self.users_usage
+                    fs_rows = rows.setdefault(fs_name, []) if interval > 0 else []
+                    for u in res.items:
+                        who = getattr(u, entity)
+                        row = (sys.intern(u.file_system.name), who.name, who.id, u.quota, u.usage)
+                        fs_rows.append(row)
+                        yield row
+                    token = res.pagination_info.continuation_token if res.pagination_info else None
+                    if token:
+                        next_calls.append(dict(kwargs, token=token))
+                    elif fs_name in rows:
+                        self.cache[self._cache_key(func, {'file_system_names': [fs_name]})] = (
+                            now, rows.pop(fs_name))
+                kwargs_list = next_calls
+
+    def get_users_usage(self):
+        return self._usage(self.flashblade.usage_users.list_user_usage, 'user')
 
     def get_groups_usage(self):
-        if not self.groups_usage:
-            for f in self.get_filesystems():
-                try:
-                    gu = self.flashblade.usage_groups.list_group_usage(file_system_names=[f.name]).items
-                    if len(gu) == 0:
-                        continue
-                    self.groups_usage = self.groups_usage + gu
-                except Exception:
-                    pass
-        return self.groups_usage
+        return self._usage(self.flashblade.usage_groups.list_group_usage, 'group')
 
     def get_clients_performance(self):
         if not self.clients_performance:
             try:
-                self.clients_performance = self.flashblade.arrays.list_clients_performance().items
+                self.clients_performance = self._call(self.flashblade.arrays.list_clients_performance).items
             except Exception:
                 pass
         return self.clients_performance
@@ -0,0 +1,24 @@
+from exporter_common.instrumentation import Instrumentation
+
+
+class FlashbladeInstrumentation(Instrumentation):
+    """
+    Record of the work done by the FlashBlade collector, whose REST calls
+    are recorded by the wrapper and the transports issuing them.
+    """
+    def wrap(self, client):
+        """
+        Account the size of the responses received by the REST client of
+        a PurityFb client.
+        """
+        rest_client = client._api_client.rest_client
+        request = rest_client.request
+
+        def counted(*args, **kwargs):
+            response = request(*args, **kwargs)
+            self.add_payload(len(response.data or b''))
+            return response
+        rest_client.request = counted
+
+
+instrumentation = FlashbladeInstrumentation('purefb')
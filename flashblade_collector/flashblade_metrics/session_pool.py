@@ -0,0 +1,60 @@
+import threading
+import urllib3
+from purity_fb import PurityFb, rest
+from exporter_common.session_pool import SessionPool, DEFAULT_MAX_SIZE, DEFAULT_IDLE_TTL
+from .instrumentation import instrumentation
+
+
+class FlashbladeSessionPool(SessionPool):
+    """
+    Pool of authenticated FlashBlade REST sessions, reused across scrapes.
+    Expired sessions are renewed by call() and renew(), as the purity_fb
+    client does not log in again by itself.
+    """
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, idle_ttl=DEFAULT_IDLE_TTL):
+        super().__init__(max_size, idle_ttl)
+        self._login_lock = threading.Lock()
+
+    def _login(self, endpoint, api_token):
+        flashblade = PurityFb(host=endpoint)
+        flashblade.disable_verify_ssl()
+        flashblade._api_client.user_agent = 'Purity_FB_Prometheus_exporter/1.0'
+        flashblade.request_timeout = urllib3.Timeout(connect=2.0, read=60.0)
+        flashblade.login(api_token)
+        instrumentation.wrap(flashblade)
+        instrumentation.register(flashblade, endpoint)
+        return flashblade
+
+    def _logout(self, client):
+        instrumentation.forget(client)
+        try:
+            client.logout()
+        except Exception:
+            pass
+
+    def call(self, client, api_token, func, *args, **kwargs):
+        """
+        Issue a REST call on a pooled client. If the array answers with
+        HTTP 401 because the session expired, log in again and retry once.
+        """
+        auth_token = client._api_client.default_headers.get('x-auth-token')
+        try:
+            return func(*args, **kwargs)
+        except rest.ApiException as e:
+            if e.status != 401:
+                raise
+        self.renew(client, api_token, auth_token)
+        return func(*args, **kwargs)
+
+    def renew(self, client, api_token, auth_token):
+        """
+        Log in again on a pooled client whose session token auth_token has
+        been rejected by the array.
+        """
+        with self._login_lock:
+            # Concurrent callers may have already renewed the session
+            if client._api_client.default_headers.get('x-auth-token') == auth_token:
+                client.login(api_token)
+
+
+sessions = FlashbladeSessionPool()
@@ -1,4 +1,6 @@
-from prometheus_client.core import GaugeMetricFamily
+import itertools
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
+from .flashblade import USAGE_PAGE_SIZE
 
 
 class UsageGroupsMetrics():
@@ -11,20 +13,27 @@ class UsageGroupsMetrics():
 
     def _usage(self):
         """
-        Create metrics of gauge type for groups usage indicators.
+        Create metrics of gauge type for groups usage indicators, yielding
+        them as the usage records are streamed from the array, in families
+        of at most USAGE_PAGE_SIZE groups, which the exporter writers
+        render under a single header.
         """
-        self.usage = GaugeMetricFamily('purefb_filesystem_group_usage_bytes',
-                                       'FlashBlade filesystem groups usage',
-                                       labels=['name', 'group_name', 'gid',
-                                               'dimension'])
-        for gu in self.fb.get_groups_usage():
-            grpname = gu.group.name if gu.group.name is not None else ''
-            gid = str(gu.group.id)
-            self.usage.add_metric(
-                    [gu.file_system.name, grpname, gid, 'quota'], gu.quota if gu.quota is not None else 0)
-            self.usage.add_metric(
-                    [gu.file_system.name, grpname, gid, 'usage'], gu.usage if gu.usage is not None else 0)
+        rows = iter(self.fb.get_groups_usage())
+        chunk = list(itertools.islice(rows, USAGE_PAGE_SIZE))
+        while True:
+            self.usage = CompactGaugeMetricFamily('purefb_filesystem_group_usage_bytes',
+                                                  'FlashBlade filesystem groups usage',
+                                                  labels=['name', 'group_name', 'gid',
+                                                          'dimension'])
+            for fs_name, grpname, gid, quota, usage in chunk:
+                grpname = grpname if grpname is not None else ''
+                gid = str(gid)
+                self.usage.add_metric([fs_name, grpname, gid, 'quota'], quota if quota is not None else 0)
+                self.usage.add_metric([fs_name, grpname, gid, 'usage'], usage if usage is not None else 0)
+            yield self.usage
+            chunk = list(itertools.islice(rows, USAGE_PAGE_SIZE))
+            if not chunk:
+                break
 
     def get_metrics(self):
-        self._usage()
-        yield self.usage
+        yield from self._usage()
@@ -1,4 +1,6 @@
-from prometheus_client.core import GaugeMetricFamily
+import itertools
+from exporter_common.compact_metric_family import CompactGaugeMetricFamily
+from .flashblade import USAGE_PAGE_SIZE
 
 
 class UsageUsersMetrics():
@@ -11,20 +13,27 @@ class UsageUsersMetrics():
 
     def _usage(self):
         """
-        Create metrics of gauge type for users usage indicators.
+        Create metrics of gauge type for users usage indicators, yielding
+        them as the usage records are streamed from the array, in families
+        of at most USAGE_PAGE_SIZE users, which the exporter writers
+        render under a single header.
         """
-        self.usage = GaugeMetricFamily('purefb_filesystem_user_usage_bytes',
-                                       'FlashBlade filesystem users usage',
-                                       labels=['name', 'user_name', 'uid',
-                                               'dimension'])
-        for uu in self.fb.get_users_usage():
-            uname = uu.user.name if uu.user.name is not None else ''
-            uid = str(uu.user.id)
-            self.usage.add_metric(
-                    [uu.file_system.name, uname, uid, 'quota'], uu.quota if uu.quota is not None else 0)
-            self.usage.add_metric(
-                    [uu.file_system.name, uname, uid, 'usage'], uu.usage if uu.usage is not None else 0)
+        rows = iter(self.fb.get_users_usage())
+        chunk = list(itertools.islice(rows, USAGE_PAGE_SIZE))
+        while True:
+            self.usage = CompactGaugeMetricFamily('purefb_filesystem_user_usage_bytes',
+                                                  'FlashBlade filesystem users usage',
+                                                  labels=['name', 'user_name', 'uid',
+                                                          'dimension'])
+            for fs_name, uname, uid, quota, usage in chunk:
+                uname = uname if uname is not None else ''
+                uid = str(uid)
+                self.usage.add_metric([fs_name, uname, uid, 'quota'], quota if quota is not None else 0)
+                self.usage.add_metric([fs_name, uname, uid, 'usage'], usage if usage is not None else 0)
+            yield self.usage
+            chunk = list(itertools.islice(rows, USAGE_PAGE_SIZE))
+            if not chunk:
+                break
 
     def get_metrics(self):
-        self._usage()
-        yield self.usage
+        yield from self._usage()
@@ -1,15 +1,90 @@
 #!/usr/bin/env python
 
-from flask import Flask, request, abort, make_response
+from flask import Flask, Response, request, abort
 from flask_httpauth import HTTPTokenAuth
 from urllib.parse import parse_qs
+import hashlib
+import hmac
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, ProcessCollector
+import os
 import re
-from prometheus_client import generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flasharray_collector import FlasharrayCollector
 from flashblade_collector import FlashbladeCollector
+from flasharray_collector.flasharray_metrics.session_pool import sessions as fa_sessions
+from flashblade_collector.flashblade_metrics.session_pool import sessions as fb_sessions
+from flashblade_collector.flashblade_metrics.async_transport import transport as fb_transport
+from flasharray_collector.flasharray_metrics.instrumentation import instrumentation as fa_instrumentation
+from flashblade_collector.flashblade_metrics.instrumentation import instrumentation as fb_instrumentation
+from exporter_common import FORMATS, Fleet, Poller, Profiler, RenderCache, SingleFlight, Snapshot
+from exporter_common import TargetRegistry, generate_text, negotiate
 
 import logging
 
+# Maximum number of REST calls issued concurrently against a single
+# FlashArray, by a scrape and by all the scrapes of the array together
+FA_MAX_WORKERS = int(os.environ.get('PURE_FA_MAX_WORKERS', 4))
+fa_sessions.max_calls = FA_MAX_WORKERS
+
+# Refresh interval in seconds of each tier of array data cached across scrapes
+REFRESH_INTERVALS = {}
+for tier in ('inventory', 'hardware', 'space', 'usage', 'performance'):
+    var = 'PURE_{}_REFRESH_INTERVAL'.format(tier.upper())
+    if var in os.environ:
+        REFRESH_INTERVALS[tier] = int(os.environ[var])
+
+# Expose the performance samples with the time reported by the array
+SAMPLE_TIMESTAMPS = os.environ.get('PURE_SAMPLE_TIMESTAMPS', '').lower() in ('1', 'true', 'yes')
+
+# REST transport to the FlashBlades: 'sync' or 'async' to issue the per
+# filesystem and per bucket calls concurrently
+FB_TRANSPORT = os.environ.get('PURE_FB_TRANSPORT', 'sync').lower()
+fb_transport.max_connections_per_array = int(os.environ.get(
+    'PURE_FB_MAX_WORKERS', fb_transport.max_connections_per_array))
+
+# Authenticated array sessions are kept warm and reused across scrapes
+for pool in (fa_sessions, fb_sessions):
+    pool.max_size = int(os.environ.get('PURE_SESSION_POOL_SIZE', pool.max_size))
+    pool.idle_ttl = int(os.environ.get('PURE_SESSION_IDLE_TTL', pool.idle_ttl))
+
+# Optional background polling: arrays are collected every POLL_INTERVAL
+# seconds and scrapes are served from the latest collected snapshot
+POLL_INTERVAL = int(os.environ.get('PURE_POLL_INTERVAL', 0))
+POLL_TIMEOUT = int(os.environ.get('PURE_POLL_TIMEOUT', 30))
+poller = Poller(POLL_INTERVAL) if POLL_INTERVAL > 0 else None
+
+# In background polling mode the same snapshot is served to many scrapes,
+# so its rendered output is cached along with a gzip compressed copy
+RENDER_CACHE_MB = int(os.environ.get('PURE_RENDER_CACHE_MB', 256))
+bodies = None
+if poller is not None and RENDER_CACHE_MB > 0:
+    bodies = RenderCache(RENDER_CACHE_MB * 2**20)
+
+# Concurrent scrapes of the same array share a single collection
+flights = SingleFlight()
+
+# Arrays collected at once by the fleet endpoints, across all the scrapes
+fleet = Fleet(int(os.environ.get('PURE_FLEET_MAX_WORKERS', 16)),
+              int(os.environ.get('PURE_FLEET_TIMEOUT', 60)))
+
+# Metrics of the exporter itself: REST calls, metric classes collection
+# times and sample counts, and process resources
+exporter_registry = CollectorRegistry()
+exporter_registry.register(fa_instrumentation)
+exporter_registry.register(fb_instrumentation)
+ProcessCollector(registry=exporter_registry)
+
+# A single collection is profiled at a time by the debug endpoints
+profiling = threading.Lock()
+
+# Optional registry of the arrays scraped by name, whose sessions and caches
+# are warmed up as soon as the exporter starts or the registry is reloaded
+EXPORTER_CONFIG = os.environ.get('PURE_EXPORTER_CONFIG')
+registry = TargetRegistry(EXPORTER_CONFIG) if EXPORTER_CONFIG else None
+warmup = ThreadPoolExecutor(max_workers=8, thread_name_prefix='warmup')
+
 class InterceptRequestMiddleware:
     def __init__(self, wsgi_app):
         self.wsgi_app = wsgi_app
@@ -93,39 +168,361 @@ def route_index():
                 <td><a href="/metrics/flashblade/quotas?endpoint=host&apitoken=T-xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx">/metrics/flashblade</a></td>
                 <td>endpoint, apitoken (optional, required only if authentication tokem is not provided)</td>
                 <td>Provides only quota related metrics.</td>
+            </tr>
+            <tr>
+                <td>Exporter</td>
+                <td><a href="/metrics/exporter">/metrics/exporter</a></td>
+                <td></td>
+                <td>Metrics of the exporter itself: REST calls duration, size and errors, collection time of each metric class, sample counts</td>
+            </tr>
+            <tr>
+                <td>Profiling</td>
+                <td><a href="/debug/profile/flasharray?endpoint=host&apitoken=xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx">/debug/profile/flasharray</a></td>
+                <td>endpoint or target, apitoken, format (summary, pstats or collapsed), top, cold</td>
+                <td>Profile of a single collection. Also /debug/profile/flashblade and the metrics type endpoints</td>
+            </tr>
+            <tr>
+                <td>Registered arrays</td>
+                <td><a href="/metrics/flasharray?target=name">/metrics/flasharray</a></td>
+                <td>target, name of an array of the PURE_EXPORTER_CONFIG registry, no apitoken required</td>
+                <td>Also /metrics/flashblade and the metrics type endpoints</td>
+            </tr>
+            <tr>
+                <td>FlashArray fleet</td>
+                <td><a href="/metrics/fleet/flasharray?endpoint=host1,host2&apitoken=xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx">/metrics/fleet/flasharray</a></td>
+                <td>endpoint (repeated or comma separated), apitoken (optional, required only if authentication tokem is not provided), target and group (registry names, repeated or comma separated)</td>
+                <td>Metrics of many arrays, labelled by array. Also /metrics/fleet/flasharray/{array,volumes,hosts,pods}</td>
+            </tr>
+            <tr>
+                <td>FlashBlade fleet</td>
+                <td><a href="/metrics/fleet/flashblade?endpoint=host1,host2&apitoken=T-xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx">/metrics/fleet/flashblade</a></td>
+                <td>endpoint (repeated or comma separated), apitoken (optional, required only if authentication tokem is not provided), target and group (registry names, repeated or comma separated)</td>
+                <td>Metrics of many arrays, labelled by array. Also /metrics/fleet/flashblade/{array,clients,usage}</td>
             </tr>`
         </tbody>
     </table>
     '''
 
-@auth.login_required
-def route_array(array_type, m_type):
-    """Produce FlashArray and FlashBlade metrics."""
-    collector = None
+def collector_params(array_type, m_type, refresh_intervals=None):
+    """
+    Return the collector class of an array type, the metrics type it is
+    requested, 'all' if m_type is not a valid one, and its parameters.
+    """
+    params = {'refresh_intervals': dict(REFRESH_INTERVALS, **(refresh_intervals or {})),
+              'timestamps': SAMPLE_TIMESTAMPS}
     if array_type == 'flasharray':
         if not m_type in ['array', 'volumes', 'hosts', 'pods']:
             m_type = 'all'
-        collector = FlasharrayCollector
-    elif array_type == 'flashblade':
-        if not m_type in ['array', 'clients', 'usage']:
-            m_type = 'all'
-        collector = FlashbladeCollector
-    else:
-        abort(404)
+        params['max_workers'] = FA_MAX_WORKERS
+        return FlasharrayCollector, m_type, params
+    if not m_type in ['array', 'clients', 'usage']:
+        m_type = 'all'
+    params['transport'] = FB_TRANSPORT
+    return FlashbladeCollector, m_type, params
 
-    registry = CollectorRegistry()
+def array_snapshot(array_type, m_type, endpoint, token, refresh_intervals=None):
+    """
+    Return the cache key and the snapshot of the metrics of an array, either
+    collected lazily for this scrape, as it is read, or, in background
+    polling mode, the latest one collected by the poller. refresh_intervals
+    overrides the refresh interval of some tiers for this array.
+    """
+    collector, m_type, params = collector_params(array_type, m_type, refresh_intervals)
     try:
-        endpoint = request.args.get('endpoint', None)
-        token = auth.current_user()
-        registry.register(collector(endpoint, token, m_type))
+        key = (array_type, endpoint,
+               hashlib.sha256(token.encode('utf-8')).hexdigest(), m_type)
+        if poller is None:
+            snapshot = flights.share(key,
+                lambda: Snapshot(collector(endpoint, token, m_type, **params).collect()))
+        else:
+            name = '{}/{}/{}'.format(array_type, endpoint, m_type)
+            snapshot = poller.get(key, name,
+                                  lambda: collector(endpoint, token, m_type, **params),
+                                  timeout=POLL_TIMEOUT)
     except Exception as e:
         app.logger.warn('%s: %s', collector.__name__, str(e))
+        raise
+    return key, snapshot
+
+def streamed_body(array_type, chunks):
+    """
+    Yield the chunks of the output of a snapshot rendered while it is
+    collected, logging the error of a collection failing once the response
+    has started. The error is raised again, so that the response is cut
+    short rather than ended as if the output were complete.
+    """
+    try:
+        yield from chunks
+    except Exception as e:
+        app.logger.warn('%s: %s', array_type, str(e))
+        raise
+
+def cached_body(key, fmt, snapshot, compressed):
+    """
+    Return the snapshot rendered in the given format, gzip compressed if
+    requested, from the render cache, along with its entity tag.
+    """
+    render = FORMATS[fmt][1]
+    rendered = bodies.get(key + (fmt,), snapshot, lambda s: b''.join(render(s)),
+                          compressed)
+    etag = '{}-{}'.format(rendered.etag, fmt)
+    if compressed:
+        return rendered.gzipped(), etag + '-gzip'
+    return rendered.body, etag
+
+def registry_targets(array_type, names, groups):
+    """
+    Return the targets of the registry of the given array type, given by
+    name and by group. Return None if a name or a group is unknown, or if a
+    target given by name is of another array type.
+    """
+    found = {}
+    for name in names:
+        target = registry.get(name) if registry is not None else None
+        if target is None or target.array_type != array_type:
+            return None
+        found[name] = target
+    for group in groups:
+        members = registry.group(group) if registry is not None else None
+        if members is None:
+            return None
+        for target in members:
+            if target.array_type == array_type:
+                found[target.name] = target
+    return list(found.values())
+
+def request_array(array_type, target, endpoint, token, authenticated=False):
+    """
+    Return the endpoint, API token and refresh intervals of the array of a
+    request. Arrays of the registry are given by target name, with their
+    own token, the others by endpoint, with the token of the request.
+    Return None if no target is given and the request token is missing,
+    or, if authenticated is True, if the request token is not the one of
+    the target. Raise LookupError if the target is unknown.
+    """
+    if target is not None:
+        targets = registry_targets(array_type, [target], [])
+        if targets is None:
+            raise LookupError(target)
+        if authenticated and not (token and hmac.compare_digest(token, targets[0].token)):
+            return None
+        return targets[0].address, targets[0].token, targets[0].refresh_intervals
+    if not token:
+        return None
+    return endpoint, token, None
+
+@auth.login_required(optional=True)
+def route_array(array_type, m_type):
+    """Produce FlashArray and FlashBlade metrics."""
+    if array_type not in ['flasharray', 'flashblade']:
+        abort(404)
+    try:
+        array = request_array(array_type, request.args.get('target'),
+                              request.args.get('endpoint', None), auth.current_user())
+    except LookupError:
+        abort(404)
+    if array is None:
+        return auth.auth_error_callback(401)
+    endpoint, token, intervals = array
+
+    try:
+        key, snapshot = array_snapshot(array_type, m_type, endpoint, token, intervals)
+    except Exception:
         abort(500)
 
-    resp = make_response(generate_latest(registry), 200)
+    # Serve the exposition format preferred by the client
+    fmt = negotiate(request.headers.get('Accept'))
+    content_type, render = FORMATS[fmt]
+    if bodies is None:
+        # The output is streamed to the client while the array is
+        # collected, each family being rendered once it is collected
+        resp = Response(streamed_body(array_type, render(snapshot)), 200)
+        resp.headers['Content-type'] = content_type
+        resp.headers['Vary'] = 'Accept'
+        return resp
+
+    compressed = request.accept_encodings['gzip'] > 0
+    body, etag = cached_body(key, fmt, snapshot, compressed)
+    resp = Response(body, 200)
+    if compressed:
+        resp.headers['Content-Encoding'] = 'gzip'
+    resp.set_etag(etag)
+    resp.headers['Content-type'] = content_type
+    resp.headers['Vary'] = 'Accept, Accept-Encoding'
+    # Answer 304 Not Modified to clients already holding the same body
+    return resp.make_conditional(request)
+
+def split_list(values):
+    """Return the distinct items of repeated and comma separated values."""
+    items = []
+    for value in values:
+        for item in value.split(','):
+            item = item.strip()
+            if item and item not in items:
+                items.append(item)
+    return items
+
+def fleet_output(array_type, m_type, endpoints, token, targets=()):
+    """
+    Produce the metrics of many arrays, labelled by array endpoint, or by
+    target name for the arrays of the registry.
+    """
+    arrays = {endpoint: (endpoint, token, None) for endpoint in endpoints}
+    for target in targets:
+        arrays.setdefault(target.name,
+                          (target.address, target.token, target.refresh_intervals))
+    return fleet.generate_text(
+        arrays.items(),
+        lambda endpoint, token, intervals: array_snapshot(array_type, m_type, endpoint,
+                                                          token, intervals)[1].fill())
+
+@auth.login_required(optional=True)
+def route_fleet(array_type, m_type):
+    """Produce FlashArray and FlashBlade metrics for many arrays at once."""
+    if array_type not in ['flasharray', 'flashblade']:
+        abort(404)
+    targets = registry_targets(array_type, split_list(request.args.getlist('target')),
+                               split_list(request.args.getlist('group')))
+    if targets is None:
+        abort(404)
+    endpoints = split_list(request.args.getlist('endpoint'))
+    # Only the arrays of the registry can be scraped without a token
+    if (endpoints or not targets) and not auth.current_user():
+        return auth.auth_error_callback(401)
+    if not endpoints and not targets:
+        abort(400)
+
+    # Each array output is streamed as soon as it is collected
+    resp = Response(fleet_output(array_type, m_type, endpoints,
+                                 auth.current_user(), targets), 200)
     resp.headers['Content-type'] = CONTENT_TYPE_LATEST
     return resp
 
+@app.route('/metrics/fleet/<array_type>/<m_type>', methods=['GET'])
+def route_fleet_type(array_type: str, m_type: str):
+    return route_fleet(array_type, m_type)
+
+@app.route('/metrics/fleet/<array_type>', methods=['GET'])
+def route_fleet_all(array_type: str):
+    return route_fleet(array_type, 'all')
+
+def exporter_format(accept):
+    """
+    Return the exposition format of the exporter metrics preferred by a
+    client. The protocol buffer format is not offered, as it is not
+    supported for histograms.
+    """
+    fmt = negotiate(accept)
+    return 'text' if fmt == 'protobuf' else fmt
+
+@app.route('/metrics/exporter', methods=['GET'])
+def route_exporter():
+    """Produce the metrics of the exporter itself."""
+    content_type, render = FORMATS[exporter_format(request.headers.get('Accept'))]
+    resp = Response(render(exporter_registry), 200)
+    resp.headers['Content-type'] = content_type
+    resp.headers['Vary'] = 'Accept'
+    return resp
+
+def profile_array(array_type, m_type, endpoint, token, refresh_intervals=None,
+                  output='summary', top=30, cold=False):
+    """
+    Collect and render once the metrics of an array under the profiler,
+    bypassing the background polling mode and the concurrent scrapes of
+    the same array. Return the requested output, a text summary, the
+    pstats file of the cProfile profile or the collapsed stacks of a
+    sampling profile, along with its content type and file name. If cold
+    is True, none of the array data cached across scrapes is used.
+    FlashBlades are profiled with the sync transport, as the event loop of
+    the async one is shared with the other scrapes.
+    """
+    collector, m_type, params = collector_params(array_type, m_type, refresh_intervals)
+    if cold:
+        params['refresh_intervals'] = dict.fromkeys(
+            ('inventory', 'hardware', 'space', 'usage', 'performance'), 0)
+    if array_type == 'flashblade':
+        params['transport'] = 'sync'
+    profiler = Profiler(sampling=(output == 'collapsed'))
+
+    def collect():
+        c = collector(endpoint, token, m_type, **params)
+        if array_type == 'flasharray':
+            # The REST calls issued by the array thread pool are profiled too
+            c.fa.executor = profiler.executor(FA_MAX_WORKERS)
+        return Snapshot(c.collect()).fill()
+
+    try:
+        with profiler:
+            snapshot = profiler.phase('collection', collect)
+            profiler.phase('rendering', lambda: b''.join(generate_text(snapshot)))
+    except Exception as e:
+        app.logger.warn('%s: %s', collector.__name__, str(e))
+        raise
+
+    name = '{}-{}-{}'.format(array_type, re.sub(r'[^\w.-]', '_', endpoint or ''), m_type)
+    if output == 'pstats':
+        return profiler.pstats_dump(), 'application/octet-stream', name + '.pstats'
+    if output == 'collapsed':
+        return profiler.collapsed().encode('utf-8'), 'text/plain; charset=utf-8', name + '.folded'
+    title = 'Profile of the {} metrics of {} {}{}'.format(
+        m_type, array_type, endpoint, ', cold caches' if cold else '')
+    return (profiler.summary(top, title).encode('utf-8'), 'text/plain; charset=utf-8', None)
+
+def profile_args(args):
+    """
+    Return the output, number of top functions and cold flag of a profile
+    request, or None if they are not valid.
+    """
+    output = args.get('format', 'summary')
+    if output not in ('summary', 'pstats', 'collapsed'):
+        return None
+    try:
+        top = int(args.get('top', 30))
+    except ValueError:
+        return None
+    return output, top, args.get('cold', '').lower() in ('1', 'true', 'yes')
+
+@auth.login_required(optional=True)
+def route_profile(array_type, m_type):
+    """Profile a single collection of FlashArray and FlashBlade metrics."""
+    if array_type not in ['flasharray', 'flashblade']:
+        abort(404)
+    # Unlike scrapes, profiles of registry targets require their token, as
+    # they can force a full collection of the array
+    try:
+        array = request_array(array_type, request.args.get('target'),
+                              request.args.get('endpoint', None), auth.current_user(),
+                              authenticated=True)
+    except LookupError:
+        abort(404)
+    if array is None:
+        return auth.auth_error_callback(401)
+    options = profile_args(request.args)
+    if options is None:
+        abort(400)
+    if not profiling.acquire(blocking=False):
+        abort(429)
+    try:
+        body, content_type, filename = profile_array(array_type, m_type, *array, *options)
+    except Exception:
+        abort(500)
+    finally:
+        profiling.release()
+
+    resp = Response(body, 200)
+    resp.headers['Content-type'] = content_type
+    if filename is not None:
+        resp.headers['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return resp
+
+@app.route('/debug/profile/<array_type>/<m_type>', methods=['GET'])
+def route_profile_type(array_type: str, m_type: str):
+    return route_profile(array_type, m_type)
+
+@app.route('/debug/profile/<array_type>', methods=['GET'])
+def route_profile_all(array_type: str):
+    return route_profile(array_type, 'all')
+
 @app.route('/metrics/flasharray/<m_type>', methods=['GET'])
 def route_flasharray(m_type: str):
     return route_array('flasharray', m_type)
@@ -152,11 +549,54 @@ def route_error_404(error):
     """ Handle 404 (HTTP Not Found) errors."""
     return 'Not found', 404
 
+@app.errorhandler(429)
+def route_error_429(error):
+    """Handle requests refused while another one is in progress."""
+    return 'Too many requests', 429
+
 @app.errorhandler(500)
 def route_error_500(error):
     """Handle server-side errors."""
     return 'Internal server error', 500
 
+def warm_up(targets):
+    """
+    Log in to the arrays of the registry and collect them once in the
+    background, so that their first scrape finds the sessions established
+    and the slow changing data already cached.
+    """
+    for target in targets:
+        # The snapshot is filled, as it is otherwise collected only when read
+        warmup.submit(lambda t: array_snapshot(t.array_type, 'all', t.address,
+                                               t.token, t.refresh_intervals)[1].fill(),
+                      target)
+
+def reload_registry():
+    """
+    Load the registry again and warm up the arrays added or changed. The
+    sessions and caches of the other arrays are kept, as they are looked
+    up by endpoint and token.
+    """
+    try:
+        changed = registry.load()
+    except Exception as e:
+        app.logger.error('%s: %s, keeping the previous targets', registry.path, str(e))
+        return
+    app.logger.info('%s: %d targets, %d added or changed',
+                    registry.path, len(registry), len(changed))
+    warm_up(changed)
+
+if registry is not None:
+    warm_up(registry.load())
+    try:
+        # The reload runs outside of the signal handler, which interrupts
+        # whatever the main thread is doing
+        signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+            target=reload_registry, name='reload', daemon=True).start())
+    except ValueError:
+        # Not imported by the main thread, signals cannot be handled
+        pass
+
 # Run in debug mode when not called by WSGI
 if __name__ == "__main__":
     app.logger.setLevel(logging.DEBUG)
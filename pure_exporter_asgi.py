@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+
+"""
+ASGI flavour of the Pure Storage exporter.
+
+Serves the same endpoints as the Flask application in pure_exporter.py, with
+the same authentication, apitoken query parameter handling, exposition
+formats, background polling mode and render cache, but from a single asyncio
+event loop. The array collections, which spend most of their time waiting
+for the array REST API, run in a thread pool, so that the scrapes of many
+arrays are in flight at once in one process instead of queueing for the few
+workers of a synchronous WSGI server.
+
+Run with any ASGI server, e.g.:
+    uvicorn pure_exporter_asgi:app --host 0.0.0.0 --port 9491
+"""
+
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from werkzeug.http import parse_accept_header, parse_etags
+from exporter_common import FORMATS, negotiate
+import pure_exporter
+from prometheus_client import CONTENT_TYPE_LATEST
+from pure_exporter import array_snapshot, cached_body, fleet_output, registry_targets, request_array
+from pure_exporter import exporter_format, exporter_registry, profile_args, profile_array, profiling
+from pure_exporter import route_index, split_list, streamed_body, verify_token
+
+# Maximum number of array collections and renderings run concurrently
+ASGI_MAX_SCRAPES = int(os.environ.get('PURE_ASGI_MAX_SCRAPES', 128))
+
+# Size of the chunks the streamed output is sent to the clients in
+STREAM_CHUNK_SIZE = 64 * 1024
+
+executor = ThreadPoolExecutor(max_workers=ASGI_MAX_SCRAPES,
+                              thread_name_prefix='scrape')
+
+ROUTE_METRICS = re.compile(r'^/metrics/(flasharray|flashblade)(?:/([^/]+))?$')
+ROUTE_FLEET = re.compile(r'^/metrics/fleet/([^/]+)(?:/([^/]+))?$')
+ROUTE_EXPORTER = re.compile(r'^/metrics/exporter$')
+ROUTE_PROFILE = re.compile(r'^/debug/profile/([^/]+)(?:/([^/]+))?$')
+HTML = 'text/html; charset=utf-8'
+
+
+class _Request():
+    """
+    Decoded HTTP request of an ASGI connection scope
+    """
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.headers = {}
+        for name, value in scope['headers']:
+            # Repeated headers are combined as allowed by RFC 7230
+            name = name.decode('latin-1').lower()
+            value = value.decode('latin-1')
+            if name in self.headers:
+                value = self.headers[name] + ', ' + value
+            self.headers[name] = value
+
+    def arg(self, name):
+        return self.args.get(name, [None])[0]
+
+    def token(self):
+        """
+        Return the api token of the request, from the Authorization header
+        or, when it is missing, from the apitoken query parameter. Return
+        None if the token is missing or invalid.
+        """
+        authorization = self.headers.get('authorization')
+        if authorization is None:
+            authorization = 'Bearer ' + (self.arg('apitoken') or '')
+        try:
+            scheme, token = authorization.split(None, 1)
+        except ValueError:
+            return None
+        if scheme.lower() != 'bearer' or not verify_token(token):
+            return None
+        return token
+
+
+async def _respond(send, status, body=b'', headers=()):
+    """Send a complete response."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    await send({'type': 'http.response.start',
+                'status': status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                            for k, v in headers] +
+                           [(b'content-length', str(len(body)).encode('latin-1'))]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _unauthorized(send):
+    await _respond(send, 401, 'Unauthorized Access',
+                   [('Content-Type', HTML),
+                    ('WWW-Authenticate', 'Bearer realm="Authentication Required"')])
+
+
+def _read(chunks, size=STREAM_CHUNK_SIZE):
+    """Return the next chunks of a rendered output, joined up to size bytes."""
+    buf = []
+    length = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            break
+    return b''.join(buf)
+
+
+async def _stream(send, loop, chunks, headers, size=STREAM_CHUNK_SIZE):
+    """
+    Send a response while its body is rendered, in chunks of at least size
+    bytes. The rendering runs in the thread pool, so that it does not hold
+    up the event loop.
+    """
+    await send({'type': 'http.response.start',
+                'status': 200,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                            for k, v in headers]})
+    try:
+        while True:
+            body = await loop.run_in_executor(executor, _read, chunks, size)
+            if not body:
+                break
+            await send({'type': 'http.response.body', 'body': body,
+                        'more_body': True})
+    finally:
+        chunks.close()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def route_array(send, req, array_type, m_type=None):
+    """Produce FlashArray and FlashBlade metrics."""
+    m_type = m_type or 'all'
+    try:
+        array = request_array(array_type, req.arg('target'), req.arg('endpoint'), req.token())
+    except LookupError:
+        await _respond(send, 404, 'Not found', [('Content-Type', HTML)])
+        return
+    if array is None:
+        await _unauthorized(send)
+        return
+    endpoint, token, intervals = array
+
+    loop = asyncio.get_running_loop()
+    try:
+        key, snapshot = await loop.run_in_executor(
+            executor, array_snapshot, array_type, m_type, endpoint, token, intervals)
+    except Exception:
+        await _respond(send, 500, 'Internal server error', [('Content-Type', HTML)])
+        return
+
+    # Serve the exposition format preferred by the client
+    fmt = negotiate(req.headers.get('accept'))
+    content_type, render = FORMATS[fmt]
+    if pure_exporter.bodies is None:
+        await _stream(send, loop, streamed_body(array_type, render(snapshot)),
+                      [('Content-Type', content_type), ('Vary', 'Accept')])
+        return
+
+    compressed = parse_accept_header(req.headers.get('accept-encoding'))['gzip'] > 0
+    body, etag = await loop.run_in_executor(
+        executor, cached_body, key, fmt, snapshot, compressed)
+    headers = [('Content-Type', content_type),
+               ('ETag', '"{}"'.format(etag)),
+               ('Vary', 'Accept, Accept-Encoding')]
+    # Answer 304 Not Modified to clients already holding the same body
+    if parse_etags(req.headers.get('if-none-match')).contains_weak(etag):
+        await _respond(send, 304, headers=headers)
+        return
+    if compressed:
+        headers.append(('Content-Encoding', 'gzip'))
+    await _respond(send, 200, body, headers)
+
+
+async def route_fleet(send, req, array_type, m_type=None):
+    """Produce FlashArray and FlashBlade metrics for many arrays at once."""
+    m_type = m_type or 'all'
+    if array_type not in ['flasharray', 'flashblade']:
+        await _respond(send, 404, 'Not found', [('Content-Type', HTML)])
+        return
+    targets = registry_targets(array_type, split_list(req.args.get('target', [])),
+                               split_list(req.args.get('group', [])))
+    if targets is None:
+        await _respond(send, 404, 'Not found', [('Content-Type', HTML)])
+        return
+    endpoints = split_list(req.args.get('endpoint', []))
+    # Only the arrays of the registry can be scraped without a token
+    token = req.token()
+    if (endpoints or not targets) and token is None:
+        await _unauthorized(send)
+        return
+    if not endpoints and not targets:
+        await _respond(send, 400, 'Invalid request parameters', [('Content-Type', HTML)])
+        return
+
+    # Each chunk is sent as soon as it is rendered, so that the output of
+    # an array is not held back until the slower ones are collected
+    await _stream(send, asyncio.get_running_loop(),
+                  fleet_output(array_type, m_type, endpoints, token, targets),
+                  [('Content-Type', CONTENT_TYPE_LATEST)], size=1)
+
+
+async def route_exporter(send, req):
+    """Produce the metrics of the exporter itself."""
+    content_type, render = FORMATS[exporter_format(req.headers.get('accept'))]
+    await _stream(send, asyncio.get_running_loop(), render(exporter_registry),
+                  [('Content-Type', content_type), ('Vary', 'Accept')])
+
+
+async def route_profile(send, req, array_type, m_type=None):
+    """Profile a single collection of FlashArray and FlashBlade metrics."""
+    if array_type not in ['flasharray', 'flashblade']:
+        await _respond(send, 404, 'Not found', [('Content-Type', HTML)])
+        return
+    # Unlike scrapes, profiles of registry targets require their token, as
+    # they can force a full collection of the array
+    try:
+        array = request_array(array_type, req.arg('target'), req.arg('endpoint'), req.token(),
+                              authenticated=True)
+    except LookupError:
+        await _respond(send, 404, 'Not found', [('Content-Type', HTML)])
+        return
+    if array is None:
+        await _unauthorized(send)
+        return
+    options = profile_args({k: v[0] for k, v in req.args.items()})
+    if options is None:
+        await _respond(send, 400, 'Invalid request parameters', [('Content-Type', HTML)])
+        return
+    if not profiling.acquire(blocking=False):
+        await _respond(send, 429, 'Too many requests', [('Content-Type', HTML)])
+        return
+    try:
+        body, content_type, filename = await asyncio.get_running_loop().run_in_executor(
+            executor, profile_array, array_type, m_type or 'all', *array, *options)
+    except Exception:
+        await _respond(send, 500, 'Internal server error', [('Content-Type', HTML)])
+        return
+    finally:
+        profiling.release()
+
+    headers = [('Content-Type', content_type)]
+    if filename is not None:
+        headers.append(('Content-Disposition', 'attachment; filename="{}"'.format(filename)))
+    await _respond(send, 200, body, headers)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point of the exporter."""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    req = _Request(scope)
+    route = None
+    if req.path != '/':
+        for pattern, handler in ((ROUTE_EXPORTER, route_exporter),
+                                 (ROUTE_METRICS, route_array),
+                                 (ROUTE_FLEET, route_fleet),
+                                 (ROUTE_PROFILE, route_profile)):
+            match = pattern.match(req.path)
+            if match is not None:
+                route = (handler,) + match.groups()
+                break
+        else:
+            await _respond(send, 404, 'Not found', [('Content-Type', HTML)])
+            return
+    if req.method != 'GET':
+        await _respond(send, 405, 'Method not allowed',
+                       [('Content-Type', HTML), ('Allow', 'GET')])
+        return
+
+    if route is None:
+        await _respond(send, 200, route_index(), [('Content-Type', HTML)])
+    else:
+        await route[0](send, req, *route[1:])
+
+
+# Run with uvicorn when not called by an ASGI server
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=9491)
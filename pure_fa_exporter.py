@@ -3,12 +3,29 @@
 from flask import Flask, request, abort, make_response
 from flask_httpauth import HTTPTokenAuth
 from urllib.parse import parse_qs
+import os
 import re
 from prometheus_client import generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST
 from flasharray_collector import FlasharrayCollector
+from flasharray_collector.flasharray_metrics.session_pool import sessions
 
 import logging
 
+# Maximum number of REST calls issued concurrently against the FlashArray,
+# by a scrape and by all the scrapes of the array together
+FA_MAX_WORKERS = int(os.environ.get('PURE_FA_MAX_WORKERS', 4))
+sessions.max_calls = FA_MAX_WORKERS
+
+# Refresh interval in seconds of each tier of array data cached across scrapes
+REFRESH_INTERVALS = {}
+for tier in ('inventory', 'hardware', 'space', 'performance'):
+    var = 'PURE_{}_REFRESH_INTERVAL'.format(tier.upper())
+    if var in os.environ:
+        REFRESH_INTERVALS[tier] = int(os.environ[var])
+
+# Expose the performance samples with the time reported by the array
+SAMPLE_TIMESTAMPS = os.environ.get('PURE_SAMPLE_TIMESTAMPS', '').lower() in ('1', 'true', 'yes')
+
 class InterceptRequestMiddleware:
     def __init__(self, wsgi_app):
         self.wsgi_app = wsgi_app
@@ -85,7 +102,10 @@ def route_flasharray(m_type: str):
     try:
         endpoint = request.args.get('endpoint', None)
         token = auth.current_user()
-        registry.register(collector(endpoint, token, m_type))
+        registry.register(collector(endpoint, token, m_type,
+                                    max_workers=FA_MAX_WORKERS,
+                                    refresh_intervals=REFRESH_INTERVALS,
+                                    timestamps=SAMPLE_TIMESTAMPS))
     except Exception as e:
         app.logger.warn('%s: %s', collector.__name__, str(e))
         abort(500)
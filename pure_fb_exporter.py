@@ -3,12 +3,31 @@
 from flask import Flask, request, abort, make_response
 from flask_httpauth import HTTPTokenAuth
 from urllib.parse import parse_qs
+import os
 import re
-from prometheus_client import generate_latest, CollectorRegistry, CONTENT_TYPE_LATEST
+from prometheus_client import CollectorRegistry, CONTENT_TYPE_LATEST
+from exporter_common import generate_text
 from flashblade_collector import FlashbladeCollector
+from flashblade_collector.flashblade_metrics.async_transport import transport as fb_transport
 
 import logging
 
+# Refresh interval in seconds of each tier of array data cached across scrapes
+REFRESH_INTERVALS = {}
+for tier in ('hardware', 'space', 'usage', 'performance'):
+    var = 'PURE_{}_REFRESH_INTERVAL'.format(tier.upper())
+    if var in os.environ:
+        REFRESH_INTERVALS[tier] = int(os.environ[var])
+
+# Expose the performance samples with the time reported by the array
+SAMPLE_TIMESTAMPS = os.environ.get('PURE_SAMPLE_TIMESTAMPS', '').lower() in ('1', 'true', 'yes')
+
+# REST transport to the FlashBlades: 'sync' or 'async' to issue the per
+# filesystem and per bucket calls concurrently
+FB_TRANSPORT = os.environ.get('PURE_FB_TRANSPORT', 'sync').lower()
+fb_transport.max_connections_per_array = int(os.environ.get(
+    'PURE_FB_MAX_WORKERS', fb_transport.max_connections_per_array))
+
 
 class InterceptRequestMiddleware:
     def __init__(self, wsgi_app):
@@ -86,12 +105,16 @@ def route_flashblade(m_type: str):
     try:
         endpoint = request.args.get('endpoint', None)
         token = auth.current_user()
-        registry.register(collector(endpoint, token, m_type))
+        registry.register(collector(endpoint, token, m_type,
+                                    refresh_intervals=REFRESH_INTERVALS,
+                                    timestamps=SAMPLE_TIMESTAMPS,
+                                    transport=FB_TRANSPORT))
     except Exception as e:
         app.logger.warn('%s: %s', collector.__name__, str(e))
         abort(500)
 
-    resp = make_response(generate_latest(registry), 200)
+    # The usage families are collected in chunks, rendered under one header
+    resp = make_response(b''.join(generate_text(registry)), 200)
     resp.headers['Content-type'] = CONTENT_TYPE_LATEST
     return resp
 